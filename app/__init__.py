@@ -1,48 +1,81 @@
+import click
+import threading
 from flask import Flask, redirect, url_for, render_template
-from flask_bcrypt import Bcrypt
 from flask_jwt_extended import JWTManager
-from flask_mail import Mail
-from pymongo import MongoClient
+from werkzeug.utils import import_string
 from config import Config
 
+class LazyExtension:
+    """Extensão importada e inicializada só no primeiro uso
+
+    Mantém bibliotecas pesadas (bcrypt, mail) fora do boot do worker: init_app
+    apenas guarda o app e a extensão real é criada no primeiro acesso a um atributo.
+    """
+
+    def __init__(self, import_path):
+        self._import_path = import_path
+        self._app = None
+        self._instance = None
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self._app = app
+        self._instance = None
+
+    def __getattr__(self, name):
+        return getattr(self._get_instance(), name)
+
+    def _get_instance(self):
+        if self._instance is None:
+            with self._lock:
+                if self._instance is None:
+                    instance = import_string(self._import_path)()
+                    if self._app is not None:
+                        instance.init_app(self._app)
+                    self._instance = instance
+        return self._instance
+
 # Extensões globais
-bcrypt = Bcrypt()
+bcrypt = LazyExtension('flask_bcrypt:Bcrypt')
 jwt = JWTManager()
-mail = Mail()
-mongo_client = None
-db = None
+mail = LazyExtension('flask_mail:Mail')
 
 def create_app(config_class=Config):
-    global mongo_client, db
-    
     app = Flask(__name__)
     app.config.from_object(config_class)
     
-    # Conectar ao MongoDB usando pymongo direto
-    try:
-        mongo_uri = app.config.get('MONGO_URI')
-        print(f"🔗 Conectando ao MongoDB: {mongo_uri}")
-        
-        mongo_client = MongoClient(mongo_uri)
-        
-        # CORRIGIDO: Especificar o nome do banco explicitamente
-        db_name = 'financedash'  # Nome do banco definido aqui
-        db = mongo_client[db_name]
-        
-        # Testar conexão
-        info = mongo_client.admin.command('ping')
-        print(f"✅ MongoDB conectado com sucesso: {info}")
-        print(f"📦 Banco de dados: {db_name}")
+    # MongoDB: o cliente é criado sob demanda em cada processo (seguro para fork)
+    from app.database import database
+    database.init_app(app)
+    
+    if app.config.get('MONGO_CONNECT_ON_STARTUP'):
+        try:
+            info = database.ping()
+            print(f"✅ MongoDB conectado com sucesso: {info}")
+        except Exception as e:
+            print(f"❌ Erro ao conectar MongoDB: {e}")
+            raise
         
-    except Exception as e:
-        print(f"❌ Erro ao conectar MongoDB: {e}")
-        raise
+        # Índices uma única vez no boot (no processo pai com gunicorn --preload),
+        # nunca no primeiro acesso de cada worker; em deploys use `flask ensure-indexes`
+        if app.config.get('MONGO_AUTO_INDEX'):
+            from app.indexes import ensure_indexes
+            try:
+                created, errors = ensure_indexes(database.db)
+                print(f"🗂️  Índices verificados: {len(created)}")
+                for error in errors:
+                    print(f"⚠️  Erro ao criar índice {error}")
+            except Exception as e:
+                print(f"⚠️  Erro ao criar índices: {e}")
     
     # Inicializar outras extensões
     bcrypt.init_app(app)
     jwt.init_app(app)
     mail.init_app(app)
     
+    from app.dashboard.cache import chart_cache
+    chart_cache.init_app(app)
+    
     # Registrar Blueprints
     from app.auth.routes import auth
     from app.dashboard.routes import dashboard
@@ -78,6 +111,79 @@ def create_app(config_class=Config):
     def internal_error(error):
         return render_template('errors/500.html'), 500
     
+    # Comandos CLI
+    @app.cli.command('rebuild-aggregates')
+    def rebuild_aggregates():
+        """Reconstrói os dados derivados (totais mensais, categorias) a partir das transações"""
+        from app.models import MonthlyRollup, OwnerCategory
+        rollups = MonthlyRollup.rebuild()
+        print(f"✅ {rollups} totais mensais reconstruídos")
+        categories = OwnerCategory.rebuild()
+        print(f"✅ {categories} categorias por dono reconstruídas")
+    
+    @app.cli.command('migrate-storage')
+    @click.option('--owner-id', default=None, help='Migra apenas este dono')
+    @click.option('--owner-type', default='individual', help="'individual' ou 'family' (com --owner-id)")
+    def migrate_storage(owner_id, owner_type):
+        """Monta os buckets por (dono, mês) a partir da coleção transactions"""
+        from app.models import TransactionBucket
+        buckets = TransactionBucket.rebuild(owner_id, owner_type)
+        print(f"✅ {buckets} buckets mensais gerados")
+        if app.config.get('TRANSACTION_STORAGE') != 'bucketed':
+            print("⚠️  TRANSACTION_STORAGE não é bucketed: os buckets não serão mantidos nas escritas")
+    
+    @app.cli.command('notifications-evaluate')
+    @click.option('--user-id', default=None, help='Avalia apenas este usuário')
+    def notifications_evaluate(user_id):
+        """Avalia as regras de notificação (para execução agendada via cron)"""
+        from app.notifications.engine import evaluate_user_notifications, evaluate_all_notifications
+        if user_id:
+            count = evaluate_user_notifications(user_id)
+            print(f"✅ {count} notificações ativas para {user_id}")
+        else:
+            users = evaluate_all_notifications()
+            print(f"✅ Notificações avaliadas para {users} usuários")
+    
+    @app.cli.command('profile-imports')
+    @click.option('--top', default=20, help='Quantidade de módulos listados')
+    @click.option('--budget-ms', default=None, type=float,
+                  help='Falha (código 1) se o boot passar deste tempo em ms')
+    def profile_imports_command(top, budget_ms):
+        """Mede o tempo de import de cada módulo no boot do app (python -X importtime)"""
+        from app.profiling import profile_imports
+        report = profile_imports()
+        
+        print(f"{'self (ms)':>10} {'total (ms)':>11}  módulo")
+        for item in report['modules'][:top]:
+            print(f"{item['self_ms']:>10.1f} {item['cumulative_ms']:>11.1f}  {item['module']}")
+        print(f"⏱️  Boot (imports + create_app): {report['total_ms']:.1f} ms")
+        
+        if budget_ms is not None and report['total_ms'] > budget_ms:
+            print(f"❌ Boot acima do orçamento de {budget_ms:.0f} ms")
+            raise SystemExit(1)
+    
+    @app.cli.command('ensure-indexes')
+    @click.option('--verify', is_flag=True, help='Verifica com explain() se alguma consulta faz COLLSCAN')
+    def ensure_indexes_command(verify):
+        """Cria os índices do registro e, opcionalmente, verifica os planos de consulta"""
+        from app.indexes import ensure_indexes, verify_query_plans
+        db = get_db()
+        created, errors = ensure_indexes(db)
+        print(f"✅ {len(created)} índices verificados")
+        for error in errors:
+            print(f"❌ Erro ao criar índice {error}")
+        
+        if verify:
+            failures = verify_query_plans(db)
+            for name in failures:
+                print(f"❌ COLLSCAN em: {name}")
+            if failures:
+                raise SystemExit(1)
+            print("✅ Nenhuma consulta canônica faz COLLSCAN")
+        
+        if errors:
+            raise SystemExit(1)
+    
     # Template globals
     @app.template_global()
     def format_currency(amount):
@@ -90,8 +196,9 @@ def create_app(config_class=Config):
     return app
 
 def get_db():
-    """Retorna a instância do banco de dados"""
-    return db
+    """Retorna a instância do banco de dados (cliente do processo atual)"""
+    from app.database import database
+    return database.db
 
 # ADICIONADO: Classe para compatibilidade com Flask-PyMongo
 class MongoWrapper:
@@ -100,13 +207,11 @@ class MongoWrapper:
         self.db = None
     
     def init_app(self, app):
-        global db
-        self.db = db
+        self.db = get_db()
 
 # Instância global para compatibilidade
 mongo = MongoWrapper()
 
 def init_mongo():
     """Inicializa o wrapper do mongo após a criação do app"""
-    global mongo, db
-    mongo.db = db
\ No newline at end of file
+    mongo.db = get_db()
\ No newline at end of file
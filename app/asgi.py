@@ -0,0 +1,153 @@
+from functools import wraps
+from bson.objectid import ObjectId
+
+# Dependência opcional: só a variante ASGI precisa de Quart
+try:
+    from quart import Quart, jsonify, request, session
+except ImportError as e:
+    raise ImportError('A API ASGI requer o pacote opcional quart (pip install quart hypercorn)') from e
+from config import Config
+from app.database import database
+from app.queries import run_query_async, gather_queries
+from app.models import Transaction
+from app.dashboard.cache import chart_cache
+from app.dashboard.routes import get_api_chart_async
+from app.reports.routes import financial_insights_query, spending_trends_query, financial_forecast_query
+from app.family.routes import family_stats_queries, combine_family_stats
+
+def create_asgi_app(config_class=Config):
+    """Variante ASGI (Quart) das APIs de leitura do dashboard
+
+    Usa as mesmas consultas das views Flask com o driver assíncrono; a sessão
+    é o mesmo cookie assinado com SECRET_KEY, então o login do Flask vale aqui.
+    Os gráficos usam a mesma resolução e o mesmo cache da API Flask.
+    """
+    app = Quart(__name__)
+    app.config.from_object(config_class)
+    database.init_app(app)
+    chart_cache.init_app(app)
+
+    register_routes(app)
+
+    return app
+
+def login_required(f):
+    @wraps(f)
+    async def decorated_function(*args, **kwargs):
+        if 'user_id' not in session:
+            return jsonify({'error': 'Login necessário'}), 401
+        return await f(*args, **kwargs)
+    return decorated_function
+
+async def find_user(user_id):
+    return await database.async_db.users.find_one(
+        {'_id': ObjectId(user_id)},
+        {'default_family': 1, 'families': 1}
+    )
+
+async def resolve_owner(user_id):
+    """Conta ativa (individual ou família) a partir do parâmetro account"""
+    user = await find_user(user_id)
+
+    if request.args.get('account', 'individual') == 'family' and user and user.get('default_family'):
+        return user['default_family'], 'family'
+    return user_id, 'individual'
+
+async def resolve_report_owner(user_id, owner_id):
+    """Tipo do dono dos relatórios, ou None se o usuário não tem acesso"""
+    if owner_id == user_id:
+        return 'individual'
+
+    user = await find_user(user_id)
+    if user and user.get('default_family') and str(user['default_family']) == owner_id:
+        return 'family'
+    return None
+
+def register_routes(app):
+
+    @app.route('/dashboard/api/summary')
+    @login_required
+    async def api_summary():
+        try:
+            owner_id, owner_type = await resolve_owner(session['user_id'])
+            summary = await run_query_async(database.async_db,
+                                            Transaction.monthly_summary_query(owner_id, owner_type))
+            return jsonify(summary)
+
+        except Exception as e:
+            print(f"Erro na API summary: {e}")
+            return jsonify({'income': 0, 'expense': 0, 'balance': 0}), 500
+
+    @app.route('/dashboard/api/charts/<chart_type>')
+    @login_required
+    async def api_charts(chart_type):
+        try:
+            owner_id, owner_type = await resolve_owner(session['user_id'])
+
+            data = await get_api_chart_async(database.async_db, owner_id, owner_type, chart_type)
+            return jsonify(data)
+
+        except Exception as e:
+            print(f"Erro na API charts: {e}")
+            return jsonify({}), 500
+
+    @app.route('/reports/api/insights/<owner_id>')
+    @login_required
+    async def api_financial_insights(owner_id):
+        try:
+            owner_type = await resolve_report_owner(session['user_id'], owner_id)
+            if not owner_type:
+                return jsonify({'error': 'Sem acesso'}), 403
+
+            insights = await run_query_async(database.async_db,
+                                             financial_insights_query(owner_id, owner_type))
+            return jsonify(insights)
+
+        except Exception as e:
+            return jsonify({'error': 'Erro ao gerar insights'}), 500
+
+    @app.route('/reports/api/trends/<owner_id>')
+    @login_required
+    async def api_spending_trends(owner_id):
+        try:
+            owner_type = await resolve_report_owner(session['user_id'], owner_id)
+            if not owner_type:
+                return jsonify({'error': 'Sem acesso'}), 403
+
+            period = request.args.get('period', '6months')
+            trends = await run_query_async(database.async_db,
+                                           spending_trends_query(owner_id, owner_type, period))
+            return jsonify(trends)
+
+        except Exception as e:
+            return jsonify({'error': 'Erro ao analisar tendências'}), 500
+
+    @app.route('/reports/api/forecast/<owner_id>')
+    @login_required
+    async def api_financial_forecast(owner_id):
+        try:
+            owner_type = await resolve_report_owner(session['user_id'], owner_id)
+            if not owner_type:
+                return jsonify({'error': 'Sem acesso'}), 403
+
+            months_ahead = int(request.args.get('months', 3))
+            forecast = await run_query_async(database.async_db,
+                                             financial_forecast_query(owner_id, owner_type, months_ahead))
+            return jsonify(forecast)
+
+        except Exception as e:
+            return jsonify({'error': 'Erro ao gerar previsão'}), 500
+
+    @app.route('/family/api/stats/<family_id>')
+    @login_required
+    async def api_family_stats(family_id):
+        try:
+            user = await find_user(session['user_id'])
+            if not user or ObjectId(family_id) not in user.get('families', []):
+                return jsonify({'error': 'Sem acesso'}), 403
+
+            results = await gather_queries(database.async_db, *family_stats_queries(family_id))
+            return jsonify(combine_family_stats(*results))
+
+        except Exception as e:
+            return jsonify({'error': 'Erro ao buscar estatísticas'}), 500
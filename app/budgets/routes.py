@@ -1,6 +1,9 @@
 from flask import Blueprint, request, jsonify, session, render_template, redirect, url_for, flash
 from app.auth.routes import login_required
 from app.models import User, Budget
+from app.context import load_user_context
+from app.permissions import has_family_permission
+from app.notifications.engine import schedule_owner_evaluation
 from bson.objectid import ObjectId
 from datetime import datetime
 
@@ -11,7 +14,7 @@ budgets = Blueprint('budgets', __name__)
 def create_budget():
     try:
         user_id = session['user_id']
-        user = User.find_by_id(user_id)
+        user_context = load_user_context()
         
         data = request.get_json() if request.is_json else request.form
         
@@ -31,12 +34,7 @@ def create_budget():
         
         # Determinar conta (individual ou família)
         account_type = data.get('account_type', 'individual')
-        if account_type == 'family' and user.default_family:
-            owner_type = 'family'
-            owner_id = user.default_family
-        else:
-            owner_type = 'individual'
-            owner_id = user_id
+        owner_id, owner_type = user_context.resolve_owner(account_type)
         
         # Verificar se já existe orçamento para esta categoria
         from app import get_db
@@ -59,6 +57,7 @@ def create_budget():
         # Calcular valor gasto atual
         budget._id = budget_id
         budget.update_spent_amount()
+        schedule_owner_evaluation(owner_id, owner_type, user_id)
         
         if request.is_json:
             return jsonify({
@@ -101,7 +100,7 @@ def edit_budget(budget_id):
         if str(budget_data['owner_id']) != user_id:
             # Se for família, verificar se tem permissão
             if budget_data['owner_type'] == 'family':
-                if not check_family_permission(user_id, budget_data['owner_id'], 'edit_budgets'):
+                if not has_family_permission(budget_data['owner_id'], 'edit_budgets'):
                     flash('Sem permissão para editar este orçamento', 'error')
                     return redirect(url_for('dashboard.budgets'))
             else:
@@ -147,6 +146,7 @@ def edit_budget(budget_id):
             )
             budget._id = ObjectId(budget_id)
             budget.update_spent_amount()
+            schedule_owner_evaluation(budget_data['owner_id'], budget_data['owner_type'], user_id)
             
             if request.is_json:
                 return jsonify({'success': True, 'message': 'Orçamento atualizado com sucesso!'})
@@ -186,13 +186,14 @@ def delete_budget(budget_id):
         # Verificar permissão
         if str(budget['owner_id']) != user_id:
             if budget['owner_type'] == 'family':
-                if not check_family_permission(user_id, budget['owner_id'], 'edit_budgets'):
+                if not has_family_permission(budget['owner_id'], 'edit_budgets'):
                     return jsonify({'success': False, 'error': 'Sem permissão'}), 403
             else:
                 return jsonify({'success': False, 'error': 'Sem permissão'}), 403
         
         # Deletar
         db.budgets.delete_one({'_id': ObjectId(budget_id)})
+        schedule_owner_evaluation(budget['owner_id'], budget['owner_type'], user_id)
         
         return jsonify({'success': True, 'message': 'Orçamento excluído com sucesso!'})
         
@@ -204,61 +205,49 @@ def delete_budget(budget_id):
 def api_budget_alerts(owner_id):
     """Verificar alertas de orçamento"""
     try:
-        user_id = session['user_id']
-        user = User.find_by_id(user_id)
+        user_context = load_user_context()
         
-        # Determinar tipo de conta
-        if owner_id == user_id:
-            owner_type = 'individual'
-        elif user.default_family and str(user.default_family) == owner_id:
-            owner_type = 'family'
-        else:
+        # Verificar acesso e tipo de conta
+        owner_type = user_context.owner_type_for(owner_id)
+        if not owner_type:
             return jsonify({'error': 'Sem acesso'}), 403
         
         from app import get_db
         db = get_db()
         
         # Buscar orçamentos com alertas habilitados
-        budgets_cursor = db.budgets.find({
+        budgets_list = list(db.budgets.find({
             'owner_id': ObjectId(owner_id),
             'owner_type': owner_type,
             'alerts_enabled': True
-        })
+        }))
+        
+        # Calcular gasto atual de todos em uma agregação
+        Budget.get_statuses(owner_id, owner_type, budgets_list)
         
         alerts = []
         
-        for budget_data in budgets_cursor:
-            # Criar objeto Budget para calcular gasto atual
-            budget = Budget(
-                budget_data['owner_id'],
-                budget_data['owner_type'],
-                budget_data['category'],
-                budget_data['limit'],
-                budget_data['period']
-            )
-            budget._id = budget_data['_id']
-            budget.update_spent_amount()
-            
+        for budget in budgets_list:
             # Verificar se atingiu 80% ou 100%
-            percentage = (budget.current_spent / budget.limit * 100) if budget.limit > 0 else 0
+            percentage = budget['percentage']
             
             if percentage >= 100:
                 alerts.append({
                     'type': 'danger',
-                    'category': budget.category,
-                    'message': f'Orçamento de {budget.category} excedido!',
+                    'category': budget['category'],
+                    'message': f"Orçamento de {budget['category']} excedido!",
                     'percentage': percentage,
-                    'spent': budget.current_spent,
-                    'limit': budget.limit
+                    'spent': budget['current_spent'],
+                    'limit': budget['limit']
                 })
             elif percentage >= 80:
                 alerts.append({
                     'type': 'warning',
-                    'category': budget.category,
-                    'message': f'Orçamento de {budget.category} quase esgotado ({percentage:.1f}%)',
+                    'category': budget['category'],
+                    'message': f"Orçamento de {budget['category']} quase esgotado ({percentage:.1f}%)",
                     'percentage': percentage,
-                    'spent': budget.current_spent,
-                    'limit': budget.limit
+                    'spent': budget['current_spent'],
+                    'limit': budget['limit']
                 })
         
         return jsonify(alerts)
@@ -271,23 +260,15 @@ def api_budget_alerts(owner_id):
 def api_budget_performance(owner_id):
     """Análise de performance dos orçamentos"""
     try:
-        user_id = session['user_id']
-        user = User.find_by_id(user_id)
+        user_context = load_user_context()
         
         # Verificar acesso
-        if owner_id != user_id and (not user.default_family or str(user.default_family) != owner_id):
+        owner_type = user_context.owner_type_for(owner_id)
+        if not owner_type:
             return jsonify({'error': 'Sem acesso'}), 403
         
-        owner_type = 'individual' if owner_id == user_id else 'family'
-        
-        from app import get_db
-        db = get_db()
-        
-        # Buscar todos os orçamentos
-        budgets_cursor = db.budgets.find({
-            'owner_id': ObjectId(owner_id),
-            'owner_type': owner_type
-        })
+        # Buscar todos os orçamentos já com o gasto atual (uma agregação)
+        budgets_list = Budget.get_statuses(owner_id, owner_type)
         
         performance = {
             'total_budgets': 0,
@@ -299,22 +280,12 @@ def api_budget_performance(owner_id):
             'categories': []
         }
         
-        for budget_data in budgets_cursor:
-            budget = Budget(
-                budget_data['owner_id'],
-                budget_data['owner_type'],
-                budget_data['category'],
-                budget_data['limit'],
-                budget_data['period']
-            )
-            budget._id = budget_data['_id']
-            budget.update_spent_amount()
-            
-            percentage = (budget.current_spent / budget.limit * 100) if budget.limit > 0 else 0
+        for budget in budgets_list:
+            percentage = budget['percentage']
             
             performance['total_budgets'] += 1
-            performance['total_limit'] += budget.limit
-            performance['total_spent'] += budget.current_spent
+            performance['total_limit'] += budget['limit']
+            performance['total_spent'] += budget['current_spent']
             
             if percentage >= 100:
                 performance['over_budget'] += 1
@@ -327,12 +298,12 @@ def api_budget_performance(owner_id):
                 status = 'good'
             
             performance['categories'].append({
-                'category': budget.category,
-                'limit': budget.limit,
-                'spent': budget.current_spent,
+                'category': budget['category'],
+                'limit': budget['limit'],
+                'spent': budget['current_spent'],
                 'percentage': percentage,
                 'status': status,
-                'remaining': budget.limit - budget.current_spent
+                'remaining': budget['remaining']
             })
         
         # Calcular médias
@@ -344,20 +315,4 @@ def api_budget_performance(owner_id):
         return jsonify(performance)
         
     except Exception as e:
-        return jsonify({'error': 'Erro ao analisar performance'}), 500
-
-# Funções auxiliares
-def check_family_permission(user_id, family_id, permission):
-    """Verifica se usuário tem permissão específica na família"""
-    from app import get_db
-    
-    db = get_db()
-    family = db.families.find_one({'_id': ObjectId(family_id)})
-    if not family:
-        return False
-    
-    for member in family.get('members', []):
-        if str(member['user_id']) == user_id:
-            return permission in member.get('permissions', [])
-    
-    return False
\ No newline at end of file
+        return jsonify({'error': 'Erro ao analisar performance'}), 500
\ No newline at end of file
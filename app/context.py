@@ -0,0 +1,75 @@
+from bson.objectid import ObjectId
+from flask import g, session
+from app import get_db
+from app.models import User, Family, get_identity_map
+
+class UserContext:
+    """Usuário da sessão, suas famílias e a resolução da conta ativa (dono dos dados)"""
+
+    def __init__(self, user, families):
+        self.user = user
+        self.user_id = str(user._id)
+        self.families = families
+
+    def resolve_owner(self, account='individual'):
+        """(owner_id, owner_type) da conta pedida: a família padrão ou a conta individual"""
+        if account == 'family' and self.user.default_family:
+            return self.user.default_family, 'family'
+        return self.user_id, 'individual'
+
+    def owner_type_for(self, owner_id):
+        """Tipo de um dono informado na URL, ou None se o usuário não tem acesso a ele"""
+        if owner_id == self.user_id:
+            return 'individual'
+        if self.user.default_family and str(self.user.default_family) == owner_id:
+            return 'family'
+        return None
+
+def load_user_context():
+    """Carrega (uma vez por requisição, em g) o usuário da sessão com as famílias
+
+    Usuário e famílias vêm de uma única agregação ($lookup) e também entram no
+    mapa de identidade, então User.find_by_id/Family.find_by_id não voltam ao banco.
+    Retorna None se não há usuário na sessão ou ele não existe mais.
+    """
+    if 'user_context' in g:
+        return g.user_context
+
+    user_id = session.get('user_id')
+    g.user_context = None
+    if not user_id:
+        return None
+
+    pipeline = [
+        {'$match': {'_id': ObjectId(user_id)}},
+        {
+            '$lookup': {
+                'from': 'families',
+                'localField': 'families',
+                'foreignField': '_id',
+                'as': 'family_documents'
+            }
+        }
+    ]
+    document = next(get_db().users.aggregate(pipeline), None)
+    if not document:
+        return None
+
+    family_documents = {family['_id']: family for family in document.pop('family_documents', [])}
+    user = User.from_document(document)
+    families = [
+        Family.from_document(family_documents[family_id])
+        for family_id in user.families if family_id in family_documents
+    ]
+
+    get_identity_map('users')[user._id] = user
+    family_map = get_identity_map('families')
+    for family in families:
+        family_map[family._id] = family
+
+    g.user_context = UserContext(user, families)
+    return g.user_context
+
+def forget_user_context():
+    """Descarta o contexto da requisição (após alterar o usuário ou suas famílias)"""
+    g.pop('user_context', None)
@@ -0,0 +1,157 @@
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from werkzeug.utils import import_string
+
+# Formato dos dados dos gráficos em cache (muda a chave quando o formato muda)
+CHART_FORMAT = 'compact1'
+
+# Sentinela para diferenciar "não está no cache" de um gráfico vazio (None)
+MISSING = object()
+
+class LRUCache:
+    """Cache em memória com limite de entradas (LRU) e expiração por TTL"""
+
+    def __init__(self, max_entries=512, ttl=300):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=MISSING):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return default
+
+            value, expires_at = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return default
+
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl=None):
+        expires_at = time.monotonic() + (ttl or self.ttl)
+        with self._lock:
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+class ChartCache:
+    """Cache dos dados dos gráficos: camada LRU local + camada compartilhada opcional
+
+    A camada compartilhada é qualquer objeto com get(key) e set(key, value, ttl)
+    (ex.: um wrapper de Redis que serialize os dicts em JSON), configurado em CHART_CACHE_SHARED_BACKEND como
+    caminho pontuado para uma factory que recebe o app.
+    """
+
+    def __init__(self, max_entries=512, ttl=300):
+        self.local = LRUCache(max_entries, ttl)
+        self.shared = None
+        self.enabled = True
+        self._counters = {'hits': 0, 'local_hits': 0, 'shared_hits': 0, 'misses': 0}
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.enabled = app.config.get('CHART_CACHE_ENABLED', True)
+        self.local = LRUCache(
+            app.config.get('CHART_CACHE_MAX_ENTRIES', 512),
+            app.config.get('CHART_CACHE_TTL', 300)
+        )
+
+        backend = app.config.get('CHART_CACHE_SHARED_BACKEND')
+        if backend:
+            self.set_shared_backend(import_string(backend)(app))
+
+    def set_shared_backend(self, backend):
+        self.shared = backend
+
+    def get(self, key, default=MISSING):
+        if not self.enabled:
+            return default
+
+        value = self.local.get(key)
+        if value is not MISSING:
+            self._count('hits', 'local_hits')
+            return value
+
+        if self.shared is not None:
+            try:
+                value = self.shared.get(key)
+            except Exception as e:
+                print(f"Erro no cache compartilhado: {e}")
+                value = None
+            if value is not None:
+                self.local.set(key, value)
+                self._count('hits', 'shared_hits')
+                return value
+
+        self._count('misses')
+        return default
+
+    def set(self, key, value):
+        if not self.enabled:
+            return
+
+        self.local.set(key, value)
+        # A camada compartilhada só guarda gráficos não vazios
+        if self.shared is not None and value is not None:
+            try:
+                self.shared.set(key, value, self.local.ttl)
+            except Exception as e:
+                print(f"Erro no cache compartilhado: {e}")
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._counters)
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_ratio'] = stats['hits'] / lookups if lookups else 0
+        stats['entries'] = len(self.local)
+        stats['max_entries'] = self.local.max_entries
+        stats['ttl'] = self.local.ttl
+        stats['shared'] = self.shared is not None
+        return stats
+
+    def _count(self, *counters):
+        with self._lock:
+            for counter in counters:
+                self._counters[counter] += 1
+
+chart_cache = ChartCache()
+
+def chart_cache_key(owner_id, owner_type, chart_name, version, bucket=None):
+    """Chave (dono, gráfico, período) já com a versão atual do dono"""
+    bucket = bucket or get_period_bucket()
+    return f"charts:{CHART_FORMAT}:{owner_type}:{owner_id}:{chart_name}:{bucket}:v{version}"
+
+def get_period_bucket():
+    """Os gráficos dependem do dia atual (janelas de 30 dias, mês corrente)"""
+    return datetime.now().strftime('%Y-%m-%d')
+
+def get_owner_version(owner_id, owner_type):
+    """Versão atual dos dados do dono (incrementada a cada escrita de transações)"""
+    from app import get_db
+
+    version = get_db().cache_versions.find_one({'_id': f"{owner_type}:{owner_id}"})
+    return version['version'] if version else 0
+
+def bump_owner_version(owner_id, owner_type):
+    """Invalida os gráficos em cache do dono em todos os workers"""
+    from app import get_db
+
+    get_db().cache_versions.update_one(
+        {'_id': f"{owner_type}:{owner_id}"},
+        {'$inc': {'version': 1}},
+        upsert=True
+    )
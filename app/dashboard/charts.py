@@ -1,74 +1,147 @@
-import plotly.graph_objs as go
-import plotly.utils
 from datetime import datetime, timedelta
 from app import get_db
+from app.dashboard.engine import get_month_starts
+from app.dashboard.cache import chart_cache, chart_cache_key, MISSING
+from app.queries import run_query
+from app.storage import get_transaction_store
 from bson.objectid import ObjectId
-import json
+import threading
+import time
 
-def generate_charts_data(owner_id, owner_type):
-    """Gera todos os dados dos gráficos para o dashboard"""
-    
+# Gráficos da visão geral
+CHART_NAMES = ['expenses_pie', 'monthly_evolution', 'income_vs_expenses', 'category_trends', 'daily_spending']
+
+class ChartTimings:
+    """Duração da geração de cada gráfico (última, média, máxima)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._charts = {}
+
+    def record(self, name, duration):
+        with self._lock:
+            chart = self._chart(name)
+            chart['count'] += 1
+            chart['total'] += duration
+            chart['max'] = max(chart['max'], duration)
+            chart['last'] = duration
+
+    def _chart(self, name):
+        return self._charts.setdefault(name, {
+            'count': 0, 'total': 0.0, 'max': 0.0, 'last': 0.0
+        })
+
+    def stats(self):
+        with self._lock:
+            return {
+                name: {
+                    'count': chart['count'],
+                    'avg_ms': (chart['total'] / chart['count'] * 1000) if chart['count'] else 0,
+                    'max_ms': chart['max'] * 1000,
+                    'last_ms': chart['last'] * 1000
+                }
+                for name, chart in self._charts.items()
+            }
+
+chart_timings = ChartTimings()
+
+def chart_payload(kind, title, labels, series, **options):
+    """Formato compacto dos gráficos: rótulos + séries numéricas
+
+    A figura (cores, hover, layout) é montada no navegador por static/js/charts.js.
+    Cada série é {'name', 'values'} com 'color' e 'dash' opcionais.
+    """
+    for item in series:
+        item['values'] = [round(value, 2) for value in item['values']]
+    return {'type': kind, 'title': title, 'labels': labels, 'series': series, **options}
+
+def get_cached_charts(owner_id, owner_type, version):
+    """Retorna os gráficos encontrados no cache para a versão atual do dono"""
     charts = {}
+    for name in CHART_NAMES:
+        cached = chart_cache.get(chart_cache_key(owner_id, owner_type, name, version))
+        if cached is not MISSING:
+            charts[name] = cached
+    return charts
+
+def generate_charts_data(owner_id, owner_type, data=None, version=None, cached=None):
+    """Gera todos os dados dos gráficos para o dashboard
+    
+    Se `data` (de engine.load_overview_data) for informado, os gráficos são
+    montados a partir dele sem novas consultas ao banco. Se `version` (versão
+    dos dados do dono) for informada, os gráficos são lidos/gravados no cache;
+    `cached` permite reaproveitar uma consulta ao cache já feita.
+    """
+    
+    if cached is None:
+        cached = get_cached_charts(owner_id, owner_type, version) if version is not None else {}
+    
+    if data is not None:
+        builders = {
+            'expenses_pie': lambda: build_expenses_pie_chart(data['expenses_by_category']),
+            'monthly_evolution': lambda: build_monthly_evolution_chart(
+                data['month_starts'], data['monthly_totals']
+            ),
+            'income_vs_expenses': lambda: build_income_vs_expenses_chart(
+                data['month_starts'][-6:], data['monthly_totals']
+            ),
+            'category_trends': lambda: build_category_trends_chart(
+                data['month_starts'][-6:], data['top_categories'], data['category_months']
+            ),
+            'daily_spending': lambda: build_daily_spending_chart(data['daily_spending'])
+        }
+    else:
+        builders = {
+            name: (lambda generator=generator: generator(owner_id, owner_type))
+            for name, generator in CHART_GENERATORS.items()
+        }
     
-    # 🛡️ Gerar cada gráfico com tratamento de erro individual
-    try:
-        charts['expenses_pie'] = generate_expenses_pie_chart(owner_id, owner_type)
-    except Exception as e:
-        print(f"Erro no gráfico de pizza: {e}")
-        charts['expenses_pie'] = None
+    error_labels = {
+        'expenses_pie': 'de pizza',
+        'monthly_evolution': 'de evolução',
+        'income_vs_expenses': 'receitas vs despesas',
+        'category_trends': 'de tendências',
+        'daily_spending': 'diário'
+    }
     
-    try:
-        charts['monthly_evolution'] = generate_monthly_evolution_chart(owner_id, owner_type)
-    except Exception as e:
-        print(f"Erro no gráfico de evolução: {e}")
-        charts['monthly_evolution'] = None
+    charts = {name: cached[name] for name in builders if name in cached}
+    pending = {name: builder for name, builder in builders.items() if name not in cached}
     
-    try:
-        charts['income_vs_expenses'] = generate_income_vs_expenses_chart(owner_id, owner_type)
-    except Exception as e:
-        print(f"Erro no gráfico receitas vs despesas: {e}")
-        charts['income_vs_expenses'] = None
+    def store(name, chart):
+        if version is not None:
+            chart_cache.set(chart_cache_key(owner_id, owner_type, name, version), chart)
     
-    try:
-        charts['category_trends'] = generate_category_trends_chart(owner_id, owner_type)
-    except Exception as e:
-        print(f"Erro no gráfico de tendências: {e}")
-        charts['category_trends'] = None
+    # 🛡️ Gerar cada gráfico com tratamento de erro individual
+    for name, builder in pending.items():
+        started = time.perf_counter()
+        try:
+            charts[name] = builder()
+        except Exception as e:
+            print(f"Erro no gráfico {error_labels[name]}: {e}")
+            charts[name] = None
+            continue
+        finally:
+            chart_timings.record(name, time.perf_counter() - started)
         
-    try:
-        charts['daily_spending'] = generate_daily_spending_chart(owner_id, owner_type)
-    except Exception as e:
-        print(f"Erro no gráfico diário: {e}")
-        charts['daily_spending'] = None
+        store(name, charts[name])
     
-    return charts
+    return {name: charts.get(name) for name in builders}
 
 def generate_expenses_pie_chart(owner_id, owner_type):
     """Gráfico de pizza dos gastos por categoria (últimos 30 dias)"""
     
-    db = get_db()
     start_date = datetime.now() - timedelta(days=30)
-    
-    pipeline = [
-        {
-            '$match': {
-                'owner_id': ObjectId(owner_id),
-                'owner_type': owner_type,
-                'type': 'expense',
-                'date': {'$gte': start_date}
-            }
-        },
-        {
-            '$group': {
-                '_id': '$category',
-                'total': {'$sum': '$amount'}
-            }
-        },
-        {'$sort': {'total': -1}},
-        {'$limit': 10}  # Top 10 categorias
-    ]
-    
-    result = list(db.transactions.aggregate(pipeline))
+    totals = get_transaction_store().period_totals(owner_id, owner_type, start_date, trans_type='expense')
+    
+    # Top 10 categorias
+    result = sorted(
+        ({'_id': item['category'], 'total': item['total']} for item in totals),
+        key=lambda item: item['total'], reverse=True
+    )[:10]
+    return build_expenses_pie_chart(result)
+
+def build_expenses_pie_chart(result):
+    """Monta o gráfico de pizza a partir dos totais por categoria"""
     
     if not result:
         return None
@@ -76,56 +149,32 @@ def generate_expenses_pie_chart(owner_id, owner_type):
     labels = [item['_id'] or 'Sem categoria' for item in result]
     values = [item['total'] for item in result]
     
-    fig = go.Figure(data=[go.Pie(
-        labels=labels,
-        values=values,
-        hovertemplate='<b>%{label}</b><br>' +
-                      'Valor: R$ %{value:,.2f}<br>' +
-                      'Percentual: %{percent}<br>' +
-                      '<extra></extra>',
-        textinfo='label+percent',
-        hole=0.3
-    )])
-    
-    fig.update_layout(
-        title='Gastos por Categoria (Últimos 30 dias)',
-        showlegend=True,
-        height=400,
-        margin=dict(t=50, b=50, l=50, r=50)
-    )
-    
-    return json.dumps(fig, cls=plotly.utils.PlotlyJSONEncoder)
+    return chart_payload('pie', 'Gastos por Categoria (Últimos 30 dias)', labels, [
+        {'name': 'Gastos', 'values': values}
+    ])
 
 def generate_monthly_evolution_chart(owner_id, owner_type):
     """Gráfico de evolução mensal receitas vs despesas"""
     
-    db = get_db()
     # Últimos 12 meses
-    end_date = datetime.now()
-    start_date = end_date - timedelta(days=365)
+    month_starts = get_last_month_starts(12)
+    query = get_transaction_store().monthly_totals_query(
+        owner_id, owner_type,
+        (month_starts[0].year, month_starts[0].month),
+        (month_starts[-1].year, month_starts[-1].month)
+    )
     
-    pipeline = [
-        {
-            '$match': {
-                'owner_id': ObjectId(owner_id),
-                'owner_type': owner_type,
-                'date': {'$gte': start_date}
-            }
-        },
-        {
-            '$group': {
-                '_id': {
-                    'year': {'$year': '$date'},
-                    'month': {'$month': '$date'},
-                    'type': '$type'
-                },
-                'total': {'$sum': '$amount'}
-            }
-        },
-        {'$sort': {'_id.year': 1, '_id.month': 1}}
-    ]
+    monthly_totals = {}
+    for item in run_query(get_db(), query):
+        key = (item['year'], item['month'])
+        monthly_totals.setdefault(key, {'income': 0, 'expense': 0})
+        if item['type'] in ('income', 'expense'):
+            monthly_totals[key][item['type']] = item['total']
     
-    result = list(db.transactions.aggregate(pipeline))
+    return build_monthly_evolution_chart(month_starts, monthly_totals)
+
+def build_monthly_evolution_chart(month_starts, monthly_totals):
+    """Monta o gráfico de evolução a partir dos totais mensais {(ano, mês): {...}}"""
     
     # Organizar dados
     months = []
@@ -133,216 +182,105 @@ def generate_monthly_evolution_chart(owner_id, owner_type):
     expense_data = []
     balance_data = []
     
-    # Gerar últimos 12 meses
-    current_date = datetime.now().replace(day=1)
-    for i in range(12):
-        month_date = current_date - timedelta(days=30 * i)
-        month_key = f"{month_date.strftime('%b')} {month_date.year}"
-        months.insert(0, month_key)
-        
-        # Buscar dados do mês
-        month_income = 0
-        month_expense = 0
-        
-        for item in result:
-            if (item['_id']['year'] == month_date.year and 
-                item['_id']['month'] == month_date.month):
-                if item['_id']['type'] == 'income':
-                    month_income = item['total']
-                elif item['_id']['type'] == 'expense':
-                    month_expense = item['total']
+    for month_date in month_starts:
+        month_totals = monthly_totals.get((month_date.year, month_date.month), {})
+        month_income = month_totals.get('income', 0)
+        month_expense = month_totals.get('expense', 0)
         
-        income_data.insert(0, month_income)
-        expense_data.insert(0, month_expense)
-        balance_data.insert(0, month_income - month_expense)
-    
-    fig = go.Figure()
-    
-    # Receitas
-    fig.add_trace(go.Scatter(
-        x=months,
-        y=income_data,
-        mode='lines+markers',
-        name='Receitas',
-        line=dict(color='#28a745', width=3),
-        marker=dict(size=8),
-        hovertemplate='<b>Receitas</b><br>' +
-                      'Mês: %{x}<br>' +
-                      'Valor: R$ %{y:,.2f}<br>' +
-                      '<extra></extra>'
-    ))
-    
-    # Despesas
-    fig.add_trace(go.Scatter(
-        x=months,
-        y=expense_data,
-        mode='lines+markers',
-        name='Despesas',
-        line=dict(color='#dc3545', width=3),
-        marker=dict(size=8),
-        hovertemplate='<b>Despesas</b><br>' +
-                      'Mês: %{x}<br>' +
-                      'Valor: R$ %{y:,.2f}<br>' +
-                      '<extra></extra>'
-    ))
-    
-    # Saldo
-    fig.add_trace(go.Scatter(
-        x=months,
-        y=balance_data,
-        mode='lines+markers',
-        name='Saldo',
-        line=dict(color='#17a2b8', width=2, dash='dash'),
-        marker=dict(size=6),
-        hovertemplate='<b>Saldo</b><br>' +
-                      'Mês: %{x}<br>' +
-                      'Valor: R$ %{y:,.2f}<br>' +
-                      '<extra></extra>'
-    ))
-    
-    fig.update_layout(
-        title='Evolução Financeira (Últimos 12 meses)',
-        xaxis_title='Mês',
-        yaxis_title='Valor (R$)',
-        hovermode='x unified',
-        height=400,
-        margin=dict(t=50, b=50, l=50, r=50)
-    )
-    
-    return json.dumps(fig, cls=plotly.utils.PlotlyJSONEncoder)
+        months.append(f"{month_date.strftime('%b')} {month_date.year}")
+        income_data.append(month_income)
+        expense_data.append(month_expense)
+        balance_data.append(month_income - month_expense)
+    
+    return chart_payload('line', 'Evolução Financeira (Últimos 12 meses)', months, [
+        {'name': 'Receitas', 'values': income_data, 'color': '#28a745'},
+        {'name': 'Despesas', 'values': expense_data, 'color': '#dc3545'},
+        {'name': 'Saldo', 'values': balance_data, 'color': '#17a2b8', 'dash': True}
+    ])
 
 def generate_income_vs_expenses_chart(owner_id, owner_type):
     """Gráfico de barras comparando receitas vs despesas mensais"""
     
-    db = get_db()
-    # Últimos 6 meses
-    months_data = []
+    # Últimos 6 meses (uma leitura dos totais mensais materializados)
+    month_starts = get_last_month_starts(6)
+    first, last = month_starts[0], month_starts[-1]
+    summaries = get_period_summary(
+        owner_id, owner_type, (first.year, first.month), (last.year, last.month)
+    )
     
-    for i in range(6):
-        date = datetime.now().replace(day=1) - timedelta(days=30 * i)
-        year = date.year
-        month = date.month
-        
-        summary = get_month_summary(owner_id, owner_type, year, month)
-        
-        months_data.insert(0, {
+    return build_income_vs_expenses_chart(month_starts, summaries)
+
+def build_income_vs_expenses_chart(month_starts, summaries):
+    """Monta o gráfico de barras a partir dos totais mensais {(ano, mês): {...}}"""
+    
+    months_data = []
+    for date in month_starts:
+        summary = summaries.get((date.year, date.month), {})
+        months_data.append({
             'month': date.strftime('%b %Y'),
-            'income': summary['income'],
-            'expense': summary['expense']
+            'income': summary.get('income', 0),
+            'expense': summary.get('expense', 0)
         })
     
     months = [item['month'] for item in months_data]
     income_values = [item['income'] for item in months_data]
     expense_values = [item['expense'] for item in months_data]
     
-    fig = go.Figure()
-    
-    fig.add_trace(go.Bar(
-        x=months,
-        y=income_values,
-        name='Receitas',
-        marker_color='#28a745',
-        hovertemplate='<b>Receitas</b><br>' +
-                      'Mês: %{x}<br>' +
-                      'Valor: R$ %{y:,.2f}<br>' +
-                      '<extra></extra>'
-    ))
-    
-    fig.add_trace(go.Bar(
-        x=months,
-        y=expense_values,
-        name='Despesas',
-        marker_color='#dc3545',
-        hovertemplate='<b>Despesas</b><br>' +
-                      'Mês: %{x}<br>' +
-                      'Valor: R$ %{y:,.2f}<br>' +
-                      '<extra></extra>'
-    ))
-    
-    fig.update_layout(
-        title='Receitas vs Despesas (Últimos 6 meses)',
-        xaxis_title='Mês',
-        yaxis_title='Valor (R$)',
-        barmode='group',
-        height=400,
-        margin=dict(t=50, b=50, l=50, r=50)
-    )
-    
-    return json.dumps(fig, cls=plotly.utils.PlotlyJSONEncoder)
+    return chart_payload('bar', 'Receitas vs Despesas (Últimos 6 meses)', months, [
+        {'name': 'Receitas', 'values': income_values, 'color': '#28a745'},
+        {'name': 'Despesas', 'values': expense_values, 'color': '#dc3545'}
+    ])
 
 def generate_category_trends_chart(owner_id, owner_type):
     """Gráfico de tendências das principais categorias"""
     
-    db = get_db()
+    store = get_transaction_store()
     # Buscar top 5 categorias dos últimos 3 meses
     start_date = datetime.now() - timedelta(days=90)
-    
-    top_categories_pipeline = [
-        {
-            '$match': {
-                'owner_id': ObjectId(owner_id),
-                'owner_type': owner_type,
-                'type': 'expense',
-                'date': {'$gte': start_date}
-            }
-        },
-        {
-            '$group': {
-                '_id': '$category',
-                'total': {'$sum': '$amount'}
-            }
-        },
-        {'$sort': {'total': -1}},
-        {'$limit': 5}
+    totals = store.period_totals(owner_id, owner_type, start_date, trans_type='expense')
+    top_categories = [
+        item['category']
+        for item in sorted(totals, key=lambda item: item['total'], reverse=True)[:5]
     ]
     
-    top_categories = list(db.transactions.aggregate(top_categories_pipeline))
+    if not top_categories:
+        return None
+    
+    # Evolução mensal das categorias em uma única leitura
+    month_starts = get_last_month_starts(6)
+    query = store.monthly_totals_query(
+        owner_id, owner_type,
+        (month_starts[0].year, month_starts[0].month),
+        (month_starts[-1].year, month_starts[-1].month),
+        trans_type='expense', categories=top_categories, by_category=True
+    )
+    
+    category_months = {}
+    for item in run_query(get_db(), query):
+        category_months[(item['category'], item['year'], item['month'])] = item['total']
+    
+    return build_category_trends_chart(month_starts, top_categories, category_months)
+
+def build_category_trends_chart(month_starts, top_categories, category_months):
+    """Monta o gráfico de tendências a partir de {(categoria, ano, mês): total}"""
     
     if not top_categories:
         return None
     
-    fig = go.Figure()
+    months = [date.strftime('%b') for date in month_starts]
     
-    # Para cada categoria, buscar evolução mensal
-    for category_data in top_categories:
-        category = category_data['_id']
-        monthly_values = []
-        months = []
-        
-        for i in range(6):  # Últimos 6 meses
-            date = datetime.now().replace(day=1) - timedelta(days=30 * i)
-            start_month = date
-            end_month = (date.replace(day=28) + timedelta(days=4)).replace(day=1)
-            
-            month_total = get_category_month_total(
-                owner_id, owner_type, category, start_month, end_month
-            )
-            
-            monthly_values.insert(0, month_total)
-            months.insert(0, date.strftime('%b'))
-        
-        fig.add_trace(go.Scatter(
-            x=months,
-            y=monthly_values,
-            mode='lines+markers',
-            name=category or 'Sem categoria',
-            line=dict(width=2),
-            marker=dict(size=6),
-            hovertemplate=f'<b>{category}</b><br>' +
-                          'Mês: %{x}<br>' +
-                          'Valor: R$ %{y:,.2f}<br>' +
-                          '<extra></extra>'
-        ))
-    
-    fig.update_layout(
-        title='Tendência das Principais Categorias',
-        xaxis_title='Mês',
-        yaxis_title='Valor (R$)',
-        height=400,
-        margin=dict(t=50, b=50, l=50, r=50)
-    )
+    series = [
+        {
+            'name': category or 'Sem categoria',
+            'values': [
+                category_months.get((category, date.year, date.month), 0)
+                for date in month_starts
+            ]
+        }
+        for category in top_categories
+    ]
     
-    return json.dumps(fig, cls=plotly.utils.PlotlyJSONEncoder)
+    return chart_payload('line', 'Tendência das Principais Categorias', months, series)
 
 def generate_daily_spending_chart(owner_id, owner_type):
     """Gráfico de gastos diários do mês atual - VERSÃO CORRIGIDA"""
@@ -370,6 +308,12 @@ def generate_daily_spending_chart(owner_id, owner_type):
     ]
     
     result = list(db.transactions.aggregate(pipeline))
+    return build_daily_spending_chart({item['_id']: item['total'] for item in result})
+
+def build_daily_spending_chart(daily_totals):
+    """Monta o gráfico diário a partir de {dia do mês: total}"""
+    
+    now = datetime.now()
     
     # Criar array com todos os dias do mês - CORRIGIDO
     try:
@@ -383,90 +327,52 @@ def generate_daily_spending_chart(owner_id, owner_type):
     
     daily_data = [0] * days_in_month
     
-    for item in result:
-        day = item['_id']
+    for day, total in daily_totals.items():
         if 1 <= day <= days_in_month:
-            daily_data[day - 1] = item['total']
+            daily_data[day - 1] = total
     
     days = list(range(1, days_in_month + 1))
     
-    fig = go.Figure()
-    
-    fig.add_trace(go.Bar(
-        x=days,
-        y=daily_data,
-        name='Gastos Diários',
-        marker_color='#17a2b8',
-        hovertemplate='<b>Dia %{x}</b><br>' +
-                      'Gastos: R$ %{y:,.2f}<br>' +
-                      '<extra></extra>'
-    ))
-    
-    # 🔧 FIX: Adicionar linha da média apenas se houver dados
+    # Média só dos dias com gastos (sem gastos o navegador mostra um aviso)
     spending_days = [x for x in daily_data if x > 0]
-    if spending_days:  # Só calcular média se houver gastos
-        avg_spending = sum(spending_days) / len(spending_days)
-        fig.add_hline(
-            y=avg_spending,
-            line_dash="dash",
-            line_color="red",
-            annotation_text=f"Média: R$ {avg_spending:,.2f}"
-        )
-    else:
-        # Se não há gastos, adicionar uma anotação informativa
-        fig.add_annotation(
-            x=days_in_month // 2,
-            y=50,  # Valor fixo para posicionamento
-            text="Nenhum gasto registrado neste mês",
-            showarrow=False,
-            font=dict(size=14, color="gray"),
-            bgcolor="rgba(255,255,255,0.8)",
-            bordercolor="gray",
-            borderwidth=1
-        )
-    
-    fig.update_layout(
-        title=f'Gastos Diários - {now.strftime("%B %Y")}',
-        xaxis_title='Dia do Mês',
-        yaxis_title='Valor (R$)',
-        height=400,
-        margin=dict(t=50, b=50, l=50, r=50),
-        # Garantir que o eixo Y sempre apareça
-        yaxis=dict(range=[0, max(daily_data) * 1.1 if max(daily_data) > 0 else 100])
-    )
+    average = round(sum(spending_days) / len(spending_days), 2) if spending_days else None
     
-    return json.dumps(fig, cls=plotly.utils.PlotlyJSONEncoder)
+    return chart_payload('bar', f'Gastos Diários - {now.strftime("%B %Y")}', days, [
+        {'name': 'Gastos Diários', 'values': daily_data, 'color': '#17a2b8'}
+    ], average=average, x_title='Dia do Mês')
+
+# Geradores de cada gráfico com consultas próprias ao banco
+CHART_GENERATORS = {
+    'expenses_pie': generate_expenses_pie_chart,
+    'monthly_evolution': generate_monthly_evolution_chart,
+    'income_vs_expenses': generate_income_vs_expenses_chart,
+    'category_trends': generate_category_trends_chart,
+    'daily_spending': generate_daily_spending_chart
+}
+
+def get_chart(owner_id, owner_type, name, version=None):
+    """Um gráfico da visão geral (do cache, se houver versão, ou gerado agora)"""
+    key = chart_cache_key(owner_id, owner_type, name, version) if version is not None else None
+    if key:
+        cached = chart_cache.get(key)
+        if cached is not MISSING:
+            return cached
+    
+    chart = CHART_GENERATORS[name](owner_id, owner_type)
+    if key:
+        chart_cache.set(key, chart)
+    return chart
 
 # Funções auxiliares
-def get_month_summary(owner_id, owner_type, year, month):
-    """Resumo financeiro de um mês específico"""
-    from app.models import Transaction
-    try:
-        return Transaction.get_monthly_summary(owner_id, owner_type, year, month)
-    except:
-        return {'income': 0, 'expense': 0, 'balance': 0}
+def get_last_month_starts(count):
+    """Primeiro dia de cada um dos últimos `count` meses, do mais antigo ao atual"""
+    return get_month_starts(datetime.now(), count)
 
-def get_category_month_total(owner_id, owner_type, category, start_date, end_date):
-    """Total gasto em uma categoria em um período"""
-    
-    db = get_db()
-    pipeline = [
-        {
-            '$match': {
-                'owner_id': ObjectId(owner_id),
-                'owner_type': owner_type,
-                'category': category,
-                'type': 'expense',
-                'date': {'$gte': start_date, '$lt': end_date}
-            }
-        },
-        {
-            '$group': {
-                '_id': None,
-                'total': {'$sum': '$amount'}
-            }
-        }
-    ]
-    
-    result = list(db.transactions.aggregate(pipeline))
-    return result[0]['total'] if result else 0
\ No newline at end of file
+def get_period_summary(owner_id, owner_type, start, end):
+    """Resumos mensais de um intervalo de meses"""
+    from app.models import Transaction, MonthlyRollup
+    try:
+        return Transaction.get_period_summaries(owner_id, owner_type, start, end)
+    except Exception as e:
+        print(f"Erro ao obter resumos mensais: {e}")
+        return MonthlyRollup.empty_summaries(start, end)
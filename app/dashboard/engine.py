@@ -0,0 +1,142 @@
+from datetime import datetime, timedelta
+from app import get_db
+from app.models import Budget
+from bson.objectid import ObjectId
+
+# Janela máxima (em meses) lida pela visão geral
+OVERVIEW_WINDOW_MONTHS = 12
+
+def load_overview_data(owner_id, owner_type, recent_limit=10, include_charts=True):
+    """Carrega tudo o que a visão geral precisa em duas consultas: um $facet
+    sobre as transações dos últimos 12 meses (mais as recentes, sem limite de
+    data) e a lista de orçamentos
+
+    Com include_charts=False (gráficos já em cache) só o resumo do mês e as
+    transações recentes são calculados.
+    """
+
+    db = get_db()
+    now = datetime.now()
+    month_starts = get_month_starts(now, OVERVIEW_WINDOW_MONTHS)
+    window_start = month_starts[0]
+    trends_start = month_starts[-6]
+    current_month_start = month_starts[-1]
+
+    pipeline = [
+        {
+            '$match': {
+                'owner_id': ObjectId(owner_id),
+                'owner_type': owner_type,
+                'date': {'$gte': window_start}
+            }
+        },
+        {
+            '$facet': {
+                # Totais mensais por tipo (evolução, receitas vs despesas, resumo do mês)
+                'monthly': [
+                    {
+                        '$group': {
+                            '_id': {
+                                'year': {'$year': '$date'},
+                                'month': {'$month': '$date'},
+                                'type': '$type'
+                            },
+                            'total': {'$sum': '$amount'}
+                        }
+                    }
+                ],
+                # Gastos por categoria nos últimos 30 dias (pizza)
+                'expenses_by_category': [
+                    {'$match': {'type': 'expense', 'date': {'$gte': now - timedelta(days=30)}}},
+                    {'$group': {'_id': '$category', 'total': {'$sum': '$amount'}}},
+                    {'$sort': {'total': -1}},
+                    {'$limit': 10}
+                ],
+                # Top 5 categorias dos últimos 90 dias (tendências)
+                'top_categories': [
+                    {'$match': {'type': 'expense', 'date': {'$gte': now - timedelta(days=90)}}},
+                    {'$group': {'_id': '$category', 'total': {'$sum': '$amount'}}},
+                    {'$sort': {'total': -1}},
+                    {'$limit': 5}
+                ],
+                # Gastos mensais por categoria dos últimos 6 meses (tendências)
+                'category_months': [
+                    {'$match': {'type': 'expense', 'date': {'$gte': trends_start}}},
+                    {
+                        '$group': {
+                            '_id': {
+                                'category': '$category',
+                                'year': {'$year': '$date'},
+                                'month': {'$month': '$date'}
+                            },
+                            'total': {'$sum': '$amount'}
+                        }
+                    }
+                ],
+                # Gastos por dia do mês atual
+                'daily': [
+                    {'$match': {'type': 'expense', 'date': {'$gte': current_month_start}}},
+                    {'$group': {'_id': {'$dayOfMonth': '$date'}, 'total': {'$sum': '$amount'}}}
+                ]
+            }
+        },
+        # Transações recentes: subconsulta própria, sem o limite da janela de 12 meses
+        # (o $facet sempre emite um documento, então ela roda uma vez mesmo sem dados na janela)
+        {
+            '$lookup': {
+                'from': 'transactions',
+                'pipeline': [
+                    {'$match': {'owner_id': ObjectId(owner_id), 'owner_type': owner_type}},
+                    {'$sort': {'date': -1, '_id': -1}},
+                    {'$limit': recent_limit}
+                ],
+                'as': 'recent'
+            }
+        }
+    ]
+
+    if not include_charts:
+        facet = pipeline[1]['$facet']
+        pipeline[1]['$facet'] = {
+            'monthly': [{'$match': {'date': {'$gte': current_month_start}}}] + facet['monthly']
+        }
+
+    facets = next(db.transactions.aggregate(pipeline), {})
+
+    monthly_totals = {}
+    for start in month_starts:
+        monthly_totals[(start.year, start.month)] = {'income': 0, 'expense': 0, 'balance': 0}
+    for item in facets.get('monthly', []):
+        key = (item['_id']['year'], item['_id']['month'])
+        if key in monthly_totals and item['_id']['type'] in ('income', 'expense'):
+            monthly_totals[key][item['_id']['type']] = item['total']
+    for summary in monthly_totals.values():
+        summary['balance'] = summary['income'] - summary['expense']
+
+    category_months = {}
+    for item in facets.get('category_months', []):
+        key = (item['_id']['category'], item['_id']['year'], item['_id']['month'])
+        category_months[key] = item['total']
+
+    budgets = Budget.get_statuses(owner_id, owner_type)
+
+    return {
+        'month_starts': month_starts,
+        'monthly_totals': monthly_totals,
+        'monthly_summary': dict(monthly_totals[(now.year, now.month)]),
+        'expenses_by_category': facets.get('expenses_by_category', []),
+        'top_categories': [item['_id'] for item in facets.get('top_categories', [])],
+        'category_months': category_months,
+        'daily_spending': {item['_id']: item['total'] for item in facets.get('daily', [])},
+        'recent_transactions': facets.get('recent', []),
+        'budgets': budgets
+    }
+
+def get_month_starts(now, count):
+    """Primeiro dia de cada um dos últimos `count` meses até `now`, do mais antigo ao atual"""
+    current = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    months = []
+    for _ in range(count):
+        months.insert(0, current)
+        current = (current - timedelta(days=1)).replace(day=1)
+    return months
@@ -1,7 +1,14 @@
-from flask import Blueprint, flash, render_template, request, session, redirect, url_for, jsonify
+from flask import Blueprint, flash, render_template, request, session, redirect, url_for, jsonify, current_app
 from app.auth.routes import login_required
-from app.models import User, Transaction, Budget, Family
-from app.dashboard.charts import generate_charts_data
+from app.models import Transaction, Budget
+from app.context import load_user_context
+from app.dashboard.charts import (generate_charts_data, get_cached_charts, get_chart, chart_payload,
+                                  chart_timings, CHART_NAMES)
+from app.dashboard.cache import chart_cache, get_owner_version
+from app.dashboard.engine import load_overview_data
+from app.utils import encode_cursor, decode_cursor
+from app.queries import Query, run_query, run_query_async
+from app.storage import get_transaction_store, month_bounds
 from datetime import datetime, timedelta
 import calendar
 
@@ -14,54 +21,58 @@ def overview():
         user_id = session['user_id']
         print(f"🔍 Dashboard overview iniciado para user_id: {user_id}")
         
-        user = User.find_by_id(user_id)
+        # Usuário, famílias e conta ativa em uma consulta ($lookup), guardados em g
+        user_context = load_user_context()
         
-        if not user:
+        if not user_context:
             print(f"❌ Usuário não encontrado para ID: {user_id}")
             session.clear()
             return redirect(url_for('auth.login'))
         
+        user = user_context.user
         print(f"✅ Usuário encontrado: {user.name}")
         
         # 🔥 SEMPRE obter famílias do usuário
-        user_families = get_user_families(user)
+        user_families = user_context.families
         print(f"📊 Famílias encontradas: {len(user_families)}")
         
         # Determinar conta ativa (individual ou família)
         active_account = request.args.get('account', 'individual')
-        active_family_id = None
-        
-        if active_account == 'family' and hasattr(user, 'default_family') and user.default_family:
-            active_family_id = user.default_family
-            owner_type = 'family'
-            owner_id = active_family_id
-        else:
-            owner_type = 'individual'
-            owner_id = user_id
+        owner_id, owner_type = user_context.resolve_owner(active_account)
+        active_family_id = owner_id if owner_type == 'family' else None
         
         print(f"🎯 Conta ativa: {active_account}, Owner: {owner_type}")
         
-        # Resumo do mês atual - COM PROTEÇÃO
+        # Gráficos já serializados em cache para a versão atual dos dados do dono
         try:
-            monthly_summary = Transaction.get_monthly_summary(owner_id, owner_type)
-            print(f"💰 Resumo mensal carregado: {monthly_summary}")
+            data_version = get_owner_version(owner_id, owner_type)
+            cached_charts = get_cached_charts(owner_id, owner_type, data_version)
         except Exception as e:
-            print(f"Erro ao obter resumo mensal: {e}")
-            monthly_summary = {'income': 0, 'expense': 0, 'balance': 0}
+            print(f"Erro ao consultar cache de gráficos: {e}")
+            data_version = None
+            cached_charts = {}
         
-        # Transações recentes - COM PROTEÇÃO
+        # Dados da visão geral em uma única passada ($facet + orçamentos) - COM PROTEÇÃO
         try:
-            recent_transactions = Transaction.get_user_transactions(
-                user_id, owner_type, owner_id, limit=10
+            overview_data = load_overview_data(
+                owner_id, owner_type, include_charts=len(cached_charts) < len(CHART_NAMES)
             )
-            print(f"📝 Transações recentes: {len(recent_transactions)}")
+            monthly_summary = overview_data['monthly_summary']
+            recent_transactions = overview_data['recent_transactions']
+            budgets = overview_data['budgets']
+            print(f"💰 Resumo mensal carregado: {monthly_summary}")
         except Exception as e:
-            print(f"Erro ao obter transações recentes: {e}")
+            print(f"Erro ao carregar dados da visão geral: {e}")
+            overview_data = None
+            monthly_summary = {'income': 0, 'expense': 0, 'balance': 0}
             recent_transactions = []
+            budgets = []
         
         # Dados para gráficos - COM PROTEÇÃO
         try:
-            charts_data = generate_charts_data(owner_id, owner_type)
+            charts_data = generate_charts_data(
+                owner_id, owner_type, overview_data, version=data_version, cached=cached_charts
+            )
             print(f"📊 Gráficos gerados com sucesso")
         except Exception as e:
             print(f"Erro ao gerar gráficos: {e}")
@@ -73,14 +84,6 @@ def overview():
                 'daily_spending': None
             }
         
-        # Orçamentos - COM PROTEÇÃO
-        try:
-            budgets = get_user_budgets(owner_id, owner_type)
-            print(f"💰 Orçamentos carregados: {len(budgets)}")
-        except Exception as e:
-            print(f"Erro ao obter orçamentos: {e}")
-            budgets = []
-        
         context = {
             'user': user,
             'user_families': user_families,  # 🔥 SEMPRE incluir
@@ -104,36 +107,20 @@ def overview():
         flash('Erro no sistema. Faça login novamente.', 'error')
         return redirect(url_for('auth.login'))
 
-def get_user_families(user):
-    """Função auxiliar para obter famílias do usuário"""
-    user_families = []
-    try:
-        if user and hasattr(user, 'families') and user.families:
-            for family_id in user.families:
-                try:
-                    family = Family.find_by_id(family_id)
-                    if family:
-                        user_families.append(family)
-                except Exception as e:
-                    print(f"Erro ao carregar família {family_id}: {e}")
-                    continue
-    except Exception as e:
-        print(f"Erro ao obter famílias: {e}")
-    return user_families
-
 @dashboard.route('/transactions')
 @login_required
 def transactions():
     try:
-        user_id = session['user_id']
-        user = User.find_by_id(user_id)
+        user_context = load_user_context()
+        user = user_context.user
         
         # 🔥 SEMPRE obter famílias do usuário
-        user_families = get_user_families(user)
+        user_families = user_context.families
         
-        # Parâmetros de filtro
-        page = int(request.args.get('page', 1))
-        limit = int(request.args.get('limit', 20))
+        # Parâmetros de filtro (tamanho da página limitado no servidor)
+        after = request.args.get('after')
+        limit = request.args.get('limit', current_app.config.get('ITEMS_PER_PAGE', 20), type=int)
+        limit = min(max(limit, 1), current_app.config.get('TRANSACTIONS_MAX_PER_PAGE', 100))
         category = request.args.get('category')
         transaction_type = request.args.get('type')
         date_from = request.args.get('date_from')
@@ -141,41 +128,34 @@ def transactions():
         
         # Conta ativa
         active_account = request.args.get('account', 'individual')
-        if active_account == 'family' and user.default_family:
-            owner_type = 'family'
-            owner_id = user.default_family
-        else:
-            owner_type = 'individual'
-            owner_id = user_id
-        
-        # Buscar transações com filtros - COM PROTEÇÃO
-        try:
-            transactions = get_filtered_transactions(
-                owner_id, owner_type, page, limit, category, 
-                transaction_type, date_from, date_to
-            )
-        except Exception as e:
-            print(f"Erro ao buscar transações: {e}")
-            transactions = []
+        owner_id, owner_type = user_context.resolve_owner(active_account)
         
-        # Categorias para filtro - COM PROTEÇÃO
-        try:
-            categories = get_categories(owner_id, owner_type)
-        except Exception as e:
-            print(f"Erro ao buscar categorias: {e}")
-            categories = []
+        # Transações, total e contagens por categoria/tipo - COM PROTEÇÃO
+        result = get_filtered_transactions(
+            owner_id, owner_type, limit, category, 
+            transaction_type, date_from, date_to, after
+        )
         
         context = {
             'user': user,
             'user_families': user_families,  # 🔥 SEMPRE incluir
-            'transactions': transactions,
-            'categories': categories,
+            'transactions': result['transactions'],
+            'categories': [item['_id'] for item in result['category_counts']],
+            'category_counts': result['category_counts'],
+            'type_counts': result['type_counts'],
+            'total': result['total'],
+            'counts_partial': result['counts_partial'],
             'active_account': active_account,
             'filters': {
                 'category': category,
                 'type': transaction_type,
                 'date_from': date_from,
                 'date_to': date_to
+            },
+            'pagination': {
+                'limit': limit,
+                'after': after,
+                'next_cursor': result['next_cursor']
             }
         }
         
@@ -189,36 +169,26 @@ def transactions():
 @login_required
 def budgets():
     try:
-        user_id = session['user_id']
-        user = User.find_by_id(user_id)
+        user_context = load_user_context()
+        user = user_context.user
         
         # 🔥 SEMPRE obter famílias do usuário
-        user_families = get_user_families(user)
+        user_families = user_context.families
         
         # Conta ativa
         active_account = request.args.get('account', 'individual')
-        if active_account == 'family' and user.default_family:
-            owner_type = 'family'
-            owner_id = user.default_family
-        else:
-            owner_type = 'individual'
-            owner_id = user_id
+        owner_id, owner_type = user_context.resolve_owner(active_account)
         
         # Orçamentos - COM PROTEÇÃO
         try:
             budgets = get_user_budgets(owner_id, owner_type)
             
-            # Atualizar valores gastos
-            for budget in budgets:
-                try:
-                    budget_obj = Budget(owner_id, owner_type, budget['category'], budget['limit'])
-                    budget_obj._id = budget['_id']
-                    budget_obj.update_spent_amount()
-                    budget['current_spent'] = budget_obj.current_spent
-                    budget['percentage'] = (budget['current_spent'] / budget['limit']) * 100 if budget['limit'] > 0 else 0
-                    budget['remaining'] = budget['limit'] - budget['current_spent']
-                except Exception as e:
-                    print(f"Erro ao atualizar orçamento {budget.get('_id')}: {e}")
+            # Valores gastos de todos os orçamentos em uma agregação (sem gravar)
+            try:
+                Budget.get_statuses(owner_id, owner_type, budgets)
+            except Exception as e:
+                print(f"Erro ao calcular gastos dos orçamentos: {e}")
+                for budget in budgets:
                     budget['current_spent'] = 0
                     budget['percentage'] = 0
                     budget['remaining'] = budget['limit']
@@ -244,20 +214,15 @@ def budgets():
 @login_required
 def reports():
     try:
-        user_id = session['user_id']
-        user = User.find_by_id(user_id)
+        user_context = load_user_context()
+        user = user_context.user
         
         # 🔥 SEMPRE obter famílias do usuário
-        user_families = get_user_families(user)
+        user_families = user_context.families
         
         # Conta ativa
         active_account = request.args.get('account', 'individual')
-        if active_account == 'family' and user.default_family:
-            owner_type = 'family'
-            owner_id = user.default_family
-        else:
-            owner_type = 'individual'
-            owner_id = user_id
+        owner_id, owner_type = user_context.resolve_owner(active_account)
         
         # Período do relatório
         year = int(request.args.get('year', datetime.now().year))
@@ -297,16 +262,10 @@ def reports():
 @login_required
 def api_summary():
     try:
-        user_id = session['user_id']
-        user = User.find_by_id(user_id)
+        user_context = load_user_context()
         
         active_account = request.args.get('account', 'individual')
-        if active_account == 'family' and user.default_family:
-            owner_type = 'family'
-            owner_id = user.default_family
-        else:
-            owner_type = 'individual'
-            owner_id = user_id
+        owner_id, owner_type = user_context.resolve_owner(active_account)
         
         summary = Transaction.get_monthly_summary(owner_id, owner_type)
         return jsonify(summary)
@@ -319,25 +278,12 @@ def api_summary():
 @login_required
 def api_charts(chart_type):
     try:
-        user_id = session['user_id']
-        user = User.find_by_id(user_id)
+        user_context = load_user_context()
         
         active_account = request.args.get('account', 'individual')
-        if active_account == 'family' and user.default_family:
-            owner_type = 'family'
-            owner_id = user.default_family
-        else:
-            owner_type = 'individual'
-            owner_id = user_id
-        
-        if chart_type == 'expenses_by_category':
-            data = get_expenses_by_category(owner_id, owner_type)
-        elif chart_type == 'monthly_evolution':
-            data = get_monthly_evolution(owner_id, owner_type)
-        elif chart_type == 'income_vs_expenses':
-            data = get_income_vs_expenses(owner_id, owner_type)
-        else:
-            data = {}
+        owner_id, owner_type = user_context.resolve_owner(active_account)
+        
+        data = get_api_chart(owner_id, owner_type, chart_type)
         
         return jsonify(data)
         
@@ -345,6 +291,25 @@ def api_charts(chart_type):
         print(f"Erro na API charts: {e}")
         return jsonify({}), 500
 
+@dashboard.route('/api/cache/stats')
+@login_required
+def api_cache_stats():
+    """Contadores de acerto/falha do cache de gráficos"""
+    return jsonify(chart_cache.stats())
+
+@dashboard.route('/api/charts/timings')
+@login_required
+def api_chart_timings():
+    """Duração da geração de cada gráfico da visão geral"""
+    return jsonify(chart_timings.stats())
+
+@dashboard.route('/api/db/stats')
+@login_required
+def api_db_stats():
+    """Métricas do pool de conexões do MongoDB deste worker (espera no checkout, uso)"""
+    from app.database import database
+    return jsonify(database.stats())
+
 # Funções auxiliares - COM PROTEÇÃO DE ERRO
 def get_user_budgets(owner_id, owner_type):
     try:
@@ -361,8 +326,24 @@ def get_user_budgets(owner_id, owner_type):
         print(f"Erro ao buscar orçamentos: {e}")
         return []
 
-def get_filtered_transactions(owner_id, owner_type, page, limit, category, 
-                            transaction_type, date_from, date_to):
+# Campos exibidos em dashboard/transactions.html
+TRANSACTION_LIST_FIELDS = {
+    'date': 1, 'description': 1, 'payment_method': 1, 'category': 1, 'type': 1, 'amount': 1
+}
+
+def get_filtered_transactions(owner_id, owner_type, limit, category, 
+                            transaction_type, date_from, date_to, after=None):
+    """Página de transações, total e contagens por categoria/tipo (duas leituras)
+    
+    - transactions: find indexado (dono + filtros, ordenado por (date, _id)) a
+      partir do cursor da página (keyset), com projeção e limit + 1 itens
+    - total, category_counts, type_counts: um $facet sobre as
+      TRANSACTIONS_COUNT_THRESHOLD transações mais recentes do dono/período
+      ($limit antes dos grupos). Se a janela encheu, as contagens são parciais
+      (limites inferiores) e counts_partial fica True.
+    """
+    empty = {'transactions': [], 'next_cursor': None, 'total': 0, 'counts_partial': False,
+             'type_counts': {}, 'category_counts': []}
     try:
         from app import get_db
         from bson.objectid import ObjectId
@@ -373,12 +354,6 @@ def get_filtered_transactions(owner_id, owner_type, page, limit, category,
             'owner_type': owner_type
         }
         
-        if category:
-            query['category'] = category
-        
-        if transaction_type:
-            query['type'] = transaction_type
-        
         if date_from or date_to:
             date_query = {}
             if date_from:
@@ -387,192 +362,199 @@ def get_filtered_transactions(owner_id, owner_type, page, limit, category,
                 date_query['$lte'] = datetime.strptime(date_to, '%Y-%m-%d')
             query['date'] = date_query
         
-        skip = (page - 1) * limit
-        transactions = db.transactions.find(query).sort('date', -1).skip(skip).limit(limit)
-        
-        return list(transactions)
-    except Exception as e:
-        print(f"Erro ao filtrar transações: {e}")
-        return []
-
-def get_categories(owner_id, owner_type):
-    try:
-        from app import get_db
-        from bson.objectid import ObjectId
-        
-        db = get_db()
-        pipeline = [
-            {'$match': {'owner_id': ObjectId(owner_id), 'owner_type': owner_type}},
-            {'$group': {'_id': '$category'}},
-            {'$sort': {'_id': 1}}
-        ]
-        
-        result = db.transactions.aggregate(pipeline)
-        return [item['_id'] for item in result if item['_id']]
-    except Exception as e:
-        print(f"Erro ao buscar categorias: {e}")
-        return []
-
-def get_expenses_by_category(owner_id, owner_type):
-    try:
-        from app import get_db
-        from bson.objectid import ObjectId
-        
-        db = get_db()
-        # Últimos 30 dias
-        start_date = datetime.now() - timedelta(days=30)
+        category_filter = {'category': category} if category else {}
+        type_filter = {'type': transaction_type} if transaction_type else {}
+        filtered_query = {**query, **category_filter, **type_filter}
+        
+        # Continuar depois da última transação da página anterior
+        page_query = dict(filtered_query)
+        position = decode_cursor(after) if after else None
+        if position:
+            last_date, last_id = position
+            page_query['$or'] = [
+                {'date': {'$lt': last_date}},
+                {'date': last_date, '_id': {'$lt': last_id}}
+            ]
+        
+        transactions = list(
+            db.transactions.find(page_query, TRANSACTION_LIST_FIELDS)
+            .sort([('date', -1), ('_id', -1)])
+            .limit(limit + 1)
+        )
+        next_cursor = None
+        if len(transactions) > limit:
+            transactions = transactions[:limit]
+            next_cursor = encode_cursor(transactions[-1]['date'], transactions[-1]['_id'])
         
+        # Contagens limitadas às transações mais recentes (nunca o histórico inteiro)
+        threshold = current_app.config.get('TRANSACTIONS_COUNT_THRESHOLD', 10000)
         pipeline = [
+            {'$match': query},
+            {'$sort': {'date': -1, '_id': -1}},
+            {'$limit': threshold},
             {
-                '$match': {
-                    'owner_id': ObjectId(owner_id),
-                    'owner_type': owner_type,
-                    'type': 'expense',
-                    'date': {'$gte': start_date}
+                '$facet': {
+                    'window': [{'$count': 'count'}],
+                    'category_counts': [
+                        {'$match': type_filter},
+                        {'$group': {'_id': '$category', 'count': {'$sum': 1}}},
+                        {'$sort': {'_id': 1}}
+                    ],
+                    'type_counts': [
+                        {'$match': category_filter},
+                        {'$group': {'_id': '$type', 'count': {'$sum': 1}}}
+                    ]
                 }
-            },
-            {
-                '$group': {
-                    '_id': '$category',
-                    'total': {'$sum': '$amount'},
-                    'count': {'$sum': 1}
-                }
-            },
-            {'$sort': {'total': -1}}
+            }
         ]
+        facets = next(db.transactions.aggregate(pipeline), {})
         
-        result = list(db.transactions.aggregate(pipeline))
+        window = facets.get('window') or [{'count': 0}]
+        type_counts = {item['_id']: item['count'] for item in facets.get('type_counts', [])}
+        if transaction_type:
+            total = type_counts.get(transaction_type, 0)
+        else:
+            total = sum(type_counts.values())
         
         return {
-            'labels': [item['_id'] for item in result],
-            'values': [item['total'] for item in result]
+            'transactions': transactions,
+            'next_cursor': next_cursor,
+            'total': total,
+            'counts_partial': window[0]['count'] >= threshold,
+            'type_counts': type_counts,
+            'category_counts': [item for item in facets.get('category_counts', []) if item['_id']]
         }
     except Exception as e:
-        print(f"Erro em expenses_by_category: {e}")
-        return {'labels': [], 'values': []}
+        print(f"Erro ao filtrar transações: {e}")
+        return empty
 
-def get_monthly_evolution(owner_id, owner_type):
-    try:
-        from app import get_db
-        from bson.objectid import ObjectId
-        
-        db = get_db()
-        # Últimos 12 meses
-        end_date = datetime.now()
-        start_date = end_date - timedelta(days=365)
-        
-        pipeline = [
-            {
-                '$match': {
-                    'owner_id': ObjectId(owner_id),
-                    'owner_type': owner_type,
-                    'date': {'$gte': start_date, '$lte': end_date}
-                }
-            },
-            {
-                '$group': {
-                    '_id': {
-                        'year': {'$year': '$date'},
-                        'month': {'$month': '$date'},
-                        'type': '$type'
-                    },
-                    'total': {'$sum': '$amount'}
-                }
-            },
-            {'$sort': {'_id.year': 1, '_id.month': 1}}
-        ]
-        
-        result = list(db.transactions.aggregate(pipeline))
-        
+def expenses_by_category_query(owner_id, owner_type):
+    """Gastos por categoria dos últimos 30 dias"""
+    from bson.objectid import ObjectId
+    
+    # Últimos 30 dias
+    start_date = datetime.now() - timedelta(days=30)
+    
+    pipeline = [
+        {
+            '$match': {
+                'owner_id': ObjectId(owner_id),
+                'owner_type': owner_type,
+                'type': 'expense',
+                'date': {'$gte': start_date}
+            }
+        },
+        {
+            '$group': {
+                '_id': '$category',
+                'total': {'$sum': '$amount'},
+                'count': {'$sum': 1}
+            }
+        },
+        {'$sort': {'total': -1}}
+    ]
+    
+    def shape(result):
+        return chart_payload('pie', 'Gastos por Categoria (Últimos 30 dias)',
+                             [item['_id'] for item in result],
+                             [{'name': 'Gastos', 'values': [item['total'] for item in result]}])
+    
+    return Query('transactions', pipeline, shape)
+
+def monthly_evolution_query(owner_id, owner_type):
+    """Receitas e despesas mês a mês dos últimos 12 meses"""
+    from app.reports.timeseries import month_range
+    
+    # Últimos 12 meses (do mês de um ano atrás até o atual)
+    end_date = datetime.now()
+    start_date = end_date - timedelta(days=365)
+    months = month_range((start_date.year, start_date.month), (end_date.year, end_date.month))
+    
+    query = get_transaction_store().monthly_totals_query(owner_id, owner_type, months[0], months[-1])
+    
+    def shape(result):
         # Organizar dados para o gráfico
-        months = []
-        income_data = []
-        expense_data = []
-        
-        # Criar estrutura dos últimos 12 meses
-        current = start_date.replace(day=1)
-        while current <= end_date:
-            month_key = f"{current.year}-{current.month:02d}"
-            months.append(month_key)
-            
-            # Buscar dados do mês
-            month_income = 0
-            month_expense = 0
-            
-            for item in result:
-                if (item['_id']['year'] == current.year and 
-                    item['_id']['month'] == current.month):
-                    if item['_id']['type'] == 'income':
-                        month_income = item['total']
-                    elif item['_id']['type'] == 'expense':
-                        month_expense = item['total']
-            
-            income_data.append(month_income)
-            expense_data.append(month_expense)
-            
-            # Próximo mês
-            if current.month == 12:
-                current = current.replace(year=current.year + 1, month=1)
-            else:
-                current = current.replace(month=current.month + 1)
-        
-        return {
-            'labels': months,
-            'income': income_data,
-            'expenses': expense_data
-        }
-    except Exception as e:
-        print(f"Erro em monthly_evolution: {e}")
-        return {'labels': [], 'income': [], 'expenses': []}
+        totals = {(item['year'], item['month'], item['type']): item['total'] for item in result}
+        
+        return chart_payload('line', 'Evolução Financeira (Últimos 12 meses)',
+                             [f"{year}-{month:02d}" for year, month in months], [
+            {'name': 'Receitas', 'values': [totals.get((year, month, 'income'), 0) for year, month in months],
+             'color': '#28a745'},
+            {'name': 'Despesas', 'values': [totals.get((year, month, 'expense'), 0) for year, month in months],
+             'color': '#dc3545'}
+        ])
+    
+    return query._replace(shape=lambda result: shape(query.shape(result)))
 
-def get_income_vs_expenses(owner_id, owner_type):
-    try:
-        from app import get_db
-        from bson.objectid import ObjectId
-        
-        db = get_db()
-        # Últimos 6 meses
-        pipeline = [
-            {
-                '$match': {
-                    'owner_id': ObjectId(owner_id),
-                    'owner_type': owner_type,
-                    'date': {'$gte': datetime.now() - timedelta(days=180)}
-                }
-            },
-            {
-                '$group': {
-                    '_id': '$type',
-                    'total': {'$sum': '$amount'}
-                }
+def income_vs_expenses_query(owner_id, owner_type):
+    """Total de receitas e despesas dos últimos 6 meses"""
+    from bson.objectid import ObjectId
+    
+    # Últimos 6 meses
+    pipeline = [
+        {
+            '$match': {
+                'owner_id': ObjectId(owner_id),
+                'owner_type': owner_type,
+                'date': {'$gte': datetime.now() - timedelta(days=180)}
             }
-        ]
-        
-        result = list(db.transactions.aggregate(pipeline))
-        
+        },
+        {
+            '$group': {
+                '_id': '$type',
+                'total': {'$sum': '$amount'}
+            }
+        }
+    ]
+    
+    def shape(result):
         data = {'income': 0, 'expense': 0}
         for item in result:
             data[item['_id']] = item['total']
         
-        return {
-            'labels': ['Receitas', 'Despesas'],
-            'values': [data['income'], data['expense']]
-        }
-    except Exception as e:
-        print(f"Erro em income_vs_expenses: {e}")
-        return {'labels': ['Receitas', 'Despesas'], 'values': [0, 0]}
+        return chart_payload('bar', 'Receitas vs Despesas (Últimos 6 meses)', ['Receitas', 'Despesas'], [
+            {'name': 'Total', 'values': [data['income'], data['expense']]}
+        ])
+    
+    return Query('transactions', pipeline, shape)
+
+# Consultas dos gráficos da API, por tipo (compartilhadas com a API assíncrona)
+CHART_QUERIES = {
+    'expenses_by_category': expenses_by_category_query,
+    'monthly_evolution': monthly_evolution_query,
+    'income_vs_expenses': income_vs_expenses_query
+}
+
+def get_api_chart(owner_id, owner_type, chart_type):
+    """Dados de /api/charts/<chart_type>: consulta de CHART_QUERIES ou um dos
+    gráficos da visão geral (CHART_NAMES), lido do mesmo cache da página"""
+    from app import get_db
+    
+    query = CHART_QUERIES.get(chart_type)
+    if query:
+        return run_query(get_db(), query(owner_id, owner_type))
+    if chart_type in CHART_NAMES:
+        return get_chart(owner_id, owner_type, chart_type, get_owner_version(owner_id, owner_type))
+    return {}
+
+async def get_api_chart_async(db, owner_id, owner_type, chart_type):
+    """Mesma resolução de get_api_chart para a API ASGI (driver assíncrono)
+    
+    Os gráficos da visão geral passam pelo cache compartilhado; a leitura do
+    cache e a geração síncrona rodam em uma thread, fora do event loop.
+    """
+    import asyncio
+    
+    query = CHART_QUERIES.get(chart_type)
+    if query:
+        return await run_query_async(db, query(owner_id, owner_type))
+    if chart_type in CHART_NAMES:
+        return await asyncio.to_thread(get_api_chart, owner_id, owner_type, chart_type)
+    return {}
 
 def generate_monthly_report(owner_id, owner_type, year, month):
     try:
-        from app import get_db
-        from bson.objectid import ObjectId
-        
-        db = get_db()
-        start_date = datetime(year, month, 1)
-        if month == 12:
-            end_date = datetime(year + 1, 1, 1)
-        else:
-            end_date = datetime(year, month + 1, 1)
+        start_date, end_date = month_bounds(year, month)
         
         # Resumo geral
         summary = Transaction.get_monthly_summary(owner_id, owner_type, year, month)
@@ -600,27 +582,13 @@ def generate_monthly_report(owner_id, owner_type, year, month):
 
 def generate_yearly_report(owner_id, owner_type, year):
     try:
-        from app import get_db
-        from bson.objectid import ObjectId
-        
-        db = get_db()
-        start_date = datetime(year, 1, 1)
-        end_date = datetime(year + 1, 1, 1)
-        
-        # Resumo por mês
+        # Resumo por mês (uma leitura dos totais mensais materializados)
+        summaries = Transaction.get_period_summaries(owner_id, owner_type, (year, 1), (year, 12))
         monthly_summaries = []
         for month in range(1, 13):
-            try:
-                summary = Transaction.get_monthly_summary(owner_id, owner_type, year, month)
-                summary['month'] = calendar.month_name[month]
-                monthly_summaries.append(summary)
-            except:
-                monthly_summaries.append({
-                    'month': calendar.month_name[month],
-                    'income': 0,
-                    'expense': 0,
-                    'balance': 0
-                })
+            summary = summaries[(year, month)]
+            summary['month'] = calendar.month_name[month]
+            monthly_summaries.append(summary)
         
         # Resumo anual
         total_income = sum(m['income'] for m in monthly_summaries)
@@ -641,47 +609,17 @@ def generate_yearly_report(owner_id, owner_type, year):
 
 def get_expenses_by_category_period(owner_id, owner_type, start_date, end_date):
     try:
-        from app import get_db
-        from bson.objectid import ObjectId
+        totals = get_transaction_store().period_totals(owner_id, owner_type, start_date, end_date, 'expense')
         
-        db = get_db()
-        pipeline = [
-            {
-                '$match': {
-                    'owner_id': ObjectId(owner_id),
-                    'owner_type': owner_type,
-                    'type': 'expense',
-                    'date': {'$gte': start_date, '$lt': end_date}
-                }
-            },
-            {
-                '$group': {
-                    '_id': '$category',
-                    'total': {'$sum': '$amount'},
-                    'count': {'$sum': 1}
-                }
-            },
-            {'$sort': {'total': -1}}
-        ]
-        
-        return list(db.transactions.aggregate(pipeline))
+        expenses = [{'_id': item['category'], 'total': item['total'], 'count': item['count']} for item in totals]
+        return sorted(expenses, key=lambda item: item['total'], reverse=True)
     except Exception as e:
         print(f"Erro em get_expenses_by_category_period: {e}")
         return []
 
 def get_period_transactions(owner_id, owner_type, start_date, end_date):
     try:
-        from app import get_db
-        from bson.objectid import ObjectId
-        
-        db = get_db()
-        transactions = db.transactions.find({
-            'owner_id': ObjectId(owner_id),
-            'owner_type': owner_type,
-            'date': {'$gte': start_date, '$lt': end_date}
-        }).sort('date', -1)
-        
-        return list(transactions)
+        return list(get_transaction_store().find_transactions(owner_id, owner_type, start_date, end_date))
     except Exception as e:
         print(f"Erro em get_period_transactions: {e}")
         return []
\ No newline at end of file
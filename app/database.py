@@ -0,0 +1,200 @@
+import importlib.util
+import os
+import threading
+import time
+from pymongo import MongoClient, monitoring
+
+# Nome do banco usado pela aplicação
+DB_NAME = 'financedash'
+
+# Biblioteca necessária para cada compressor (zlib é da biblioteca padrão)
+COMPRESSOR_MODULES = {'zstd': 'zstandard', 'snappy': 'snappy', 'zlib': 'zlib'}
+
+class PoolMetrics(monitoring.ConnectionPoolListener):
+    """Métricas do pool de conexões: checkouts, tempo de espera e conexões em uso"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.checkouts = 0
+            self.checkout_failures = 0
+            self.timeouts = 0
+            self.wait_total = 0.0
+            self.wait_max = 0.0
+            self.in_use = 0
+            self.in_use_max = 0
+            self.connections_created = 0
+            self.connections_closed = 0
+            self.pool_clears = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                'checkouts': self.checkouts,
+                'checkout_failures': self.checkout_failures,
+                'timeouts': self.timeouts,
+                'wait_avg_ms': (self.wait_total / self.checkouts * 1000) if self.checkouts else 0,
+                'wait_max_ms': self.wait_max * 1000,
+                'in_use': self.in_use,
+                'in_use_max': self.in_use_max,
+                'connections_created': self.connections_created,
+                'connections_closed': self.connections_closed,
+                'pool_clears': self.pool_clears
+            }
+
+    def connection_check_out_started(self, event):
+        self._local.started = time.perf_counter()
+
+    def connection_checked_out(self, event):
+        wait = self._wait_time(event)
+        with self._lock:
+            self.checkouts += 1
+            self.wait_total += wait
+            self.wait_max = max(self.wait_max, wait)
+            self.in_use += 1
+            self.in_use_max = max(self.in_use_max, self.in_use)
+
+    def connection_check_out_failed(self, event):
+        self._wait_time(event)
+        with self._lock:
+            self.checkout_failures += 1
+            if event.reason == monitoring.ConnectionCheckOutFailedReason.TIMEOUT:
+                self.timeouts += 1
+
+    def connection_checked_in(self, event):
+        with self._lock:
+            self.in_use = max(self.in_use - 1, 0)
+
+    def connection_created(self, event):
+        with self._lock:
+            self.connections_created += 1
+
+    def connection_closed(self, event):
+        with self._lock:
+            self.connections_closed += 1
+
+    def pool_cleared(self, event):
+        with self._lock:
+            self.pool_clears += 1
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_ready(self, event):
+        pass
+
+    def _wait_time(self, event):
+        # pymongo >= 4.7 informa a duração no próprio evento
+        duration = getattr(event, 'duration', None)
+        started = getattr(self._local, 'started', None)
+        self._local.started = None
+        if duration is not None:
+            return duration
+        return time.perf_counter() - started if started else 0.0
+
+class Database:
+    """Cliente MongoDB preguiçoso e seguro para fork (um cliente por processo)
+
+    O cliente só é criado no primeiro acesso dentro de cada worker, então
+    servidores com preload (gunicorn --preload) não herdam sockets do processo pai.
+    """
+
+    def __init__(self):
+        self.config = {}
+        self.metrics = PoolMetrics()
+        self._client = None
+        self._db = None
+        self._pid = None
+        self._async_client = None
+        self._async_pid = None
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.config = app.config
+
+    @property
+    def client(self):
+        self._ensure_connected()
+        return self._client
+
+    @property
+    def db(self):
+        self._ensure_connected()
+        return self._db
+
+    def _ensure_connected(self):
+        if self._client is None or self._pid != os.getpid():
+            with self._lock:
+                if self._client is None or self._pid != os.getpid():
+                    self._connect()
+
+    def _connect(self):
+        # Não fechar o cliente herdado: os sockets pertencem ao processo pai
+        if self._pid != os.getpid():
+            self.metrics.reset()
+
+        mongo_uri = self.config.get('MONGO_URI')
+        print(f"🔗 Conectando ao MongoDB (pid {os.getpid()}): {mongo_uri}")
+
+        self._client = MongoClient(mongo_uri, **get_client_options(self.config),
+                                   event_listeners=[self.metrics])
+        self._db = self._client[DB_NAME]
+        self._pid = os.getpid()
+
+    @property
+    def async_db(self):
+        """Banco no driver assíncrono (AsyncMongoClient), usado pela variante ASGI"""
+        if self._async_client is None or self._async_pid != os.getpid():
+            with self._lock:
+                if self._async_client is None or self._async_pid != os.getpid():
+                    from pymongo import AsyncMongoClient
+                    self._async_client = AsyncMongoClient(self.config.get('MONGO_URI'),
+                                                          **get_client_options(self.config),
+                                                          event_listeners=[self.metrics])
+                    self._async_pid = os.getpid()
+        return self._async_client[DB_NAME]
+
+    def ping(self):
+        return self.client.admin.command('ping')
+
+    def stats(self):
+        stats = self.metrics.stats()
+        stats['pid'] = self._pid
+        stats['options'] = get_client_options(self.config)
+        return stats
+
+def get_client_options(config):
+    """Opções do pool e de compressão a partir da configuração"""
+    options = {
+        'maxPoolSize': config.get('MONGO_MAX_POOL_SIZE', 100),
+        'minPoolSize': config.get('MONGO_MIN_POOL_SIZE', 0),
+        'maxIdleTimeMS': config.get('MONGO_MAX_IDLE_TIME_MS'),
+        'waitQueueTimeoutMS': config.get('MONGO_WAIT_QUEUE_TIMEOUT_MS')
+    }
+
+    compressors = get_available_compressors(config.get('MONGO_COMPRESSORS', ''))
+    if compressors:
+        options['compressors'] = compressors
+
+    return {key: value for key, value in options.items() if value is not None}
+
+def get_available_compressors(compressors):
+    """Filtra os compressores configurados pelos que têm biblioteca instalada"""
+    available = []
+    for name in [c.strip() for c in (compressors or '').split(',') if c.strip()]:
+        module = COMPRESSOR_MODULES.get(name)
+        if module and importlib.util.find_spec(module) is not None:
+            available.append(name)
+    return available
+
+database = Database()
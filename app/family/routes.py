@@ -1,6 +1,9 @@
 from flask import Blueprint, render_template, request, redirect, url_for, flash, session, jsonify
 from app.auth.routes import login_required
 from app.models import User, Family
+from app.queries import Query, run_query
+from app.notifications.engine import schedule_notification_evaluation
+from app.permissions import bump_permissions_version, discard_permission_snapshot
 from bson.objectid import ObjectId
 from datetime import datetime
 import secrets
@@ -39,9 +42,12 @@ def create_family():
                 {'_id': ObjectId(user_id)},
                 {
                     '$push': {'families': family_id},
-                    '$set': {'default_family': family_id}
+                    '$set': {'default_family': family_id},
+                    '$inc': {'permissions_version': 1}
                 }
             )
+            User.forget(user_id)
+            discard_permission_snapshot(user_id)
             
             if request.is_json:
                 return jsonify({
@@ -83,10 +89,11 @@ def manage(family_id):
             flash('Família não encontrada', 'error')
             return redirect(url_for('dashboard.overview'))
         
-        # Buscar dados dos membros
+        # Buscar dados dos membros (todos com um único $in)
+        member_users = User.find_many_by_ids([member['user_id'] for member in family_obj.members])
         members_data = []
         for member in family_obj.members:
-            member_user = User.find_by_id(member['user_id'])
+            member_user = member_users.get(member['user_id'])
             if member_user:
                 members_data.append({
                     'user': member_user,
@@ -168,6 +175,7 @@ def invite():
             }
             
             db.invites.insert_one(invite_data)
+            schedule_notification_evaluation(invited_user._id)
             
             # TODO: Enviar email com convite
             # send_invite_email(invited_user.email, family_obj.name, invite_code)
@@ -250,9 +258,10 @@ def join():
                 {'_id': family_obj._id},
                 {'$set': {'members': family_obj.members}}
             )
+            Family.forget(family_obj._id)
             
             # Adicionar família ao usuário
-            user_update = {'$push': {'families': family_obj._id}}
+            user_update = {'$push': {'families': family_obj._id}, '$inc': {'permissions_version': 1}}
             
             # Se é a primeira família, definir como padrão
             user = User.find_by_id(user_id)
@@ -263,12 +272,15 @@ def join():
                 {'_id': ObjectId(user_id)},
                 user_update
             )
+            User.forget(user_id)
+            discard_permission_snapshot(user_id)
             
             # Marcar convite como aceito
             db.invites.update_one(
                 {'_id': invite['_id']},
                 {'$set': {'status': 'accepted', 'accepted_at': datetime.utcnow()}}
             )
+            schedule_notification_evaluation(user_id)
             
             if request.is_json:
                 return jsonify({
@@ -324,7 +336,7 @@ def leave_family(family_id):
             }), 400
         
         # Remover das famílias do usuário
-        user_update = {'$pull': {'families': ObjectId(family_id)}}
+        user_update = {'$pull': {'families': ObjectId(family_id)}, '$inc': {'permissions_version': 1}}
         
         # Se era a família padrão, limpar
         user = User.find_by_id(user_id)
@@ -339,12 +351,15 @@ def leave_family(family_id):
             user_update['$set'] = {'default_family': other_family}
         
         db.users.update_one({'_id': ObjectId(user_id)}, user_update)
+        User.forget(user_id)
+        discard_permission_snapshot(user_id)
         
         # Remover da lista de membros da família
         db.families.update_one(
             {'_id': ObjectId(family_id)},
             {'$pull': {'members': {'user_id': ObjectId(user_id)}}}
         )
+        Family.forget(family_id)
         
         return jsonify({'success': True, 'message': 'Você saiu da família'})
         
@@ -384,9 +399,10 @@ def remove_member():
             {'_id': ObjectId(family_id)},
             {'$pull': {'members': {'user_id': ObjectId(member_id)}}}
         )
+        Family.forget(family_id)
         
         # Remover do usuário
-        user_update = {'$pull': {'families': ObjectId(family_id)}}
+        user_update = {'$pull': {'families': ObjectId(family_id)}, '$inc': {'permissions_version': 1}}
         
         # Se era família padrão, limpar
         member_user = User.find_by_id(member_id)
@@ -399,6 +415,7 @@ def remove_member():
             user_update['$set'] = {'default_family': other_family}
         
         db.users.update_one({'_id': ObjectId(member_id)}, user_update)
+        User.forget(member_id)
         
         return jsonify({'success': True, 'message': 'Membro removido da família'})
         
@@ -459,6 +476,8 @@ def change_member_role():
                 }
             }
         )
+        Family.forget(family_id)
+        bump_permissions_version(member_id)
         
         return jsonify({'success': True, 'message': 'Papel alterado com sucesso'})
         
@@ -485,6 +504,7 @@ def switch_family(family_id):
             {'_id': ObjectId(user_id)},
             {'$set': {'default_family': ObjectId(family_id)}}
         )
+        User.forget(user_id)
         
         family_obj = Family.find_by_id(family_id)
         flash(f'Trocado para família: {family_obj.name}', 'success')
@@ -540,6 +560,7 @@ def family_settings(family_id):
                     {'_id': ObjectId(family_id)},
                     {'$set': settings_update}
                 )
+                Family.forget(family_id)
                 
                 if request.is_json:
                     return jsonify({'success': True, 'message': 'Configurações atualizadas'})
@@ -604,32 +625,41 @@ def api_family_stats(family_id):
         if ObjectId(family_id) not in user.families:
             return jsonify({'error': 'Sem acesso'}), 403
         
-        from app.models import Transaction
         from app import get_db
         
         db = get_db()
+        results = [run_query(db, query) for query in family_stats_queries(family_id)]
+        stats = combine_family_stats(*results)
         
-        # Resumo do mês atual
-        summary = Transaction.get_monthly_summary(family_id, 'family')
+        return jsonify(stats)
         
+    except Exception as e:
+        return jsonify({'error': 'Erro ao buscar estatísticas'}), 500
+
+# Funções auxiliares
+def family_stats_queries(family_id):
+    """Consultas independentes das estatísticas da família (paralelas na API assíncrona)"""
+    from app.models import Transaction
+    
+    family_match = {'owner_id': ObjectId(family_id), 'owner_type': 'family'}
+    
+    return [
+        # Resumo do mês atual
+        Transaction.monthly_summary_query(family_id, 'family'),
         # Contadores
-        family_data = db.families.find_one(
-            {'_id': ObjectId(family_id)},
-            {'members': 1}
-        )
-        member_count = len(family_data['members']) if family_data else 0
-        
-        transaction_count = db.transactions.count_documents({
-            'owner_id': ObjectId(family_id),
-            'owner_type': 'family'
-        })
-        
-        # Membro que mais gastou este mês
-        top_spender_pipeline = [
+        Query('families', [
+            {'$match': {'_id': ObjectId(family_id)}},
+            {'$project': {'member_count': {'$size': '$members'}}}
+        ], lambda result: result[0]['member_count'] if result else 0),
+        Query('transactions', [
+            {'$match': family_match},
+            {'$count': 'total'}
+        ], lambda result: result[0]['total'] if result else 0),
+        # Membro que mais gastou este mês (nome resolvido no próprio pipeline)
+        Query('transactions', [
             {
                 '$match': {
-                    'owner_id': ObjectId(family_id),
-                    'owner_type': 'family',
+                    **family_match,
                     'type': 'expense',
                     'date': {
                         '$gte': datetime.now().replace(day=1),
@@ -644,33 +674,27 @@ def api_family_stats(family_id):
                 }
             },
             {'$sort': {'total': -1}},
-            {'$limit': 1}
-        ]
-        
-        top_spender_result = list(db.transactions.aggregate(top_spender_pipeline))
-        top_spender = None
-        
-        if top_spender_result:
-            top_spender_user = User.find_by_id(top_spender_result[0]['_id'])
-            if top_spender_user:
-                top_spender = {
-                    'name': top_spender_user.name,
-                    'amount': top_spender_result[0]['total']
-                }
-        
-        stats = {
-            'summary': summary,
-            'member_count': member_count,
-            'transaction_count': transaction_count,
-            'top_spender': top_spender
+            {'$limit': 1},
+            {'$lookup': {'from': 'users', 'localField': '_id', 'foreignField': '_id', 'as': 'user'}}
+        ], shape_top_spender)
+    ]
+
+def shape_top_spender(result):
+    if result and result[0]['user']:
+        return {
+            'name': result[0]['user'][0]['name'],
+            'amount': result[0]['total']
         }
-        
-        return jsonify(stats)
-        
-    except Exception as e:
-        return jsonify({'error': 'Erro ao buscar estatísticas'}), 500
+    return None
+
+def combine_family_stats(summary, member_count, transaction_count, top_spender):
+    return {
+        'summary': summary,
+        'member_count': member_count,
+        'transaction_count': transaction_count,
+        'top_spender': top_spender
+    }
 
-# Funções auxiliares
 def get_user_role_in_family(user_id, family_obj):
     """Retorna o papel do usuário na família"""
     for member in family_obj.members:
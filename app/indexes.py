@@ -0,0 +1,188 @@
+from datetime import datetime
+from bson.objectid import ObjectId
+from pymongo import ASCENDING, DESCENDING
+from pymongo.errors import OperationFailure
+
+# Registro declarativo de índices: (coleção, chaves, opções)
+INDEXES = [
+    # Usuários
+    ('users', [('email', ASCENDING)], {'name': 'email_unique', 'unique': True}),
+
+    # Transações por dono (listagens, resumos, gráficos, relatórios)
+    # (_id no final: paginação por keyset em (date, _id) sem ordenação em memória)
+    ('transactions', [('owner_id', ASCENDING), ('owner_type', ASCENDING), ('date', DESCENDING),
+                      ('_id', DESCENDING)],
+     {'name': 'owner_date_id'}),
+    ('transactions', [('owner_id', ASCENDING), ('owner_type', ASCENDING), ('type', ASCENDING),
+                      ('date', DESCENDING), ('_id', DESCENDING)],
+     {'name': 'owner_type_date_id'}),
+    ('transactions', [('owner_id', ASCENDING), ('owner_type', ASCENDING), ('category', ASCENDING),
+                      ('date', DESCENDING), ('_id', DESCENDING)],
+     {'name': 'owner_category_date_id'}),
+
+    # Transações por autor (notificações)
+    ('transactions', [('added_by', ASCENDING), ('date', DESCENDING)], {'name': 'added_by_date'}),
+    ('transactions', [('added_by', ASCENDING), ('type', ASCENDING), ('date', DESCENDING)],
+     {'name': 'added_by_type_date'}),
+
+    # Totais mensais materializados
+    ('monthly_rollups', [('owner_id', ASCENDING), ('owner_type', ASCENDING), ('period', ASCENDING),
+                         ('type', ASCENDING)],
+     {'name': 'owner_period_type_unique', 'unique': True}),
+
+    # Transações agrupadas por dono e mês (TRANSACTION_STORAGE = 'bucketed')
+    ('transaction_buckets', [('owner_id', ASCENDING), ('owner_type', ASCENDING), ('period', ASCENDING)],
+     {'name': 'owner_period_unique', 'unique': True}),
+
+    # Categorias por dono (contagem de uso)
+    ('owner_categories', [('owner_id', ASCENDING), ('owner_type', ASCENDING), ('name', ASCENDING)],
+     {'name': 'owner_name_unique', 'unique': True}),
+    ('owner_categories', [('owner_id', ASCENDING), ('owner_type', ASCENDING), ('count', DESCENDING),
+                          ('last_used', DESCENDING)],
+     {'name': 'owner_count_last_used'}),
+    
+    # Orçamentos
+    ('budgets', [('owner_id', ASCENDING), ('owner_type', ASCENDING), ('category', ASCENDING),
+                 ('period', ASCENDING)],
+     {'name': 'owner_category_period'}),
+
+    # Convites
+    ('invites', [('code', ASCENDING)], {'name': 'code_unique', 'unique': True}),
+    ('invites', [('invited_user_id', ASCENDING), ('status', ASCENDING), ('expires_at', ASCENDING)],
+     {'name': 'invited_user_status_expires'}),
+    ('invites', [('family_id', ASCENDING), ('status', ASCENDING), ('created_at', DESCENDING)],
+     {'name': 'family_status_created'}),
+
+    # Notificações
+    ('notifications', [('user_id', ASCENDING), ('read', ASCENDING)], {'name': 'user_read'}),
+    ('notifications', [('user_id', ASCENDING), ('dedupe_key', ASCENDING)],
+     {'name': 'user_dedupe_key_unique', 'unique': True}),
+    ('notifications', [('user_id', ASCENDING), ('active', ASCENDING), ('priority', DESCENDING),
+                       ('created_at', DESCENDING)],
+     {'name': 'user_active_priority_created'}),
+]
+
+# Índices substituídos por versões do registro: (coleção, nome antigo)
+SUPERSEDED_INDEXES = [
+    # Viraram owner_*_date_id (prefixos dos novos, só custavam escrita)
+    ('transactions', 'owner_date'),
+    ('transactions', 'owner_type_date'),
+    ('transactions', 'owner_category_date'),
+]
+
+def canonical_queries():
+    """Formatos de consulta usados pelos blueprints, para verificação com explain()
+
+    Os valores são fictícios: o que importa para o plano é o formato da consulta.
+    """
+    owner = {'owner_id': ObjectId(), 'owner_type': 'individual'}
+    user_id = ObjectId()
+    since = datetime(2000, 1, 1)
+
+    return [
+        ('dashboard.transactions (listagem)', 'transactions',
+         {'filter': owner, 'sort': {'date': -1, '_id': -1}}),
+        ('dashboard.transactions ($facet com contagens)', 'transactions',
+         {'pipeline': [{'$match': {**owner, 'date': {'$gte': since}}},
+                       {'$sort': {'date': -1, '_id': -1}}]}),
+        ('dashboard.transactions (próxima página)', 'transactions',
+         {'filter': {**owner, '$or': [{'date': {'$lt': since}},
+                                       {'date': since, '_id': {'$lt': ObjectId()}}]},
+          'sort': {'date': -1, '_id': -1}}),
+        ('dashboard.transactions (categoria)', 'transactions',
+         {'filter': {**owner, 'category': 'Alimentação'}, 'sort': {'date': -1, '_id': -1}}),
+        ('dashboard.transactions (tipo)', 'transactions',
+         {'filter': {**owner, 'type': 'expense'}, 'sort': {'date': -1, '_id': -1}}),
+        ('dashboard.overview ($facet)', 'transactions',
+         {'pipeline': [{'$match': {**owner, 'date': {'$gte': since}}}]}),
+        ('Budget.get_statuses', 'transactions',
+         {'pipeline': [{'$match': {**owner, 'category': {'$in': ['Alimentação', 'Transporte']},
+                                   'type': 'expense', 'date': {'$gte': since}}}]}),
+        ('reports (gastos por período)', 'transactions',
+         {'pipeline': [{'$match': {**owner, 'type': 'expense', 'date': {'$gte': since}}}]}),
+        ('notifications (tendência de gastos)', 'transactions',
+         {'pipeline': [{'$match': {'added_by': user_id, 'type': 'expense',
+                                   'date': {'$gte': since}}}]}),
+        ('notifications (inatividade)', 'transactions',
+         {'filter': {'added_by': user_id}, 'sort': {'date': -1}}),
+        ('Transaction.get_monthly_summary', 'monthly_rollups',
+         {'filter': {**owner, 'period': {'$gte': 200001, '$lte': 200012}}}),
+        ('TransactionBucket (meses do dono)', 'transaction_buckets',
+         {'filter': {**owner, 'period': {'$gte': 200001, '$lte': 200012}}, 'sort': {'period': -1}}),
+        ('OwnerCategory.get_categories', 'owner_categories',
+         {'filter': owner, 'sort': {'count': -1, 'last_used': -1}}),
+        ('dashboard.get_user_budgets', 'budgets',
+         {'filter': owner}),
+        ('family.join (convite por código)', 'invites',
+         {'filter': {'code': 'ABCDEFGH', 'status': 'pending', 'expires_at': {'$gte': since}}}),
+        ('notifications (convites pendentes)', 'invites',
+         {'filter': {'invited_user_id': user_id, 'status': 'pending',
+                     'expires_at': {'$gte': since}}}),
+        ('family.api_family_invites', 'invites',
+         {'filter': {'family_id': ObjectId(), 'status': 'pending'}, 'sort': {'created_at': -1}}),
+        ('User.find_by_email', 'users',
+         {'filter': {'email': 'demo@financedash.com'}}),
+        ('notifications.api_user_notifications', 'notifications',
+         {'filter': {'user_id': user_id, 'active': True}, 'sort': {'priority': -1, 'created_at': -1}}),
+        ('notifications (contador de não lidas)', 'notifications',
+         {'filter': {'user_id': user_id, 'active': True, 'read': False}}),
+        ('notifications.mark_all_read', 'notifications',
+         {'filter': {'user_id': user_id, 'read': {'$ne': True}}}),
+    ]
+
+def ensure_indexes(db):
+    """Cria os índices do registro e remove os substituídos (idempotente). Retorna (criados, erros)"""
+    created = []
+    errors = []
+
+    for collection, keys, options in INDEXES:
+        try:
+            created.append(db[collection].create_index(keys, **options))
+        except OperationFailure as e:
+            errors.append(f"{collection}.{options.get('name')}: {e}")
+
+    for collection, name in SUPERSEDED_INDEXES:
+        try:
+            if name in db[collection].index_information():
+                db[collection].drop_index(name)
+        except OperationFailure as e:
+            errors.append(f"{collection}.{name} (remoção): {e}")
+
+    return created, errors
+
+def verify_query_plans(db):
+    """Executa explain() em cada consulta canônica. Retorna as que fazem COLLSCAN"""
+    failures = []
+
+    for name, collection, query in canonical_queries():
+        if 'pipeline' in query:
+            command = {'aggregate': collection, 'pipeline': query['pipeline'], 'cursor': {}}
+        else:
+            command = {'find': collection, 'filter': query['filter']}
+            if 'sort' in query:
+                command['sort'] = query['sort']
+
+        plan = db.command('explain', command, verbosity='queryPlanner')
+        if 'COLLSCAN' in find_plan_stages(plan):
+            failures.append(name)
+
+    return failures
+
+def find_plan_stages(node, stages=None):
+    """Coleta os estágios dos planos vencedores de uma saída de explain()"""
+    if stages is None:
+        stages = set()
+
+    if isinstance(node, dict):
+        for key, value in node.items():
+            if key == 'rejectedPlans':
+                continue
+            if key == 'stage' and isinstance(value, str):
+                stages.add(value)
+            else:
+                find_plan_stages(value, stages)
+    elif isinstance(node, list):
+        for item in node:
+            find_plan_stages(item, stages)
+
+    return stages
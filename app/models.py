@@ -1,6 +1,10 @@
+import re
 from datetime import datetime, timedelta
 from bson.objectid import ObjectId
-from flask import current_app
+from pymongo import UpdateOne
+from pymongo.errors import DuplicateKeyError
+from flask import current_app, g, has_request_context
+from app.queries import Query, run_query
 from app import bcrypt
 from flask_jwt_extended import create_access_token
 
@@ -9,6 +13,30 @@ def get_db():
     from app import get_db
     return get_db()
 
+def get_identity_map(kind):
+    """Mapa de identidade da requisição atual (em flask.g) para um tipo de documento"""
+    if not has_request_context():
+        return None
+    identity_maps = g.setdefault('identity_maps', {})
+    return identity_maps.setdefault(kind, {})
+
+def find_many_cached(collection, ids, from_document):
+    """Resolve ids pelo mapa de identidade e busca os que faltam com um único $in"""
+    ids = [ObjectId(item_id) for item_id in ids if item_id]
+    identity_map = get_identity_map(collection)
+    if identity_map is None:
+        identity_map = {}
+    
+    missing = list({item_id for item_id in ids if item_id not in identity_map})
+    if missing:
+        db = get_db()
+        for document in db[collection].find({'_id': {'$in': missing}}):
+            identity_map[document['_id']] = from_document(document)
+        for item_id in missing:
+            identity_map.setdefault(item_id, None)
+    
+    return {item_id: identity_map[item_id] for item_id in ids if identity_map[item_id] is not None}
+
 class User:
     def __init__(self, email, name, password_hash=None):
         self.email = email
@@ -17,6 +45,7 @@ class User:
         self.families = []
         self.default_family = None
         self.individual_account = True
+        self.permissions_version = 0
         self.created_at = datetime.utcnow()
     
     def set_password(self, password):
@@ -40,35 +69,56 @@ class User:
         self._id = result.inserted_id
         return result.inserted_id
     
+    @staticmethod
+    def from_document(user_data):
+        user = User(user_data['email'], user_data['name'])
+        user.password_hash = user_data['password_hash']
+        user.families = user_data.get('families', [])
+        user.default_family = user_data.get('default_family')
+        user.individual_account = user_data.get('individual_account', True)
+        user.permissions_version = user_data.get('permissions_version', 0)
+        user._id = user_data['_id']
+        user.created_at = user_data.get('created_at', datetime.utcnow())
+        return user
+    
     @staticmethod
     def find_by_email(email):
         db = get_db()
         user_data = db.users.find_one({'email': email})
         if user_data:
-            user = User(user_data['email'], user_data['name'])
-            user.password_hash = user_data['password_hash']
-            user.families = user_data.get('families', [])
-            user.default_family = user_data.get('default_family')
-            user.individual_account = user_data.get('individual_account', True)
-            user._id = user_data['_id']
-            user.created_at = user_data.get('created_at', datetime.utcnow())
+            user = User.from_document(user_data)
+            identity_map = get_identity_map('users')
+            if identity_map is not None:
+                identity_map[user._id] = user
             return user
         return None
     
     @staticmethod
     def find_by_id(user_id):
+        user_id = ObjectId(user_id)
+        identity_map = get_identity_map('users')
+        if identity_map is not None and user_id in identity_map:
+            return identity_map[user_id]
+        
         db = get_db()
-        user_data = db.users.find_one({'_id': ObjectId(user_id)})
-        if user_data:
-            user = User(user_data['email'], user_data['name'])
-            user.password_hash = user_data['password_hash']
-            user.families = user_data.get('families', [])
-            user.default_family = user_data.get('default_family')
-            user.individual_account = user_data.get('individual_account', True)
-            user._id = user_data['_id']
-            user.created_at = user_data.get('created_at', datetime.utcnow())
-            return user
-        return None
+        user_data = db.users.find_one({'_id': user_id})
+        user = User.from_document(user_data) if user_data else None
+        if identity_map is not None:
+            identity_map[user_id] = user
+        return user
+    
+    @staticmethod
+    def find_many_by_ids(user_ids):
+        """Busca vários usuários com um único $in. Retorna {ObjectId: User}"""
+        return find_many_cached('users', user_ids, User.from_document)
+    
+    @staticmethod
+    def forget(user_id):
+        """Remove o usuário do mapa de identidade (após alterá-lo no banco)"""
+        identity_map = get_identity_map('users')
+        if identity_map is not None:
+            identity_map.pop(ObjectId(user_id), None)
+            g.pop('user_context', None)
     
     def generate_token(self):
         return create_access_token(identity=str(self._id), expires_delta=timedelta(days=1))
@@ -118,22 +168,45 @@ class Family:
         self._id = result.inserted_id
         return result.inserted_id
     
+    @staticmethod
+    def from_document(family_data):
+        family = Family(
+            family_data['name'],
+            family_data['description'],
+            family_data['created_by']
+        )
+        family.members = family_data.get('members', [])
+        family.settings = family_data.get('settings', {})
+        family._id = family_data['_id']
+        family.created_at = family_data.get('created_at', datetime.utcnow())
+        return family
+    
     @staticmethod
     def find_by_id(family_id):
+        family_id = ObjectId(family_id)
+        identity_map = get_identity_map('families')
+        if identity_map is not None and family_id in identity_map:
+            return identity_map[family_id]
+        
         db = get_db()
-        family_data = db.families.find_one({'_id': ObjectId(family_id)})
-        if family_data:
-            family = Family(
-                family_data['name'],
-                family_data['description'],
-                family_data['created_by']
-            )
-            family.members = family_data.get('members', [])
-            family.settings = family_data.get('settings', {})
-            family._id = family_data['_id']
-            family.created_at = family_data.get('created_at', datetime.utcnow())
-            return family
-        return None
+        family_data = db.families.find_one({'_id': family_id})
+        family = Family.from_document(family_data) if family_data else None
+        if identity_map is not None:
+            identity_map[family_id] = family
+        return family
+    
+    @staticmethod
+    def find_many_by_ids(family_ids):
+        """Busca várias famílias com um único $in. Retorna {ObjectId: Family}"""
+        return find_many_cached('families', family_ids, Family.from_document)
+    
+    @staticmethod
+    def forget(family_id):
+        """Remove a família do mapa de identidade (após alterá-la no banco)"""
+        identity_map = get_identity_map('families')
+        if identity_map is not None:
+            identity_map.pop(ObjectId(family_id), None)
+            g.pop('user_context', None)
 
 class Transaction:
     def __init__(self, owner_type, owner_id, added_by, trans_type, amount, category, description):
@@ -150,9 +223,8 @@ class Transaction:
         self.recurring = False
         self.attachments = []
     
-    def save(self):
-        db = get_db()
-        transaction_data = {
+    def to_document(self):
+        return {
             'owner_type': self.owner_type,
             'owner_id': self.owner_id,
             'added_by': self.added_by,
@@ -166,10 +238,23 @@ class Transaction:
             'recurring': self.recurring,
             'attachments': self.attachments
         }
+    
+    def save(self):
+        db = get_db()
+        transaction_data = self.to_document()
         result = db.transactions.insert_one(transaction_data)
         self._id = result.inserted_id
+        Transaction.update_aggregates(added=[transaction_data])
         return result.inserted_id
     
+    @staticmethod
+    def update_aggregates(added=(), removed=()):
+        """Mantém os dados derivados (totais mensais, categorias do dono) em dia após escritas"""
+        MonthlyRollup.apply(added=added, removed=removed)
+        OwnerCategory.apply(added=added, removed=removed)
+        if current_app.config.get('TRANSACTION_STORAGE') == 'bucketed':
+            TransactionBucket.apply(added=added, removed=removed)
+    
     @staticmethod
     def get_user_transactions(user_id, owner_type='individual', owner_id=None, limit=50):
         db = get_db()
@@ -185,44 +270,391 @@ class Transaction:
     
     @staticmethod
     def get_monthly_summary(owner_id, owner_type='individual', year=None, month=None):
-        db = get_db()
-        
+        return run_query(get_db(), Transaction.monthly_summary_query(owner_id, owner_type, year, month))
+    
+    @staticmethod
+    def monthly_summary_query(owner_id, owner_type='individual', year=None, month=None):
+        """Consulta do resumo de um mês (compartilhada com a API assíncrona)"""
         if not year:
             year = datetime.now().year
         if not month:
             month = datetime.now().month
         
-        start_date = datetime(year, month, 1)
-        if month == 12:
-            end_date = datetime(year + 1, 1, 1)
-        else:
-            end_date = datetime(year, month + 1, 1)
+        query = MonthlyRollup.summaries_query(owner_id, owner_type, (year, month), (year, month))
+        return query._replace(shape=lambda result: query.shape(result)[(year, month)])
+    
+    @staticmethod
+    def get_period_summaries(owner_id, owner_type, start, end):
+        """Resumos mensais de (ano, mês) inicial até final, inclusive, em uma única leitura"""
+        return MonthlyRollup.get_summaries(owner_id, owner_type, start, end)
+
+class MonthlyRollup:
+    """Totais mensais materializados por (dono, ano, mês, tipo) na coleção monthly_rollups"""
+    
+    @staticmethod
+    def period_key(year, month):
+        return year * 100 + month
+    
+    @staticmethod
+    def apply(added=(), removed=()):
+        """Aplica incrementalmente transações inseridas/removidas aos totais mensais"""
+        deltas = {}
+        for sign, transactions in ((1, added), (-1, removed)):
+            for transaction in transactions:
+                date = transaction['date']
+                key = (
+                    ObjectId(transaction['owner_id']),
+                    transaction['owner_type'],
+                    date.year,
+                    date.month,
+                    transaction['type']
+                )
+                total, count = deltas.get(key, (0.0, 0))
+                deltas[key] = (total + sign * float(transaction['amount']), count + sign)
+        
+        operations = []
+        for (owner_id, owner_type, year, month, trans_type), (total, count) in deltas.items():
+            if count == 0 and total == 0:
+                continue
+            operations.append(UpdateOne(
+                {
+                    'owner_id': owner_id,
+                    'owner_type': owner_type,
+                    'period': MonthlyRollup.period_key(year, month),
+                    'type': trans_type
+                },
+                {
+                    '$inc': {'total': total, 'count': count},
+                    '$setOnInsert': {'year': year, 'month': month}
+                },
+                upsert=True
+            ))
         
+        if operations:
+            get_db().monthly_rollups.bulk_write(operations, ordered=False)
+    
+    @staticmethod
+    def get_summaries(owner_id, owner_type, start, end):
+        """Lê os totais de um intervalo de meses (inclusive) com uma consulta indexada"""
+        return run_query(get_db(), MonthlyRollup.summaries_query(owner_id, owner_type, start, end))
+    
+    @staticmethod
+    def summaries_query(owner_id, owner_type, start, end):
+        """Consulta dos totais de um intervalo de meses, com o resultado já em resumos"""
         pipeline = [
             {
                 '$match': {
                     'owner_id': ObjectId(owner_id),
                     'owner_type': owner_type,
-                    'date': {'$gte': start_date, '$lt': end_date}
+                    'period': {
+                        '$gte': MonthlyRollup.period_key(*start),
+                        '$lte': MonthlyRollup.period_key(*end)
+                    }
                 }
             },
+            {'$project': {'year': 1, 'month': 1, 'type': 1, 'total': 1}}
+        ]
+        
+        def shape(rollups):
+            summaries = MonthlyRollup.empty_summaries(start, end)
+            for item in rollups:
+                summary = summaries.get((item['year'], item['month']))
+                if summary is not None and item['type'] in ('income', 'expense'):
+                    summary[item['type']] = item['total']
+            
+            for summary in summaries.values():
+                summary['balance'] = summary['income'] - summary['expense']
+            return summaries
+        
+        return Query('monthly_rollups', pipeline, shape)
+    
+    @staticmethod
+    def empty_summaries(start, end):
+        """Resumos zerados para cada mês do intervalo (inclusive)"""
+        summaries = {}
+        year, month = start
+        while (year, month) <= tuple(end):
+            summaries[(year, month)] = {'income': 0, 'expense': 0, 'balance': 0}
+            year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+        return summaries
+    
+    @staticmethod
+    def rebuild(owner_id=None, owner_type=None):
+        """Reconstrói os totais a partir da coleção transactions (backfill/correção)"""
+        db = get_db()
+        scope = {}
+        if owner_id:
+            scope = {'owner_id': ObjectId(owner_id), 'owner_type': owner_type}
+        
+        pipeline = [
+            {'$match': scope},
             {
                 '$group': {
-                    '_id': '$type',
+                    '_id': {
+                        'owner_id': '$owner_id',
+                        'owner_type': '$owner_type',
+                        'year': {'$year': '$date'},
+                        'month': {'$month': '$date'},
+                        'type': '$type'
+                    },
                     'total': {'$sum': '$amount'},
                     'count': {'$sum': 1}
                 }
             }
         ]
         
-        result = list(db.transactions.aggregate(pipeline))
-        summary = {'income': 0, 'expense': 0, 'balance': 0}
+        rollups = []
+        for item in db.transactions.aggregate(pipeline, allowDiskUse=True):
+            key = item['_id']
+            rollups.append({
+                'owner_id': key['owner_id'],
+                'owner_type': key['owner_type'],
+                'year': key['year'],
+                'month': key['month'],
+                'period': MonthlyRollup.period_key(key['year'], key['month']),
+                'type': key['type'],
+                'total': item['total'],
+                'count': item['count']
+            })
+        
+        db.monthly_rollups.delete_many(scope)
+        if rollups:
+            db.monthly_rollups.insert_many(rollups, ordered=False)
+        return len(rollups)
+
+class OwnerCategory:
+    """Categorias usadas por dono, com contagem de uso e última data (coleção owner_categories)"""
+    
+    @staticmethod
+    def apply(added=(), removed=()):
+        """Aplica incrementalmente transações inseridas/removidas às contagens"""
+        deltas = {}
+        for sign, transactions in ((1, added), (-1, removed)):
+            for transaction in transactions:
+                if not transaction.get('category'):
+                    continue
+                key = (ObjectId(transaction['owner_id']), transaction['owner_type'], transaction['category'])
+                count, last_used = deltas.get(key, (0, None))
+                if sign > 0 and (last_used is None or transaction['date'] > last_used):
+                    last_used = transaction['date']
+                deltas[key] = (count + sign, last_used)
+        
+        operations = []
+        for (owner_id, owner_type, name), (count, last_used) in deltas.items():
+            if count == 0 and last_used is None:
+                continue
+            update = {'$inc': {'count': count}}
+            if last_used is not None:
+                update['$max'] = {'last_used': last_used}
+            operations.append(UpdateOne(
+                {'owner_id': owner_id, 'owner_type': owner_type, 'name': name},
+                update,
+                upsert=True
+            ))
+        
+        if operations:
+            db = get_db()
+            db.owner_categories.bulk_write(operations, ordered=False)
+            # Categorias sem nenhuma transação deixam de existir
+            if any(count < 0 for count, _ in deltas.values()):
+                db.owner_categories.delete_many({
+                    '$or': [
+                        {'owner_id': owner_id, 'owner_type': owner_type}
+                        for owner_id, owner_type in {(key[0], key[1]) for key in deltas}
+                    ],
+                    'count': {'$lte': 0}
+                })
+    
+    @staticmethod
+    def get_categories(owner_id, owner_type, prefix=None, limit=None):
+        """Categorias do dono da mais usada para a menos usada (uma consulta indexada)"""
+        query = {'owner_id': ObjectId(owner_id), 'owner_type': owner_type}
+        if prefix:
+            query['name'] = {'$regex': '^' + re.escape(prefix), '$options': 'i'}
+        
+        cursor = get_db().owner_categories.find(
+            query, {'_id': 0, 'name': 1, 'count': 1, 'last_used': 1}
+        ).sort([('count', -1), ('last_used', -1)])
+        if limit:
+            cursor = cursor.limit(limit)
+        return list(cursor)
+    
+    @staticmethod
+    def rebuild(owner_id=None, owner_type=None):
+        """Reconstrói as contagens a partir da coleção transactions (backfill/correção)"""
+        db = get_db()
+        scope = {}
+        if owner_id:
+            scope = {'owner_id': ObjectId(owner_id), 'owner_type': owner_type}
+        
+        pipeline = [
+            {'$match': {**scope, 'category': {'$nin': [None, '']}}},
+            {
+                '$group': {
+                    '_id': {
+                        'owner_id': '$owner_id',
+                        'owner_type': '$owner_type',
+                        'name': '$category'
+                    },
+                    'count': {'$sum': 1},
+                    'last_used': {'$max': '$date'}
+                }
+            }
+        ]
+        
+        categories = []
+        for item in db.transactions.aggregate(pipeline, allowDiskUse=True):
+            categories.append({**item['_id'], 'count': item['count'], 'last_used': item['last_used']})
+        
+        db.owner_categories.delete_many(scope)
+        if categories:
+            db.owner_categories.insert_many(categories, ordered=False)
+        return len(categories)
+
+class TransactionBucket:
+    """Transações agrupadas em um documento por (dono, mês) na coleção transaction_buckets
+    
+    `entries` guarda os campos usados em relatórios e exportações, ordenados por
+    data, e `totals` os valores já somados por (tipo, categoria). A coleção
+    transactions continua sendo a fonte das escritas por id; os buckets são
+    mantidos junto dela quando TRANSACTION_STORAGE = 'bucketed'.
+    """
+    
+    ENTRY_FIELDS = ('_id', 'date', 'type', 'amount', 'category', 'description',
+                    'payment_method', 'tags', 'added_by', 'recurring', 'attachments')
+    MAX_RETRIES = 5
+    
+    @staticmethod
+    def key(transaction):
+        date = transaction['date']
+        return (ObjectId(transaction['owner_id']), transaction['owner_type'], date.year, date.month)
+    
+    @staticmethod
+    def to_entry(transaction):
+        entry = {field: transaction.get(field) for field in TransactionBucket.ENTRY_FIELDS}
+        entry['tags'] = entry['tags'] or []
+        return entry
+    
+    @staticmethod
+    def build(owner_id, owner_type, year, month, entries, version=0):
+        """Documento do bucket com as entradas ordenadas e os totais recalculados"""
+        entries = sorted(entries, key=lambda entry: (entry['date'], entry['_id']))
+        
+        totals = {}
+        for entry in entries:
+            key = (entry['type'], entry['category'])
+            total, count = totals.get(key, (0.0, 0))
+            totals[key] = (total + float(entry['amount']), count + 1)
+        
+        return {
+            'owner_id': owner_id,
+            'owner_type': owner_type,
+            'period': MonthlyRollup.period_key(year, month),
+            'year': year,
+            'month': month,
+            'entries': entries,
+            'totals': [
+                {'type': trans_type, 'category': category, 'total': total, 'count': count}
+                for (trans_type, category), (total, count) in totals.items()
+            ],
+            'count': len(entries),
+            'version': version
+        }
+    
+    @staticmethod
+    def apply(added=(), removed=()):
+        """Aplica transações inseridas/removidas aos buckets dos meses afetados"""
+        changes = {}
+        for transaction in removed:
+            changes.setdefault(TransactionBucket.key(transaction), (set(), {}))[0].add(transaction['_id'])
+        for transaction in added:
+            entry = TransactionBucket.to_entry(transaction)
+            changes.setdefault(TransactionBucket.key(transaction), (set(), {}))[1][entry['_id']] = entry
+        
+        for key, (removed_ids, added_entries) in changes.items():
+            TransactionBucket.update_bucket(key, removed_ids, added_entries)
+    
+    @staticmethod
+    def update_bucket(key, removed_ids, added_entries):
+        """Reescreve um bucket com controle otimista de concorrência (campo version)"""
+        db = get_db()
+        owner_id, owner_type, year, month = key
+        selector = {
+            'owner_id': owner_id,
+            'owner_type': owner_type,
+            'period': MonthlyRollup.period_key(year, month)
+        }
+        
+        for _ in range(TransactionBucket.MAX_RETRIES):
+            bucket = db.transaction_buckets.find_one(selector)
+            entries = {entry['_id']: entry for entry in bucket['entries']} if bucket else {}
+            for transaction_id in removed_ids:
+                entries.pop(transaction_id, None)
+            entries.update(added_entries)
+            
+            if bucket is None:
+                if not entries:
+                    return
+                try:
+                    db.transaction_buckets.insert_one(
+                        TransactionBucket.build(owner_id, owner_type, year, month, entries.values())
+                    )
+                    return
+                except DuplicateKeyError:
+                    continue
+            
+            version = bucket.get('version', 0)
+            if entries:
+                result = db.transaction_buckets.replace_one(
+                    {**selector, 'version': version},
+                    TransactionBucket.build(owner_id, owner_type, year, month, entries.values(), version + 1)
+                )
+                if result.matched_count:
+                    return
+            else:
+                result = db.transaction_buckets.delete_one({**selector, 'version': version})
+                if result.deleted_count:
+                    return
+        
+        raise RuntimeError(f"Conflito ao atualizar o bucket {owner_type}:{owner_id}:{year}-{month:02d}")
+    
+    @staticmethod
+    def rebuild(owner_id=None, owner_type=None, batch_size=100):
+        """Reconstrói os buckets a partir da coleção transactions (migração do layout plano)"""
+        db = get_db()
+        scope = {}
+        if owner_id:
+            scope = {'owner_id': ObjectId(owner_id), 'owner_type': owner_type}
         
-        for item in result:
-            summary[item['_id']] = item['total']
+        # Mesma ordem do índice owner_date_id: os meses de cada dono chegam contíguos
+        cursor = db.transactions.find(scope).sort(
+            [('owner_id', 1), ('owner_type', 1), ('date', -1), ('_id', -1)]
+        ).batch_size(1000)
         
-        summary['balance'] = summary['income'] - summary['expense']
-        return summary
+        db.transaction_buckets.delete_many(scope)
+        
+        buckets = 0
+        batch = []
+        current_key, entries = None, []
+        for transaction in cursor:
+            key = TransactionBucket.key(transaction)
+            if key != current_key and entries:
+                batch.append(TransactionBucket.build(*current_key, entries))
+                entries = []
+            current_key = key
+            entries.append(TransactionBucket.to_entry(transaction))
+            
+            if len(batch) >= batch_size:
+                db.transaction_buckets.insert_many(batch, ordered=False)
+                buckets += len(batch)
+                batch = []
+        
+        if entries:
+            batch.append(TransactionBucket.build(*current_key, entries))
+        if batch:
+            db.transaction_buckets.insert_many(batch, ordered=False)
+            buckets += len(batch)
+        return buckets
 
 class Budget:
     def __init__(self, owner_id, owner_type, category, limit_amount, period='monthly'):
@@ -252,41 +684,84 @@ class Budget:
         return result.inserted_id
     
     def update_spent_amount(self):
+        """Recalcula e grava o gasto do período (usar só em escritas do orçamento)"""
         db = get_db()
         
-        # Calcula gastos do período atual
-        now = datetime.utcnow()
-        if self.period == 'monthly':
-            start_date = datetime(now.year, now.month, 1)
-        elif self.period == 'weekly':
-            start_date = now - timedelta(days=now.weekday())
+        statuses = Budget.get_statuses(self.owner_id, self.owner_type, [{
+            'category': self.category,
+            'limit': self.limit,
+            'period': self.period
+        }])
+        self.current_spent = statuses[0]['current_spent']
+        
+        # Atualizar no banco
+        if hasattr(self, '_id'):
+            db.budgets.update_one(
+                {'_id': self._id},
+                {'$set': {'current_spent': self.current_spent}}
+            )
+    
+    @staticmethod
+    def get_period_start(period, now=None):
+        """Início do período atual do orçamento"""
+        now = now or datetime.utcnow()
+        if period == 'monthly':
+            return datetime(now.year, now.month, 1)
+        elif period == 'weekly':
+            return now - timedelta(days=now.weekday())
         else:  # yearly
-            start_date = datetime(now.year, 1, 1)
+            return datetime(now.year, 1, 1)
+    
+    @staticmethod
+    def get_statuses(owner_id, owner_type, budgets=None):
+        """Calcula o gasto atual de todos os orçamentos do dono sem gravar nada
+        
+        Uma única agregação agrupada por categoria soma as janelas semanal,
+        mensal e anual ao mesmo tempo. Preenche current_spent, percentage e
+        remaining em cada documento e retorna a lista.
+        """
+        db = get_db()
+        if budgets is None:
+            budgets = list(db.budgets.find({
+                'owner_id': ObjectId(owner_id),
+                'owner_type': owner_type
+            }))
+        if not budgets:
+            return budgets
+        
+        now = datetime.utcnow()
+        starts = {period: Budget.get_period_start(period, now) for period in ('weekly', 'monthly', 'yearly')}
+        periods = {budget.get('period', 'monthly') for budget in budgets}
+        periods = {period if period in starts else 'yearly' for period in periods}
         
         pipeline = [
             {
                 '$match': {
-                    'owner_id': self.owner_id,
-                    'owner_type': self.owner_type,
-                    'category': self.category,
+                    'owner_id': ObjectId(owner_id),
+                    'owner_type': owner_type,
+                    'category': {'$in': list({budget['category'] for budget in budgets})},
                     'type': 'expense',
-                    'date': {'$gte': start_date}
+                    'date': {'$gte': min(starts[period] for period in periods)}
                 }
             },
             {
                 '$group': {
-                    '_id': None,
-                    'total': {'$sum': '$amount'}
+                    '_id': '$category',
+                    **{
+                        period: {'$sum': {'$cond': [{'$gte': ['$date', starts[period]]}, '$amount', 0]}}
+                        for period in periods
+                    }
                 }
             }
         ]
         
-        result = list(db.transactions.aggregate(pipeline))
-        self.current_spent = result[0]['total'] if result else 0.0
+        spent = {item['_id']: item for item in db.transactions.aggregate(pipeline)}
         
-        # Atualizar no banco
-        if hasattr(self, '_id'):
-            db.budgets.update_one(
-                {'_id': self._id},
-                {'$set': {'current_spent': self.current_spent}}
-            )
\ No newline at end of file
+        for budget in budgets:
+            period = budget.get('period', 'monthly')
+            period = period if period in starts else 'yearly'
+            budget['current_spent'] = spent.get(budget['category'], {}).get(period, 0.0)
+            budget['percentage'] = (budget['current_spent'] / budget['limit'] * 100) if budget['limit'] > 0 else 0
+            budget['remaining'] = budget['limit'] - budget['current_spent']
+        
+        return budgets
\ No newline at end of file
@@ -0,0 +1,440 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from bson.objectid import ObjectId
+from flask import current_app
+from pymongo import UpdateOne
+from app.models import User, Family
+from app.notifications.state import mark_notification_state_stale
+
+# Executor das avaliações disparadas por escritas (criado sob demanda)
+_executor = None
+_executor_lock = threading.Lock()
+
+def evaluate_user_notifications(user_id, user=None):
+    """Avalia as regras do usuário e persiste as notificações deduplicadas
+
+    Cada notificação tem uma dedupe_key estável: reavaliar só atualiza o conteúdo
+    (mantendo created_at e read) e as que deixaram de valer ficam inativas.
+    """
+    from app import get_db
+    db = get_db()
+
+    if user is None:
+        user = User.find_by_id(user_id)
+    if not user:
+        return 0
+
+    now = datetime.utcnow()
+    candidates = build_user_notifications(user_id, user)
+
+    operations = []
+    for notification in candidates:
+        created_at = notification.pop('created_at', now)
+        operations.append(UpdateOne(
+            {'user_id': ObjectId(user_id), 'dedupe_key': notification['dedupe_key']},
+            {
+                '$set': {**notification, 'active': True, 'updated_at': now},
+                '$setOnInsert': {'created_at': created_at, 'read': False}
+            },
+            upsert=True
+        ))
+    if operations:
+        db.notifications.bulk_write(operations, ordered=False)
+
+    # Desativar as que não se aplicam mais
+    db.notifications.update_many(
+        {
+            'user_id': ObjectId(user_id),
+            'active': True,
+            'dedupe_key': {'$nin': [n['dedupe_key'] for n in candidates]}
+        },
+        {'$set': {'active': False, 'updated_at': now}}
+    )
+
+    db.notification_state.update_one(
+        {'_id': ObjectId(user_id)},
+        {'$set': {'evaluated_at': now}},
+        upsert=True
+    )
+    mark_notification_state_stale(user_id)
+
+    return len(candidates)
+
+def evaluate_all_notifications():
+    """Avalia as notificações de todos os usuários (para execução agendada)"""
+    from app import get_db
+    db = get_db()
+
+    evaluated = 0
+    for user_data in db.users.find({}, {'password_hash': 0}):
+        try:
+            evaluate_user_notifications(user_data['_id'], User.from_document(user_data))
+            evaluated += 1
+        except Exception as e:
+            print(f"Erro ao avaliar notificações de {user_data['_id']}: {e}")
+
+    return evaluated
+
+def schedule_notification_evaluation(*user_ids):
+    """Agenda a avaliação das notificações em segundo plano (ou executa na hora
+    se NOTIFICATION_ASYNC estiver desligado)"""
+    user_ids = [str(user_id) for user_id in user_ids if user_id]
+    if not user_ids:
+        return
+
+    app = current_app._get_current_object()
+    if not app.config.get('NOTIFICATION_ASYNC', True):
+        for user_id in user_ids:
+            evaluate_user_notifications(user_id)
+        return
+
+    submit_notification_evaluation(app, *user_ids)
+
+def submit_notification_evaluation(app, *user_ids):
+    """Envia a avaliação para o executor, sempre fora da requisição"""
+    executor = get_notification_executor(app.config.get('NOTIFICATION_WORKERS', 2))
+    for user_id in user_ids:
+        executor.submit(_evaluate_in_background, app, str(user_id))
+
+def get_notification_executor(workers):
+    global _executor
+
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='notifications')
+    return _executor
+
+def schedule_owner_evaluation(owner_id, owner_type, user_id):
+    """Agenda a avaliação para quem é afetado por uma escrita nos dados do dono"""
+    user_ids = {str(user_id)}
+    if owner_type == 'family':
+        family = Family.find_by_id(owner_id)
+        if family:
+            user_ids.update(str(member['user_id']) for member in family.members)
+
+    schedule_notification_evaluation(*user_ids)
+
+def _evaluate_in_background(app, user_id):
+    with app.app_context():
+        try:
+            evaluate_user_notifications(user_id)
+        except Exception as e:
+            print(f"Erro ao avaliar notificações de {user_id}: {e}")
+
+# Regras de notificação
+
+def build_user_notifications(user_id, user):
+    """Executa todas as regras e retorna as notificações que se aplicam agora"""
+    notifications_list = []
+
+    # 1. Alertas de orçamento
+    budget_alerts = get_budget_alerts(user_id, user)
+    notifications_list.extend(budget_alerts)
+
+    # 2. Convites de família pendentes
+    family_invites = get_family_invites(user_id)
+    notifications_list.extend(family_invites)
+
+    # 3. Insights financeiros
+    financial_insights = get_financial_insights_notifications(user_id, user)
+    notifications_list.extend(financial_insights)
+
+    # 4. Lembretes de transações
+    transaction_reminders = get_transaction_reminders(user_id, user)
+    notifications_list.extend(transaction_reminders)
+
+    return notifications_list
+
+def get_budget_alerts(user_id, user):
+    """Obter alertas de orçamento"""
+    from app import get_db
+    db = get_db()
+
+    alerts = []
+
+    # Verificar orçamentos individuais
+    individual_budgets = get_budget_statuses(db, user_id, 'individual')
+
+    for budget in individual_budgets:
+        alert = check_budget_alert(budget)
+        if alert:
+            alerts.append(alert)
+
+    # Verificar orçamentos familiares
+    if hasattr(user, 'default_family') and user.default_family:
+        family_budgets = get_budget_statuses(db, user.default_family, 'family')
+
+        for budget in family_budgets:
+            alert = check_budget_alert(budget, is_family=True)
+            if alert:
+                alerts.append(alert)
+
+    return alerts
+
+def get_budget_statuses(db, owner_id, owner_type):
+    """Orçamentos com alertas habilitados e o gasto atual (uma agregação, sem gravar)"""
+    from app.models import Budget
+
+    budgets = list(db.budgets.find({
+        'owner_id': ObjectId(owner_id),
+        'owner_type': owner_type,
+        'alerts_enabled': True
+    }))
+    return Budget.get_statuses(owner_id, owner_type, budgets)
+
+def check_budget_alert(budget, is_family=False):
+    """Verificar se orçamento precisa de alerta (budget já com percentage calculado)"""
+    percentage = budget['percentage']
+
+    if percentage >= 100:
+        return {
+            'dedupe_key': f"budget_exceeded:{budget['_id']}",
+            'type': 'budget_exceeded',
+            'priority': 1,  # Alta prioridade
+            'title': 'Orçamento Excedido!',
+            'message': f"Orçamento de {budget['category']} {'da família' if is_family else ''} foi excedido em {percentage-100:.1f}%",
+            'category': budget['category'],
+            'percentage': percentage,
+            'is_family': is_family
+        }
+    elif percentage >= 80:
+        return {
+            'dedupe_key': f"budget_warning:{budget['_id']}",
+            'type': 'budget_warning',
+            'priority': 2,  # Média prioridade
+            'title': 'Orçamento Quase Esgotado',
+            'message': f"Orçamento de {budget['category']} {'da família' if is_family else ''} atingiu {percentage:.1f}%",
+            'category': budget['category'],
+            'percentage': percentage,
+            'is_family': is_family
+        }
+
+    return None
+
+def get_family_invites(user_id):
+    """Obter convites de família pendentes"""
+    from app import get_db
+    db = get_db()
+
+    invites = list(db.invites.find({
+        'invited_user_id': ObjectId(user_id),
+        'status': 'pending',
+        'expires_at': {'$gte': datetime.utcnow()}
+    }))
+
+    # Famílias e quem convidou de todos os convites com um $in cada
+    families = Family.find_many_by_ids([invite['family_id'] for invite in invites])
+    inviters = User.find_many_by_ids([invite['invited_by'] for invite in invites])
+
+    notifications = []
+
+    for invite in invites:
+        family = families.get(invite['family_id'])
+        family_name = family.name if family else 'Família'
+
+        inviter = inviters.get(invite['invited_by'])
+        inviter_name = inviter.name if inviter else 'Alguém'
+
+        notifications.append({
+            'dedupe_key': f"family_invite:{invite['_id']}",
+            'type': 'family_invite',
+            'priority': 2,
+            'title': 'Convite para Família',
+            'message': f"{inviter_name} te convidou para {family_name}",
+            'family_name': family_name,
+            'inviter_name': inviter_name,
+            'invite_code': invite['code'],
+            'role': invite['role'],
+            'created_at': invite['created_at'],
+            'expires_at': invite['expires_at']
+        })
+
+    return notifications
+
+def get_financial_insights_notifications(user_id, user):
+    """Obter insights financeiros como notificações"""
+    notifications = []
+    now = datetime.now()
+
+    # Insight: Gastos crescentes (um por mês)
+    spending_trend = analyze_recent_spending_trend(user_id, user)
+    if spending_trend:
+        notifications.append({
+            'dedupe_key': f"financial_insight:{now.strftime('%Y-%m')}",
+            'type': 'financial_insight',
+            'priority': 3,
+            'title': 'Tendência de Gastos',
+            'message': spending_trend['message'],
+            'data': spending_trend
+        })
+
+    # Insight: Oportunidade de economia (um por semana)
+    savings_opportunity = find_savings_opportunity(user_id, user)
+    if savings_opportunity:
+        year, week, _ = now.isocalendar()
+        notifications.append({
+            'dedupe_key': f"savings_opportunity:{year}-W{week:02d}",
+            'type': 'savings_opportunity',
+            'priority': 3,
+            'title': 'Oportunidade de Economia',
+            'message': savings_opportunity['message'],
+            'data': savings_opportunity
+        })
+
+    return notifications
+
+def get_transaction_reminders(user_id, user):
+    """Obter lembretes de transações"""
+    notifications = []
+
+    # Lembrete: Transações recorrentes
+    recurring_reminders = check_recurring_transactions(user_id)
+    notifications.extend(recurring_reminders)
+
+    # Lembrete: Muito tempo sem registrar transações
+    inactivity_reminder = check_transaction_inactivity(user_id)
+    if inactivity_reminder:
+        notifications.append(inactivity_reminder)
+
+    return notifications
+
+def analyze_recent_spending_trend(user_id, user):
+    """Analisar tendência de gastos recentes"""
+    from app import get_db
+    db = get_db()
+
+    # Comparar este mês com o anterior
+    now = datetime.now()
+    current_month_start = now.replace(day=1)
+    last_month_start = (current_month_start - timedelta(days=1)).replace(day=1)
+    last_month_end = current_month_start - timedelta(days=1)
+
+    # Gastos do mês atual
+    current_expenses = db.transactions.aggregate([
+        {
+            '$match': {
+                'added_by': ObjectId(user_id),
+                'type': 'expense',
+                'date': {'$gte': current_month_start}
+            }
+        },
+        {'$group': {'_id': None, 'total': {'$sum': '$amount'}}}
+    ])
+    current_total = list(current_expenses)
+    current_total = current_total[0]['total'] if current_total else 0
+
+    # Gastos do mês anterior
+    last_expenses = db.transactions.aggregate([
+        {
+            '$match': {
+                'added_by': ObjectId(user_id),
+                'type': 'expense',
+                'date': {'$gte': last_month_start, '$lte': last_month_end}
+            }
+        },
+        {'$group': {'_id': None, 'total': {'$sum': '$amount'}}}
+    ])
+    last_total = list(last_expenses)
+    last_total = last_total[0]['total'] if last_total else 0
+
+    # Calcular variação
+    if last_total > 0:
+        variation = ((current_total - last_total) / last_total) * 100
+
+        if variation > 20:  # Aumento de mais de 20%
+            return {
+                'message': f"Seus gastos aumentaram {variation:.1f}% em relação ao mês passado",
+                'variation': variation,
+                'current_total': current_total,
+                'last_total': last_total
+            }
+
+    return None
+
+def find_savings_opportunity(user_id, user):
+    """Encontrar oportunidades de economia"""
+    from app import get_db
+    db = get_db()
+
+    # Última semana
+    week_ago = datetime.now() - timedelta(days=7)
+
+    # Categoria com mais gastos na semana
+    weekly_expenses = db.transactions.aggregate([
+        {
+            '$match': {
+                'added_by': ObjectId(user_id),
+                'type': 'expense',
+                'date': {'$gte': week_ago}
+            }
+        },
+        {
+            '$group': {
+                '_id': '$category',
+                'total': {'$sum': '$amount'},
+                'count': {'$sum': 1}
+            }
+        },
+        {'$sort': {'total': -1}},
+        {'$limit': 1}
+    ])
+
+    top_category = list(weekly_expenses)
+    if top_category and top_category[0]['total'] > 100:  # Mais de R$ 100 na semana
+        category = top_category[0]
+        return {
+            'message': f"Você gastou R$ {category['total']:.2f} com {category['_id']} esta semana. Considere revisar esses gastos.",
+            'category': category['_id'],
+            'amount': category['total'],
+            'count': category['count']
+        }
+
+    return None
+
+def check_recurring_transactions(user_id):
+    """Verificar lembretes de transações recorrentes"""
+    # Implementação simplificada - idealmente seria baseado em transações marcadas como recorrentes
+    notifications = []
+
+    # Exemplo: lembrar de registrar salário no início do mês
+    now = datetime.now()
+    if now.day <= 5:  # Primeiros 5 dias do mês
+        notifications.append({
+            'dedupe_key': f"transaction_reminder:salary:{now.strftime('%Y-%m')}",
+            'type': 'transaction_reminder',
+            'priority': 3,
+            'title': 'Lembrete: Registrar Salário',
+            'message': 'Não se esqueça de registrar o salário deste mês'
+        })
+
+    return notifications
+
+def check_transaction_inactivity(user_id):
+    """Verificar inatividade no registro de transações"""
+    from app import get_db
+    db = get_db()
+
+    # Última transação
+    last_transaction = db.transactions.find_one(
+        {'added_by': ObjectId(user_id)},
+        {'date': 1},
+        sort=[('date', -1)]
+    )
+
+    if last_transaction:
+        days_since_last = (datetime.now() - last_transaction['date']).days
+
+        if days_since_last >= 7:  # 7 dias sem transações
+            # Um lembrete por período de inatividade (chave = última transação)
+            return {
+                'dedupe_key': f"inactivity_reminder:{last_transaction['_id']}",
+                'type': 'inactivity_reminder',
+                'priority': 3,
+                'title': 'Registre suas Transações',
+                'message': f'Faz {days_since_last} dias que você não registra uma transação',
+                'days_since_last': days_since_last
+            }
+
+    return None
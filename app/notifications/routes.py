@@ -1,8 +1,9 @@
-from flask import Blueprint, request, jsonify, session, render_template, redirect, url_for
+from flask import Blueprint, request, jsonify, session, render_template, redirect, url_for, current_app
 from app.auth.routes import login_required
 from app.models import User
+from app.notifications.state import get_notification_state, mark_notification_state_stale
 from bson.objectid import ObjectId
-from datetime import datetime, timedelta
+from datetime import datetime
 
 notifications = Blueprint('notifications', __name__)
 
@@ -26,35 +27,53 @@ def api_user_notifications(user_id):
         if not user:
             return jsonify({'error': 'Usuário não encontrado'}), 404
         
-        notifications_list = []
+        # Estado (agenda a avaliação das regras se estiver vencida)
+        state = get_notification_state(user_id)
         
-        # 1. Alertas de orçamento
-        budget_alerts = get_budget_alerts(user_id, user)
-        notifications_list.extend(budget_alerts)
+        # Paginação
+        page = max(request.args.get('page', 1, type=int), 1)
+        per_page = min(max(request.args.get('per_page', 50, type=int), 1),
+                       current_app.config.get('NOTIFICATIONS_MAX_PER_PAGE', 100))
         
-        # 2. Convites de família pendentes
-        family_invites = get_family_invites(user_id)
-        notifications_list.extend(family_invites)
-        
-        # 3. Insights financeiros
-        financial_insights = get_financial_insights_notifications(user_id, user)
-        notifications_list.extend(financial_insights)
+        from app import get_db
+        db = get_db()
         
-        # 4. Lembretes de transações
-        transaction_reminders = get_transaction_reminders(user_id, user)
-        notifications_list.extend(transaction_reminders)
+        # Leitura única pelo índice (user_id, active, priority, created_at)
+        cursor = db.notifications.find(
+            {'user_id': ObjectId(user_id), 'active': True},
+            {'user_id': 0, 'active': 0, 'updated_at': 0}
+        ).sort([('priority', -1), ('created_at', -1)]).skip((page - 1) * per_page).limit(per_page + 1)
         
-        # Ordenar por prioridade e data
-        notifications_list.sort(key=lambda x: (x['priority'], x['created_at']), reverse=True)
+        notifications_list = [serialize_notification(n) for n in cursor]
+        has_more = len(notifications_list) > per_page
         
         return jsonify({
-            'notifications': notifications_list,
-            'unread_count': len([n for n in notifications_list if not n.get('read', False)])
+            'notifications': notifications_list[:per_page],
+            'unread_count': state['unread_count'],
+            'page': page,
+            'per_page': per_page,
+            'has_more': has_more
         })
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@notifications.route('/api/unread_count')
+@login_required
+def api_unread_count():
+    """Contador de não lidas para o badge (estado pré-calculado + ETag/304)"""
+    try:
+        user_id = session['user_id']
+        state = get_notification_state(user_id)
+        
+        response = jsonify({'unread_count': state['unread_count']})
+        response.set_etag(f"{user_id}-{state['version']}")
+        response.headers['Cache-Control'] = 'private, no-cache'
+        return response.make_conditional(request)
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 @notifications.route('/api/mark_read', methods=['POST'])
 @login_required
 def mark_notification_read():
@@ -78,6 +97,7 @@ def mark_notification_read():
             },
             {'$set': {'read': True, 'read_at': datetime.utcnow()}}
         )
+        mark_notification_state_stale(user_id)
         
         return jsonify({'success': True})
         
@@ -98,6 +118,7 @@ def mark_all_notifications_read():
             {'user_id': ObjectId(user_id), 'read': {'$ne': True}},
             {'$set': {'read': True, 'read_at': datetime.utcnow()}}
         )
+        mark_notification_state_stale(user_id)
         
         return jsonify({'success': True})
         
@@ -152,312 +173,12 @@ def notification_settings(user_id):
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
-# Funções auxiliares para diferentes tipos de notificações
-
-def get_budget_alerts(user_id, user):
-    """Obter alertas de orçamento"""
-    from app import get_db
-    db = get_db()
-    
-    alerts = []
-    
-    # Verificar orçamentos individuais
-    individual_budgets = db.budgets.find({
-        'owner_id': ObjectId(user_id),
-        'owner_type': 'individual',
-        'alerts_enabled': True
-    })
-    
-    for budget in individual_budgets:
-        alert = check_budget_alert(budget)
-        if alert:
-            alerts.append(alert)
-    
-    # Verificar orçamentos familiares
-    if hasattr(user, 'default_family') and user.default_family:
-        family_budgets = db.budgets.find({
-            'owner_id': user.default_family,
-            'owner_type': 'family',
-            'alerts_enabled': True
-        })
-        
-        for budget in family_budgets:
-            alert = check_budget_alert(budget, is_family=True)
-            if alert:
-                alerts.append(alert)
-    
-    return alerts
+# Funções auxiliares
 
-def check_budget_alert(budget, is_family=False):
-    """Verificar se orçamento precisa de alerta"""
-    from app.models import Budget
-    
-    # Calcular gasto atual
-    budget_obj = Budget(
-        budget['owner_id'],
-        budget['owner_type'],
-        budget['category'],
-        budget['limit']
-    )
-    budget_obj._id = budget['_id']
-    budget_obj.update_spent_amount()
-    
-    percentage = (budget_obj.current_spent / budget['limit'] * 100) if budget['limit'] > 0 else 0
-    
-    if percentage >= 100:
-        return {
-            'id': str(budget['_id']),
-            'type': 'budget_exceeded',
-            'priority': 1,  # Alta prioridade
-            'title': 'Orçamento Excedido!',
-            'message': f"Orçamento de {budget['category']} {'da família' if is_family else ''} foi excedido em {percentage-100:.1f}%",
-            'category': budget['category'],
-            'percentage': percentage,
-            'is_family': is_family,
-            'created_at': datetime.utcnow().isoformat(),
-            'read': False
-        }
-    elif percentage >= 80:
-        return {
-            'id': str(budget['_id']),
-            'type': 'budget_warning',
-            'priority': 2,  # Média prioridade
-            'title': 'Orçamento Quase Esgotado',
-            'message': f"Orçamento de {budget['category']} {'da família' if is_family else ''} atingiu {percentage:.1f}%",
-            'category': budget['category'],
-            'percentage': percentage,
-            'is_family': is_family,
-            'created_at': datetime.utcnow().isoformat(),
-            'read': False
-        }
-    
-    return None
-
-def get_family_invites(user_id):
-    """Obter convites de família pendentes"""
-    from app import get_db
-    db = get_db()
-    
-    invites = db.invites.find({
-        'invited_user_id': ObjectId(user_id),
-        'status': 'pending',
-        'expires_at': {'$gte': datetime.utcnow()}
-    })
-    
-    notifications = []
-    
-    for invite in invites:
-        # Buscar nome da família
-        family = db.families.find_one({'_id': invite['family_id']})
-        family_name = family['name'] if family else 'Família'
-        
-        # Buscar quem convidou
-        inviter = User.find_by_id(invite['invited_by'])
-        inviter_name = inviter.name if inviter else 'Alguém'
-        
-        notifications.append({
-            'id': str(invite['_id']),
-            'type': 'family_invite',
-            'priority': 2,
-            'title': 'Convite para Família',
-            'message': f"{inviter_name} te convidou para {family_name}",
-            'family_name': family_name,
-            'inviter_name': inviter_name,
-            'invite_code': invite['code'],
-            'role': invite['role'],
-            'created_at': invite['created_at'].isoformat(),
-            'expires_at': invite['expires_at'].isoformat(),
-            'read': False
-        })
-    
-    return notifications
-
-def get_financial_insights_notifications(user_id, user):
-    """Obter insights financeiros como notificações"""
-    notifications = []
-    
-    # Insight: Gastos crescentes
-    spending_trend = analyze_recent_spending_trend(user_id, user)
-    if spending_trend:
-        notifications.append({
-            'id': f"insight_spending_{user_id}",
-            'type': 'financial_insight',
-            'priority': 3,
-            'title': 'Tendência de Gastos',
-            'message': spending_trend['message'],
-            'data': spending_trend,
-            'created_at': datetime.utcnow().isoformat(),
-            'read': False
-        })
-    
-    # Insight: Oportunidade de economia
-    savings_opportunity = find_savings_opportunity(user_id, user)
-    if savings_opportunity:
-        notifications.append({
-            'id': f"insight_savings_{user_id}",
-            'type': 'savings_opportunity',
-            'priority': 3,
-            'title': 'Oportunidade de Economia',
-            'message': savings_opportunity['message'],
-            'data': savings_opportunity,
-            'created_at': datetime.utcnow().isoformat(),
-            'read': False
-        })
-    
-    return notifications
-
-def get_transaction_reminders(user_id, user):
-    """Obter lembretes de transações"""
-    notifications = []
-    
-    # Lembrete: Transações recorrentes
-    recurring_reminders = check_recurring_transactions(user_id)
-    notifications.extend(recurring_reminders)
-    
-    # Lembrete: Muito tempo sem registrar transações
-    inactivity_reminder = check_transaction_inactivity(user_id)
-    if inactivity_reminder:
-        notifications.append(inactivity_reminder)
-    
-    return notifications
-
-def analyze_recent_spending_trend(user_id, user):
-    """Analisar tendência de gastos recentes"""
-    from app import get_db
-    db = get_db()
-    
-    # Comparar este mês com o anterior
-    now = datetime.now()
-    current_month_start = now.replace(day=1)
-    last_month_start = (current_month_start - timedelta(days=1)).replace(day=1)
-    last_month_end = current_month_start - timedelta(days=1)
-    
-    # Gastos do mês atual
-    current_expenses = db.transactions.aggregate([
-        {
-            '$match': {
-                'added_by': ObjectId(user_id),
-                'type': 'expense',
-                'date': {'$gte': current_month_start}
-            }
-        },
-        {'$group': {'_id': None, 'total': {'$sum': '$amount'}}}
-    ])
-    current_total = list(current_expenses)
-    current_total = current_total[0]['total'] if current_total else 0
-    
-    # Gastos do mês anterior
-    last_expenses = db.transactions.aggregate([
-        {
-            '$match': {
-                'added_by': ObjectId(user_id),
-                'type': 'expense',
-                'date': {'$gte': last_month_start, '$lte': last_month_end}
-            }
-        },
-        {'$group': {'_id': None, 'total': {'$sum': '$amount'}}}
-    ])
-    last_total = list(last_expenses)
-    last_total = last_total[0]['total'] if last_total else 0
-    
-    # Calcular variação
-    if last_total > 0:
-        variation = ((current_total - last_total) / last_total) * 100
-        
-        if variation > 20:  # Aumento de mais de 20%
-            return {
-                'message': f"Seus gastos aumentaram {variation:.1f}% em relação ao mês passado",
-                'variation': variation,
-                'current_total': current_total,
-                'last_total': last_total
-            }
-    
-    return None
-
-def find_savings_opportunity(user_id, user):
-    """Encontrar oportunidades de economia"""
-    from app import get_db
-    db = get_db()
-    
-    # Última semana
-    week_ago = datetime.now() - timedelta(days=7)
-    
-    # Categoria com mais gastos na semana
-    weekly_expenses = db.transactions.aggregate([
-        {
-            '$match': {
-                'added_by': ObjectId(user_id),
-                'type': 'expense',
-                'date': {'$gte': week_ago}
-            }
-        },
-        {
-            '$group': {
-                '_id': '$category',
-                'total': {'$sum': '$amount'},
-                'count': {'$sum': 1}
-            }
-        },
-        {'$sort': {'total': -1}},
-        {'$limit': 1}
-    ])
-    
-    top_category = list(weekly_expenses)
-    if top_category and top_category[0]['total'] > 100:  # Mais de R$ 100 na semana
-        category = top_category[0]
-        return {
-            'message': f"Você gastou R$ {category['total']:.2f} com {category['_id']} esta semana. Considere revisar esses gastos.",
-            'category': category['_id'],
-            'amount': category['total'],
-            'count': category['count']
-        }
-    
-    return None
-
-def check_recurring_transactions(user_id):
-    """Verificar lembretes de transações recorrentes"""
-    # Implementação simplificada - idealmente seria baseado em transações marcadas como recorrentes
-    notifications = []
-    
-    # Exemplo: lembrar de registrar salário no início do mês
-    now = datetime.now()
-    if now.day <= 5:  # Primeiros 5 dias do mês
-        notifications.append({
-            'id': f"recurring_salary_{user_id}_{now.month}",
-            'type': 'transaction_reminder',
-            'priority': 3,
-            'title': 'Lembrete: Registrar Salário',
-            'message': 'Não se esqueça de registrar o salário deste mês',
-            'created_at': datetime.utcnow().isoformat(),
-            'read': False
-        })
-    
-    return notifications
-
-def check_transaction_inactivity(user_id):
-    """Verificar inatividade no registro de transações"""
-    from app import get_db
-    db = get_db()
-    
-    # Última transação
-    last_transaction = db.transactions.find_one(
-        {'added_by': ObjectId(user_id)},
-        sort=[('date', -1)]
-    )
-    
-    if last_transaction:
-        days_since_last = (datetime.now() - last_transaction['date']).days
-        
-        if days_since_last >= 7:  # 7 dias sem transações
-            return {
-                'id': f"inactivity_{user_id}",
-                'type': 'inactivity_reminder',
-                'priority': 3,
-                'title': 'Registre suas Transações',
-                'message': f'Faz {days_since_last} dias que você não registra uma transação',
-                'days_since_last': days_since_last,
-                'created_at': datetime.utcnow().isoformat(),
-                'read': False
-            }
-    
-    return None
\ No newline at end of file
+def serialize_notification(notification):
+    """Converte o documento persistido para o formato usado pela central"""
+    notification['id'] = str(notification.pop('_id'))
+    for field in ('created_at', 'expires_at', 'read_at'):
+        if isinstance(notification.get(field), datetime):
+            notification[field] = notification[field].isoformat()
+    return notification
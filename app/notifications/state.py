@@ -0,0 +1,81 @@
+from datetime import datetime, timedelta
+from bson.objectid import ObjectId
+from flask import current_app
+from app import get_db
+
+def get_notification_state(user_id):
+    """Estado pré-calculado das notificações do usuário (contador de não lidas)
+
+    O contador só é recontado quando foi marcado como desatualizado por uma
+    escrita ou quando passa de NOTIFICATION_STATE_TTL segundos. Se as regras
+    não forem avaliadas há NOTIFICATION_EVALUATE_INTERVAL segundos (sem
+    agendamento ou escritas), a avaliação é agendada em segundo plano; a
+    leitura nunca avalia as regras na própria requisição.
+    """
+    db = get_db()
+    state = db.notification_state.find_one({'_id': ObjectId(user_id)})
+    now = datetime.utcnow()
+
+    ttl = timedelta(seconds=current_app.config.get('NOTIFICATION_STATE_TTL', 300))
+    if not state or state.get('stale') or not state.get('computed_at') or state['computed_at'] <= now - ttl:
+        state = refresh_notification_state(user_id, state)
+
+    interval = timedelta(seconds=current_app.config.get('NOTIFICATION_EVALUATE_INTERVAL', 3600))
+    if not state.get('evaluated_at') or state['evaluated_at'] < now - interval:
+        request_notification_evaluation(user_id, now - interval)
+
+    return state
+
+def request_notification_evaluation(user_id, due_before):
+    """Agenda uma avaliação em segundo plano, no máximo uma por intervalo
+
+    A marca evaluation_requested_at é gravada com uma atualização condicional,
+    então só a requisição que a gravou (entre leituras concorrentes) agenda.
+    """
+    claimed = get_db().notification_state.update_one(
+        {
+            '_id': ObjectId(user_id),
+            '$or': [
+                {'evaluation_requested_at': {'$exists': False}},
+                {'evaluation_requested_at': {'$lt': due_before}}
+            ]
+        },
+        {'$set': {'evaluation_requested_at': datetime.utcnow()}}
+    )
+    if claimed.modified_count:
+        from app.notifications.engine import submit_notification_evaluation
+        submit_notification_evaluation(current_app._get_current_object(), user_id)
+
+def refresh_notification_state(user_id, previous=None):
+    """Reconta as notificações ativas não lidas e grava o estado"""
+    db = get_db()
+    unread_count = db.notifications.count_documents({
+        'user_id': ObjectId(user_id),
+        'active': True,
+        'read': False
+    })
+
+    version = previous.get('version', 0) if previous else 0
+    if not previous or previous.get('unread_count') != unread_count:
+        version += 1
+
+    state = {
+        'unread_count': unread_count,
+        'version': version,
+        'computed_at': datetime.utcnow(),
+        'stale': False
+    }
+    db.notification_state.update_one({'_id': ObjectId(user_id)}, {'$set': state}, upsert=True)
+
+    return {**(previous or {}), **state, '_id': ObjectId(user_id)}
+
+def mark_notification_state_stale(*user_ids):
+    """Marca o estado de notificações dos usuários para recálculo na próxima leitura"""
+    user_ids = [ObjectId(user_id) for user_id in user_ids if user_id]
+    if not user_ids:
+        return
+
+    get_db().notification_state.update_many(
+        {'_id': {'$in': user_ids}},
+        {'$set': {'stale': True}}
+    )
@@ -0,0 +1,90 @@
+import time
+from bson.objectid import ObjectId
+from flask import current_app, g, session
+from app import get_db
+from app.models import User
+from app.context import load_user_context
+
+SNAPSHOT_KEY = 'permission_snapshot'
+
+def build_permission_snapshot(user_context):
+    """Snapshot compacto das permissões do usuário: pares [family_id, permissão]"""
+    perms = []
+    for family in user_context.families:
+        for member in family.members:
+            if str(member['user_id']) == user_context.user_id:
+                perms.extend([str(family._id), permission] for permission in member.get('permissions', []))
+                break
+
+    return {
+        'version': user_context.user.permissions_version,
+        'expires_at': time.time() + current_app.config.get('PERMISSION_SNAPSHOT_TTL', 60),
+        'perms': perms
+    }
+
+def get_permissions(verify=False):
+    """Conjunto {(family_id, permissão)} do usuário da sessão
+
+    O snapshot fica na sessão e vale por PERMISSION_SNAPSHOT_TTL segundos sem
+    consultar o banco. Depois disso só a versão (users.permissions_version) é
+    relida; o snapshot é remontado apenas quando ela mudou. Se o contexto do
+    usuário já foi carregado na requisição, a versão é conferida de graça.
+    Com `verify` (antes de escritas) a versão é sempre conferida, uma vez por
+    requisição, para que remoções e rebaixamentos valham na hora.
+    """
+    if 'permissions' in g and (not verify or g.get('permissions_verified')):
+        return g.permissions
+
+    snapshot = session.get(SNAPSHOT_KEY)
+    if snapshot and not snapshot_is_current(snapshot, verify):
+        snapshot = None
+
+    if snapshot is None:
+        user_context = load_user_context()
+        if not user_context:
+            g.permissions = frozenset()
+            return g.permissions
+        snapshot = build_permission_snapshot(user_context)
+        session[SNAPSHOT_KEY] = snapshot
+
+    g.permissions = frozenset((family_id, permission) for family_id, permission in snapshot['perms'])
+    g.permissions_verified = verify or g.get('permissions_verified', False)
+    return g.permissions
+
+def snapshot_is_current(snapshot, verify=False):
+    """Confere a versão do snapshot (sem ir ao banco enquanto o TTL não vence, salvo com `verify`)"""
+    user_context = g.get('user_context')
+    if user_context is not None:
+        version = user_context.user.permissions_version
+    elif snapshot['expires_at'] > time.time() and not verify:
+        return True
+    else:
+        user = get_db().users.find_one({'_id': ObjectId(session['user_id'])}, {'permissions_version': 1})
+        version = user.get('permissions_version', 0) if user else None
+
+    if version != snapshot['version']:
+        return False
+
+    if snapshot['expires_at'] <= time.time():
+        snapshot['expires_at'] = time.time() + current_app.config.get('PERMISSION_SNAPSHOT_TTL', 60)
+        session[SNAPSHOT_KEY] = snapshot
+    return True
+
+def has_family_permission(family_id, permission):
+    """Verifica se o usuário da sessão tem a permissão na família
+
+    Usada antes de escritas (editar/excluir), então confere a versão do snapshot.
+    """
+    return (str(family_id), permission) in get_permissions(verify=True)
+
+def discard_permission_snapshot(user_id):
+    """Descarta o snapshot se for do usuário da sessão (as outras sessões conferem a versão)"""
+    if session.get('user_id') == str(user_id):
+        session.pop(SNAPSHOT_KEY, None)
+        g.pop('permissions', None)
+
+def bump_permissions_version(user_id):
+    """Invalida os snapshots de permissão do usuário em todas as sessões"""
+    get_db().users.update_one({'_id': ObjectId(user_id)}, {'$inc': {'permissions_version': 1}})
+    User.forget(user_id)
+    discard_permission_snapshot(user_id)
@@ -0,0 +1,57 @@
+import os
+import re
+import subprocess
+import sys
+
+# Boot medido em um processo novo: imports do app + create_app
+BOOT_SCRIPT = (
+    "import time\n"
+    "started = time.perf_counter()\n"
+    "from app import create_app\n"
+    "create_app()\n"
+    "print(f'BOOT_MS={(time.perf_counter() - started) * 1000}')\n"
+)
+
+IMPORTTIME_LINE = re.compile(r'^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)')
+
+def profile_imports():
+    """Executa o boot com `python -X importtime` e retorna o tempo por módulo
+
+    Os módulos vêm ordenados pelo tempo acumulado (o próprio import mais os
+    imports que ele dispara). A conexão ao MongoDB fica de fora do boot.
+    """
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env = dict(os.environ, MONGO_CONNECT_ON_STARTUP='false')
+
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', BOOT_SCRIPT],
+        cwd=root, env=env, capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"Falha no boot do app: {result.stderr.strip().splitlines()[-1:]}")
+
+    modules = parse_importtime(result.stderr)
+    match = re.search(r'BOOT_MS=([\d.]+)', result.stdout)
+
+    return {
+        'modules': modules,
+        'total_ms': float(match.group(1)) if match else 0.0
+    }
+
+def parse_importtime(output):
+    """Converte a saída de -X importtime em [{module, self_ms, cumulative_ms, depth}]"""
+    modules = []
+    for line in output.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if not match:
+            continue
+        self_us, cumulative_us, indent, module = match.groups()
+        modules.append({
+            'module': module,
+            'self_ms': int(self_us) / 1000,
+            'cumulative_ms': int(cumulative_us) / 1000,
+            'depth': (len(indent) - 1) // 2
+        })
+
+    modules.sort(key=lambda item: item['cumulative_ms'], reverse=True)
+    return modules
@@ -0,0 +1,19 @@
+import asyncio
+from collections import namedtuple
+
+# Consulta compartilhada entre as views síncronas e a API assíncrona:
+# coleção + pipeline de agregação + função que dá forma ao resultado
+Query = namedtuple('Query', ['collection', 'pipeline', 'shape'])
+
+def run_query(db, query):
+    """Executa a consulta com o driver síncrono"""
+    return query.shape(list(db[query.collection].aggregate(query.pipeline)))
+
+async def run_query_async(db, query):
+    """Executa a consulta com o driver assíncrono (AsyncMongoClient)"""
+    cursor = await db[query.collection].aggregate(query.pipeline)
+    return query.shape(await cursor.to_list(None))
+
+async def gather_queries(db, *queries):
+    """Executa consultas independentes em paralelo no event loop"""
+    return await asyncio.gather(*(run_query_async(db, query) for query in queries))
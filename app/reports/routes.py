@@ -1,22 +1,25 @@
-from flask import Blueprint, request, jsonify, session, render_template, redirect, url_for, make_response
+from flask import Blueprint, request, jsonify, render_template, redirect, url_for, make_response, Response, stream_with_context
 from app.auth.routes import login_required
 from app.models import User, Transaction
+from app.context import load_user_context
+from app.utils import iter_csv
+from app.queries import Query, run_query
+from app.storage import get_transaction_store
 from bson.objectid import ObjectId
 from datetime import datetime, timedelta
-import calendar
 import json
-import csv
-import io
 
 reports = Blueprint('reports', __name__)
 
+# Períodos aceitos pela análise de tendências, em meses
+TREND_PERIODS = {'3months': 3, '6months': 6, '1year': 12, '2years': 24, '5years': 60}
+
 @reports.route('/generate', methods=['POST'])
 @login_required
 def generate_report():
     """Gerar relatório personalizado"""
     try:
-        user_id = session['user_id']
-        user = User.find_by_id(user_id)
+        user_context = load_user_context()
         
         data = request.get_json() if request.is_json else request.form
         
@@ -28,12 +31,7 @@ def generate_report():
         
         # Determinar conta
         account_type = data.get('account', 'individual')
-        if account_type == 'family' and user.default_family:
-            owner_type = 'family'
-            owner_id = user.default_family
-        else:
-            owner_type = 'individual'
-            owner_id = user_id
+        owner_id, owner_type = user_context.resolve_owner(account_type)
         
         # Gerar relatório baseado no tipo
         if report_type == 'summary':
@@ -58,8 +56,7 @@ def generate_report():
 def export_report(format):
     """Exportar relatório em diferentes formatos"""
     try:
-        user_id = session['user_id']
-        user = User.find_by_id(user_id)
+        user_context = load_user_context()
         
         # Parâmetros da query
         start_date = request.args.get('start_date')
@@ -74,12 +71,7 @@ def export_report(format):
             end_date = datetime.strptime(end_date, '%Y-%m-%d')
         
         # Determinar conta
-        if account == 'family' and user.default_family:
-            owner_type = 'family'
-            owner_id = user.default_family
-        else:
-            owner_type = 'individual'
-            owner_id = user_id
+        owner_id, owner_type = user_context.resolve_owner(account)
         
         if format.lower() == 'csv':
             return export_csv_report(owner_id, owner_type, start_date, end_date)
@@ -96,15 +88,13 @@ def export_report(format):
 def api_financial_insights(owner_id):
     """Gerar insights financeiros inteligentes"""
     try:
-        user_id = session['user_id']
-        user = User.find_by_id(user_id)
+        user_context = load_user_context()
         
         # Verificar acesso
-        if owner_id != user_id and (not user.default_family or str(user.default_family) != owner_id):
+        owner_type = user_context.owner_type_for(owner_id)
+        if not owner_type:
             return jsonify({'error': 'Sem acesso'}), 403
         
-        owner_type = 'individual' if owner_id == user_id else 'family'
-        
         insights = generate_financial_insights(owner_id, owner_type)
         
         return jsonify(insights)
@@ -117,15 +107,13 @@ def api_financial_insights(owner_id):
 def api_spending_trends(owner_id):
     """Análise de tendências de gastos"""
     try:
-        user_id = session['user_id']
-        user = User.find_by_id(user_id)
+        user_context = load_user_context()
         
         # Verificar acesso
-        if owner_id != user_id and (not user.default_family or str(user.default_family) != owner_id):
+        owner_type = user_context.owner_type_for(owner_id)
+        if not owner_type:
             return jsonify({'error': 'Sem acesso'}), 403
-        
-        owner_type = 'individual' if owner_id == user_id else 'family'
-        period = request.args.get('period', '6months')  # 3months, 6months, 1year
+        period = request.args.get('period', '6months')  # 3months, 6months, 1year, 2years, 5years
         
         trends = analyze_spending_trends(owner_id, owner_type, period)
         
@@ -139,14 +127,12 @@ def api_spending_trends(owner_id):
 def api_financial_forecast(owner_id):
     """Previsão financeira baseada em dados históricos"""
     try:
-        user_id = session['user_id']
-        user = User.find_by_id(user_id)
+        user_context = load_user_context()
         
         # Verificar acesso
-        if owner_id != user_id and (not user.default_family or str(user.default_family) != owner_id):
+        owner_type = user_context.owner_type_for(owner_id)
+        if not owner_type:
             return jsonify({'error': 'Sem acesso'}), 403
-        
-        owner_type = 'individual' if owner_id == user_id else 'family'
         months_ahead = int(request.args.get('months', 3))
         
         forecast = generate_financial_forecast(owner_id, owner_type, months_ahead)
@@ -160,59 +146,24 @@ def api_financial_forecast(owner_id):
 
 def generate_summary_report(owner_id, owner_type, start_date, end_date):
     """Relatório resumo do período"""
-    from app import get_db
-    db = get_db()
-    
-    # Resumo geral
-    pipeline = [
-        {
-            '$match': {
-                'owner_id': ObjectId(owner_id),
-                'owner_type': owner_type,
-                'date': {'$gte': start_date, '$lte': end_date}
-            }
-        },
-        {
-            '$group': {
-                '_id': '$type',
-                'total': {'$sum': '$amount'},
-                'count': {'$sum': 1},
-                'avg': {'$avg': '$amount'}
-            }
-        }
-    ]
-    
-    result = list(db.transactions.aggregate(pipeline))
+    # Totais por tipo e categoria em uma leitura
+    totals = get_transaction_store().period_totals(owner_id, owner_type, start_date, end_date)
     
     summary = {'income': 0, 'expense': 0, 'balance': 0, 'total_transactions': 0}
+    categories = {}
     
-    for item in result:
-        summary[item['_id']] = item['total']
+    for item in totals:
+        summary[item['type']] = summary.get(item['type'], 0) + item['total']
         summary['total_transactions'] += item['count']
+        
+        # Gastos por categoria
+        if item['type'] == 'expense':
+            category = categories.setdefault(item['category'], {'_id': item['category'], 'total': 0, 'count': 0})
+            category['total'] += item['total']
+            category['count'] += item['count']
     
     summary['balance'] = summary['income'] - summary['expense']
-    
-    # Gastos por categoria
-    category_pipeline = [
-        {
-            '$match': {
-                'owner_id': ObjectId(owner_id),
-                'owner_type': owner_type,
-                'type': 'expense',
-                'date': {'$gte': start_date, '$lte': end_date}
-            }
-        },
-        {
-            '$group': {
-                '_id': '$category',
-                'total': {'$sum': '$amount'},
-                'count': {'$sum': 1}
-            }
-        },
-        {'$sort': {'total': -1}}
-    ]
-    
-    categories = list(db.transactions.aggregate(category_pipeline))
+    categories = sorted(categories.values(), key=lambda item: item['total'], reverse=True)
     
     return {
         'period': f"{start_date.strftime('%d/%m/%Y')} - {end_date.strftime('%d/%m/%Y')}",
@@ -223,22 +174,10 @@ def generate_summary_report(owner_id, owner_type, start_date, end_date):
 
 def generate_detailed_report(owner_id, owner_type, start_date, end_date, categories=None):
     """Relatório detalhado com transações"""
-    from app import get_db
-    db = get_db()
-    
-    # Filtro base
-    match_filter = {
-        'owner_id': ObjectId(owner_id),
-        'owner_type': owner_type,
-        'date': {'$gte': start_date, '$lte': end_date}
-    }
-    
-    # Filtrar por categorias se especificado
-    if categories:
-        match_filter['category'] = {'$in': categories}
-    
-    # Buscar transações
-    transactions = list(db.transactions.find(match_filter).sort('date', -1))
+    # Buscar transações (filtradas por categorias se especificado)
+    transactions = list(get_transaction_store().find_transactions(
+        owner_id, owner_type, start_date, end_date, categories
+    ))
     
     # Converter ObjectIds para strings
     for transaction in transactions:
@@ -296,78 +235,65 @@ def generate_comparison_report(owner_id, owner_type, start_date, end_date):
 def generate_financial_insights(owner_id, owner_type):
     """Gerar insights financeiros inteligentes"""
     from app import get_db
-    db = get_db()
-    
+    return run_query(get_db(), financial_insights_query(owner_id, owner_type))
+
+def financial_insights_query(owner_id, owner_type):
+    """Uma leitura da janela de 180 dias do dono com um $facet por dado de que as regras precisam"""
     # Últimos 6 meses de dados
     end_date = datetime.now()
     start_date = end_date - timedelta(days=180)
     
-    insights = []
-    
-    # 1. Categoria com maior crescimento
-    monthly_categories = get_monthly_category_spending(db, owner_id, owner_type, start_date, end_date)
-    
-    if monthly_categories:
-        growth_analysis = analyze_category_growth(monthly_categories)
-        if growth_analysis:
-            insights.append({
-                'type': 'warning',
-                'title': 'Categoria em Crescimento',
-                'message': f"Seus gastos com {growth_analysis['category']} aumentaram {growth_analysis['growth']:.1f}% nos últimos meses",
-                'category': growth_analysis['category'],
-                'data': growth_analysis
-            })
-    
-    # 2. Melhor mês de economia
-    monthly_balance = get_monthly_balance(db, owner_id, owner_type, start_date, end_date)
-    if monthly_balance:
-        best_month = max(monthly_balance, key=lambda x: x['balance'])
-        insights.append({
-            'type': 'success',
-            'title': 'Melhor Mês',
-            'message': f"Seu melhor mês foi {best_month['month']}/{best_month['year']} com saldo de R$ {best_month['balance']:.2f}",
-            'data': best_month
-        })
-    
-    # 3. Padrão de gastos
-    spending_pattern = analyze_spending_pattern(db, owner_id, owner_type)
-    if spending_pattern:
-        insights.append({
-            'type': 'info',
-            'title': 'Padrão de Gastos',
-            'message': spending_pattern['message'],
-            'data': spending_pattern
-        })
-    
-    return insights
-
-def analyze_spending_trends(owner_id, owner_type, period):
-    """Analisar tendências de gastos"""
-    from app import get_db
-    db = get_db()
-    
-    # Definir período
-    end_date = datetime.now()
-    if period == '3months':
-        start_date = end_date - timedelta(days=90)
-        months = 3
-    elif period == '1year':
-        start_date = end_date - timedelta(days=365)
-        months = 12
-    else:  # 6months
-        start_date = end_date - timedelta(days=180)
-        months = 6
-    
-    # Gastos mensais por categoria
     pipeline = [
         {
             '$match': {
                 'owner_id': ObjectId(owner_id),
                 'owner_type': owner_type,
-                'type': 'expense',
                 'date': {'$gte': start_date, '$lte': end_date}
             }
         },
+        {'$facet': {name: build(end_date) for name, build in INSIGHT_FACETS.items()}}
+    ]
+    
+    return Query('transactions', pipeline,
+                 lambda result: combine_financial_insights(result[0] if result else {}))
+
+def combine_financial_insights(facets):
+    """Aplica as regras registradas aos resultados do $facet"""
+    insights = []
+    for rule in INSIGHT_RULES:
+        try:
+            insight = rule(facets)
+        except Exception as e:
+            print(f"Erro na regra de insight {rule.__name__}: {e}")
+            continue
+        if insight:
+            insights.append(insight)
+    
+    return insights
+
+# Insights: cada regra lê os facets de que precisa. Uma regra nova usa um facet
+# existente ou registra o seu em INSIGHT_FACETS, sem criar outra leitura.
+
+INSIGHT_FACETS = {}
+INSIGHT_RULES = []
+
+def insight_facet(name):
+    """Registra um facet (estágios aplicados à janela de 180 dias) para as regras"""
+    def decorator(build):
+        INSIGHT_FACETS[name] = build
+        return build
+    return decorator
+
+def insight_rule(rule):
+    """Registra uma regra de insight: recebe os facets e retorna um insight ou None"""
+    INSIGHT_RULES.append(rule)
+    return rule
+
+@insight_facet('monthly_categories')
+def monthly_categories_facet(end_date):
+    """Gastos mensais por categoria"""
+    return [
+        {'$match': {'type': 'expense'}},
         {
             '$group': {
                 '_id': {
@@ -380,54 +306,11 @@ def analyze_spending_trends(owner_id, owner_type, period):
         },
         {'$sort': {'_id.year': 1, '_id.month': 1}}
     ]
-    
-    result = list(db.transactions.aggregate(pipeline))
-    
-    # Organizar dados por categoria
-    trends = {}
-    for item in result:
-        category = item['_id']['category']
-        month_key = f"{item['_id']['year']}-{item['_id']['month']:02d}"
-        
-        if category not in trends:
-            trends[category] = {}
-        
-        trends[category][month_key] = item['total']
-    
-    # Calcular tendências (crescimento/decrescimento)
-    trend_analysis = {}
-    for category, monthly_data in trends.items():
-        values = list(monthly_data.values())
-        if len(values) >= 2:
-            # Regressão linear simples para detectar tendência
-            trend = calculate_trend(values)
-            trend_analysis[category] = {
-                'trend': trend,
-                'monthly_data': monthly_data,
-                'total': sum(values),
-                'average': sum(values) / len(values)
-            }
-    
-    return trend_analysis
 
-def generate_financial_forecast(owner_id, owner_type, months_ahead):
-    """Gerar previsão financeira baseada em dados históricos"""
-    from app import get_db
-    db = get_db()
-    
-    # Últimos 12 meses para base de cálculo
-    end_date = datetime.now()
-    start_date = end_date - timedelta(days=365)
-    
-    # Dados mensais históricos
-    pipeline = [
-        {
-            '$match': {
-                'owner_id': ObjectId(owner_id),
-                'owner_type': owner_type,
-                'date': {'$gte': start_date, '$lte': end_date}
-            }
-        },
+@insight_facet('monthly_balance')
+def monthly_balance_facet(end_date):
+    """Totais mensais por tipo"""
+    return [
         {
             '$group': {
                 '_id': {
@@ -440,49 +323,174 @@ def generate_financial_forecast(owner_id, owner_type, months_ahead):
         },
         {'$sort': {'_id.year': 1, '_id.month': 1}}
     ]
+
+@insight_facet('weekday_spending')
+def weekday_spending_facet(end_date):
+    """Gastos por dia da semana nos últimos 90 dias"""
+    return [
+        {'$match': {'type': 'expense', 'date': {'$gte': end_date - timedelta(days=90)}}},
+        {
+            '$group': {
+                '_id': {'$dayOfWeek': '$date'},
+                'total': {'$sum': '$amount'},
+                'count': {'$sum': 1}
+            }
+        },
+        {'$sort': {'total': -1}}
+    ]
+
+@insight_rule
+def category_growth_insight(facets):
+    """1. Categoria com maior crescimento"""
+    growth_analysis = analyze_category_growth(facets.get('monthly_categories', []))
+    if growth_analysis:
+        return {
+            'type': 'warning',
+            'title': 'Categoria em Crescimento',
+            'message': f"Seus gastos com {growth_analysis['category']} aumentaram {growth_analysis['growth']:.1f}% nos últimos meses",
+            'category': growth_analysis['category'],
+            'data': growth_analysis
+        }
+
+@insight_rule
+def best_month_insight(facets):
+    """2. Melhor mês de economia"""
+    monthly_balance = shape_monthly_balance(facets.get('monthly_balance', []))
+    if monthly_balance:
+        best_month = max(monthly_balance, key=lambda x: x['balance'])
+        return {
+            'type': 'success',
+            'title': 'Melhor Mês',
+            'message': f"Seu melhor mês foi {best_month['month']}/{best_month['year']} com saldo de R$ {best_month['balance']:.2f}",
+            'data': best_month
+        }
+
+@insight_rule
+def spending_pattern_insight(facets):
+    """3. Padrão de gastos"""
+    spending_pattern = shape_spending_pattern(facets.get('weekday_spending', []))
+    if spending_pattern:
+        return {
+            'type': 'info',
+            'title': 'Padrão de Gastos',
+            'message': spending_pattern['message'],
+            'data': spending_pattern
+        }
+
+def analyze_spending_trends(owner_id, owner_type, period):
+    """Analisar tendências de gastos"""
+    from app import get_db
+    return run_query(get_db(), spending_trends_query(owner_id, owner_type, period))
+
+def spending_trends_query(owner_id, owner_type, period):
+    """Consulta das tendências: gastos mensais por categoria do período"""
+    from app.reports.timeseries import last_months
     
-    result = list(db.transactions.aggregate(pipeline))
+    # Definir período (meses do calendário, incluindo o atual)
+    months = last_months(datetime.now(), TREND_PERIODS.get(period, 6))
     
-    # Organizar dados históricos
-    monthly_data = {}
-    for item in result:
-        month_key = f"{item['_id']['year']}-{item['_id']['month']:02d}"
-        if month_key not in monthly_data:
-            monthly_data[month_key] = {'income': 0, 'expense': 0}
-        monthly_data[month_key][item['_id']['type']] = item['total']
+    # Gastos mensais por categoria
+    query = get_transaction_store().monthly_totals_query(
+        owner_id, owner_type, months[0], months[-1], trans_type='expense', by_category=True
+    )
+    return query._replace(shape=lambda result: shape_spending_trends(query.shape(result), months))
+
+def shape_spending_trends(result, months):
+    """Tendência de todas as categorias de uma vez sobre a matriz mês x categoria"""
+    from app.reports.timeseries import MonthlyMatrix
+    
+    matrix = MonthlyMatrix.from_totals({
+        (item['category'], item['year'], item['month']): item['total']
+        for item in result
+    }, months)
+    
+    slopes = matrix.slopes()
+    totals = matrix.totals()
+    averages = matrix.means()
+    moving_averages = matrix.moving_average(3)[:, -1] if months else totals
+    active_months = matrix.active_months()
     
-    # Calcular médias e tendências
-    income_values = [data['income'] for data in monthly_data.values()]
-    expense_values = [data['expense'] for data in monthly_data.values()]
+    # Linha de base sazonal do próximo mês (mesmo mês em anos anteriores)
+    next_month = months[-1][1] % 12 + 1 if months else None
+    baseline = matrix.seasonal_baseline(next_month) if next_month else None
     
-    avg_income = sum(income_values) / len(income_values) if income_values else 0
-    avg_expense = sum(expense_values) / len(expense_values) if expense_values else 0
+    month_keys = matrix.month_keys()
+    values = matrix.values.tolist()
+    
+    # Só categorias com gastos em pelo menos dois meses
+    trend_analysis = {}
+    for i, category in enumerate(matrix.rows):
+        if active_months[i] < 2:
+            continue
+        trend_analysis[category] = {
+            'trend': float(slopes[i]),
+            'monthly_data': dict(zip(month_keys, values[i])),
+            'total': float(totals[i]),
+            'average': float(averages[i]),
+            'moving_average': round(float(moving_averages[i]), 2),
+            'seasonal_baseline': round(float(baseline[i]), 2) if baseline is not None else None
+        }
+    
+    return trend_analysis
+
+def generate_financial_forecast(owner_id, owner_type, months_ahead):
+    """Gerar previsão financeira baseada em dados históricos"""
+    from app import get_db
+    return run_query(get_db(), financial_forecast_query(owner_id, owner_type, months_ahead))
+
+def financial_forecast_query(owner_id, owner_type, months_ahead):
+    """Consulta da previsão: totais mensais materializados dos últimos 12 meses"""
+    from app.models import MonthlyRollup
+    from app.reports.timeseries import last_months
+    
+    end_date = datetime.now()
+    months = last_months(end_date, 12)
+    summaries = MonthlyRollup.summaries_query(owner_id, owner_type, months[0], months[-1])
+    
+    return Query(summaries.collection, summaries.pipeline,
+                 lambda result: shape_financial_forecast(summaries.shape(result), months_ahead))
+
+def shape_financial_forecast(summaries, months_ahead):
+    """Projeta os próximos meses a partir dos totais mensais {(ano, mês): {...}}"""
+    import numpy as np
+    from app.reports.timeseries import MonthlyMatrix, next_months
+    
+    # Série densa a partir do primeiro mês com movimento (meses vazios no meio contam como zero)
+    months = sorted(summaries)
+    first = next((i for i, month in enumerate(months)
+                  if summaries[month]['income'] or summaries[month]['expense']), len(months))
+    months = months[first:]
+    
+    matrix = MonthlyMatrix(['income', 'expense'], months, np.array([
+        [summaries[month]['income'] for month in months],
+        [summaries[month]['expense'] for month in months]
+    ]).reshape(2, len(months)))
+    
+    averages = matrix.means()
     
     # Tendência simples (média dos últimos 3 meses vs média geral)
-    recent_income = sum(income_values[-3:]) / 3 if len(income_values) >= 3 else avg_income
-    recent_expense = sum(expense_values[-3:]) / 3 if len(expense_values) >= 3 else avg_expense
+    recent = matrix.recent_mean(3) if len(months) >= 3 else averages
+    trends = np.divide(recent - averages, averages, out=np.zeros(2), where=averages > 0)
     
-    income_trend = (recent_income - avg_income) / avg_income if avg_income > 0 else 0
-    expense_trend = (recent_expense - avg_expense) / avg_expense if avg_expense > 0 else 0
+    # Aplicar tendência gradualmente (suavizada): 10% da tendência por mês
+    steps = np.arange(1, months_ahead + 1)
+    projected = recent[:, None] * (1 + trends[:, None] * 0.1) ** steps
     
-    # Gerar previsão para os próximos meses
-    forecast = []
-    current_income = recent_income
-    current_expense = recent_expense
+    last = months[-1] if months else (datetime.now().year, datetime.now().month)
     
-    for i in range(months_ahead):
-        # Aplicar tendência gradualmente (suavizada)
-        current_income *= (1 + income_trend * 0.1)  # 10% da tendência por mês
-        current_expense *= (1 + expense_trend * 0.1)
-        
-        forecast_date = end_date + timedelta(days=30 * (i + 1))
+    forecast = []
+    for i, (year, month) in enumerate(next_months(last, months_ahead)):
+        income, expense = projected[0, i], projected[1, i]
         forecast.append({
-            'month': forecast_date.strftime('%m/%Y'),
-            'predicted_income': round(current_income, 2),
-            'predicted_expense': round(current_expense, 2),
-            'predicted_balance': round(current_income - current_expense, 2)
+            'month': f"{month:02d}/{year}",
+            'predicted_income': round(float(income), 2),
+            'predicted_expense': round(float(expense), 2),
+            'predicted_balance': round(float(income - expense), 2)
         })
     
+    avg_income, avg_expense = (float(value) for value in averages)
+    slopes = matrix.slopes()
+    
     return {
         'historical_average': {
             'income': round(avg_income, 2),
@@ -490,53 +498,52 @@ def generate_financial_forecast(owner_id, owner_type, months_ahead):
             'balance': round(avg_income - avg_expense, 2)
         },
         'trends': {
-            'income_trend': round(income_trend * 100, 2),  # Percentual
-            'expense_trend': round(expense_trend * 100, 2)
+            'income_trend': round(float(trends[0]) * 100, 2),  # Percentual
+            'expense_trend': round(float(trends[1]) * 100, 2),
+            'income_slope': round(float(slopes[0]), 2),  # R$ por mês
+            'expense_slope': round(float(slopes[1]), 2)
         },
         'forecast': forecast
     }
 
+# Colunas lidas na exportação CSV
+EXPORT_FIELDS = {'_id': 0, 'date': 1, 'type': 1, 'category': 1, 'description': 1,
+                 'amount': 1, 'payment_method': 1, 'tags': 1, 'added_by': 1}
+
 def export_csv_report(owner_id, owner_type, start_date, end_date):
-    """Exportar relatório em formato CSV"""
-    from app import get_db
-    db = get_db()
+    """Exportar relatório em formato CSV (streaming)"""
+    store = get_transaction_store()
     
-    # Buscar transações do período
-    transactions = db.transactions.find({
-        'owner_id': ObjectId(owner_id),
-        'owner_type': owner_type,
-        'date': {'$gte': start_date, '$lte': end_date}
-    }).sort('date', -1)
+    # Buscar transações do período (só as colunas exportadas)
+    transactions = store.find_transactions(owner_id, owner_type, start_date, end_date,
+                                           projection=EXPORT_FIELDS)
     
-    # Criar CSV
-    output = io.StringIO()
-    writer = csv.writer(output)
+    # Pré-carregar os autores de uma vez ($in) em vez de um find_by_id por linha
+    authors = User.find_many_by_ids(store.author_ids(owner_id, owner_type, start_date, end_date))
     
-    # Cabeçalho
-    writer.writerow([
+    def rows():
+        for transaction in transactions:
+            user = authors.get(transaction['added_by'])
+            added_by_name = user.name if user else 'Usuário não encontrado'
+            
+            yield [
+                transaction['date'].strftime('%d/%m/%Y %H:%M'),
+                'Receita' if transaction['type'] == 'income' else 'Despesa',
+                transaction['category'],
+                transaction.get('description', ''),
+                f"{transaction['amount']:.2f}".replace('.', ','),
+                transaction.get('payment_method', ''),
+                ', '.join(transaction.get('tags') or []),
+                added_by_name
+            ]
+    
+    header = [
         'Data', 'Tipo', 'Categoria', 'Descrição', 'Valor', 
         'Método de Pagamento', 'Tags', 'Adicionado por'
-    ])
+    ]
     
-    # Dados
-    for transaction in transactions:
-        # Buscar nome do usuário que adicionou
-        user = User.find_by_id(transaction['added_by'])
-        added_by_name = user.name if user else 'Usuário não encontrado'
-        
-        writer.writerow([
-            transaction['date'].strftime('%d/%m/%Y %H:%M'),
-            'Receita' if transaction['type'] == 'income' else 'Despesa',
-            transaction['category'],
-            transaction.get('description', ''),
-            f"{transaction['amount']:.2f}".replace('.', ','),
-            transaction.get('payment_method', ''),
-            ', '.join(transaction.get('tags', [])),
-            added_by_name
-        ])
-    
-    # Criar resposta
-    response = make_response(output.getvalue())
+    # Resposta em streaming (memória constante)
+    response = Response(stream_with_context(iter_csv(header, rows())))
     response.headers['Content-Type'] = 'text/csv; charset=utf-8'
     response.headers['Content-Disposition'] = f'attachment; filename=relatorio_{start_date.strftime("%Y%m%d")}_{end_date.strftime("%Y%m%d")}.csv'
     
@@ -554,32 +561,6 @@ def export_json_report(owner_id, owner_type, start_date, end_date):
 
 # Funções auxiliares para análises
 
-def get_monthly_category_spending(db, owner_id, owner_type, start_date, end_date):
-    """Obter gastos mensais por categoria"""
-    pipeline = [
-        {
-            '$match': {
-                'owner_id': ObjectId(owner_id),
-                'owner_type': owner_type,
-                'type': 'expense',
-                'date': {'$gte': start_date, '$lte': end_date}
-            }
-        },
-        {
-            '$group': {
-                '_id': {
-                    'year': {'$year': '$date'},
-                    'month': {'$month': '$date'},
-                    'category': '$category'
-                },
-                'total': {'$sum': '$amount'}
-            }
-        },
-        {'$sort': {'_id.year': 1, '_id.month': 1}}
-    ]
-    
-    return list(db.transactions.aggregate(pipeline))
-
 def analyze_category_growth(monthly_data):
     """Analisar crescimento por categoria"""
     categories = {}
@@ -618,31 +599,8 @@ def analyze_category_growth(monthly_data):
     
     return None
 
-def get_monthly_balance(db, owner_id, owner_type, start_date, end_date):
-    """Obter saldo mensal"""
-    pipeline = [
-        {
-            '$match': {
-                'owner_id': ObjectId(owner_id),
-                'owner_type': owner_type,
-                'date': {'$gte': start_date, '$lte': end_date}
-            }
-        },
-        {
-            '$group': {
-                '_id': {
-                    'year': {'$year': '$date'},
-                    'month': {'$month': '$date'},
-                    'type': '$type'
-                },
-                'total': {'$sum': '$amount'}
-            }
-        },
-        {'$sort': {'_id.year': 1, '_id.month': 1}}
-    ]
-    
-    result = list(db.transactions.aggregate(pipeline))
-    
+def shape_monthly_balance(result):
+    """Calcula o saldo de cada mês a partir dos totais por tipo"""
     # Calcular saldo mensal
     monthly_balance = {}
     for item in result:
@@ -658,29 +616,8 @@ def get_monthly_balance(db, owner_id, owner_type, start_date, end_date):
     
     return list(monthly_balance.values())
 
-def analyze_spending_pattern(db, owner_id, owner_type):
-    """Analisar padrão de gastos (dia da semana, hora, etc.)"""
-    pipeline = [
-        {
-            '$match': {
-                'owner_id': ObjectId(owner_id),
-                'owner_type': owner_type,
-                'type': 'expense',
-                'date': {'$gte': datetime.now() - timedelta(days=90)}
-            }
-        },
-        {
-            '$group': {
-                '_id': {'$dayOfWeek': '$date'},
-                'total': {'$sum': '$amount'},
-                'count': {'$sum': 1}
-            }
-        },
-        {'$sort': {'total': -1}}
-    ]
-    
-    result = list(db.transactions.aggregate(pipeline))
-    
+def shape_spending_pattern(result):
+    """Dia da semana com mais gastos"""
     if result:
         # Dia da semana com mais gastos (1=Domingo, 7=Sábado)
         days = ['Domingo', 'Segunda', 'Terça', 'Quarta', 'Quinta', 'Sexta', 'Sábado']
@@ -694,19 +631,3 @@ def analyze_spending_pattern(db, owner_id, owner_type):
         }
     
     return None
-
-def calculate_trend(values):
-    """Calcular tendência simples usando regressão linear básica"""
-    if len(values) < 2:
-        return 0
-    
-    n = len(values)
-    x_sum = sum(range(n))
-    y_sum = sum(values)
-    xy_sum = sum(i * values[i] for i in range(n))
-    x2_sum = sum(i * i for i in range(n))
-    
-    # Coeficiente angular da regressão linear
-    slope = (n * xy_sum - x_sum * y_sum) / (n * x2_sum - x_sum * x_sum)
-    
-    return slope
\ No newline at end of file
@@ -0,0 +1,105 @@
+import numpy as np
+
+class MonthlyMatrix:
+    """Série mensal densa (linhas x meses) de um dono, sem buracos
+
+    Meses sem movimento entram como zero, então inclinações e médias usam o
+    eixo de tempo real em vez de só os meses que tiveram dados. Todas as
+    métricas são calculadas para todas as linhas de uma vez.
+    """
+
+    def __init__(self, rows, months, values):
+        self.rows = rows
+        self.months = months
+        self.values = values
+
+    @classmethod
+    def from_totals(cls, totals, months):
+        """Monta a matriz a partir de {(linha, ano, mês): total} para os meses dados"""
+        rows = sorted({row for row, _, _ in totals}, key=lambda row: (row is None, str(row)))
+        row_index = {row: i for i, row in enumerate(rows)}
+        month_index = {month: j for j, month in enumerate(months)}
+
+        values = np.zeros((len(rows), len(months)))
+        for (row, year, month), total in totals.items():
+            j = month_index.get((year, month))
+            if j is not None:
+                values[row_index[row], j] += total
+
+        return cls(rows, months, values)
+
+    def month_keys(self):
+        return [f"{year}-{month:02d}" for year, month in self.months]
+
+    def active_months(self):
+        """Quantidade de meses com movimento em cada linha"""
+        return np.count_nonzero(self.values, axis=1)
+
+    def totals(self):
+        return self.values.sum(axis=1)
+
+    def means(self):
+        if not self.months:
+            return np.zeros(len(self.rows))
+        return self.values.mean(axis=1)
+
+    def slopes(self):
+        """Inclinação da regressão linear (mínimos quadrados) de cada linha por mês"""
+        n = len(self.months)
+        if n < 2:
+            return np.zeros(len(self.rows))
+
+        x = np.arange(n) - (n - 1) / 2
+        return self.values @ x / (x @ x)
+
+    def moving_average(self, window=3):
+        """Média móvel de `window` meses (as primeiras colunas usam os meses disponíveis)"""
+        if not self.months:
+            return self.values.copy()
+
+        cumulative = np.cumsum(self.values, axis=1)
+        shifted = np.zeros_like(cumulative)
+        shifted[:, window:] = cumulative[:, :-window]
+        counts = np.minimum(np.arange(1, len(self.months) + 1), window)
+        return (cumulative - shifted) / counts
+
+    def recent_mean(self, months=3):
+        """Média dos últimos `months` meses de cada linha"""
+        if not self.months:
+            return np.zeros(len(self.rows))
+        return self.values[:, -months:].mean(axis=1)
+
+    def seasonal_baseline(self, month):
+        """Média de cada linha no mesmo mês do calendário ao longo dos anos
+
+        Retorna None quando o mês aparece menos de duas vezes no histórico.
+        """
+        columns = [j for j, (_, calendar_month) in enumerate(self.months) if calendar_month == month]
+        if len(columns) < 2:
+            return None
+        return self.values[:, columns].mean(axis=1)
+
+def month_range(start, end):
+    """Meses (ano, mês) de `start` até `end`, inclusive"""
+    months = []
+    year, month = start
+    while (year, month) <= end:
+        months.append((year, month))
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+    return months
+
+def last_months(now, count):
+    """Os últimos `count` meses até o mês de `now`, do mais antigo ao atual"""
+    year, month = now.year, now.month - (count - 1)
+    while month < 1:
+        year, month = year - 1, month + 12
+    return month_range((year, month), (now.year, now.month))
+
+def next_months(last, count):
+    """Os `count` meses seguintes a `last`"""
+    months = []
+    year, month = last
+    for _ in range(count):
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+        months.append((year, month))
+    return months
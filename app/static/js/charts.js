@@ -0,0 +1,138 @@
+// === FIGURAS DOS GRÁFICOS ===
+// Monta as figuras do Plotly a partir do formato compacto enviado pelo servidor:
+// { type: 'pie' | 'line' | 'bar', title, labels, series: [{ name, values, color, dash }] }
+const ChartFigures = {
+    valueFormat: 'R$ %{y:,.2f}',
+
+    build(chart) {
+        const builder = this.builders[chart.type];
+        if (!builder) {
+            throw new Error(`Tipo de gráfico desconhecido: ${chart.type}`);
+        }
+
+        const figure = builder.call(this, chart);
+        figure.layout = {
+            title: chart.title,
+            height: 400,
+            ...figure.layout
+        };
+        return figure;
+    },
+
+    builders: {
+        pie(chart) {
+            const series = chart.series[0] || { values: [] };
+            return {
+                data: [{
+                    type: 'pie',
+                    labels: chart.labels.map(label => label || 'Sem categoria'),
+                    values: series.values,
+                    hovertemplate: '<b>%{label}</b><br>Valor: R$ %{value:,.2f}<br>Percentual: %{percent}<br><extra></extra>',
+                    textinfo: 'label+percent',
+                    hole: 0.3
+                }],
+                layout: { showlegend: true }
+            };
+        },
+
+        line(chart) {
+            return {
+                data: chart.series.map(series => ({
+                    type: 'scatter',
+                    mode: 'lines+markers',
+                    x: chart.labels,
+                    y: series.values,
+                    name: series.name,
+                    line: { color: series.color, width: series.dash ? 2 : 3, dash: series.dash ? 'dash' : 'solid' },
+                    marker: { size: series.dash ? 6 : 8 },
+                    hovertemplate: `<b>${series.name}</b><br>Mês: %{x}<br>Valor: ${this.valueFormat}<br><extra></extra>`
+                })),
+                layout: {
+                    xaxis: { title: chart.x_title || 'Mês' },
+                    yaxis: { title: 'Valor (R$)' },
+                    hovermode: 'x unified'
+                }
+            };
+        },
+
+        bar(chart) {
+            const figure = {
+                data: chart.series.map(series => ({
+                    type: 'bar',
+                    x: chart.labels,
+                    y: series.values,
+                    name: series.name,
+                    marker: { color: series.color },
+                    hovertemplate: `<b>${series.name}</b><br>%{x}<br>Valor: ${this.valueFormat}<br><extra></extra>`
+                })),
+                layout: {
+                    xaxis: { title: chart.x_title || 'Mês' },
+                    yaxis: { title: 'Valor (R$)' },
+                    barmode: 'group'
+                }
+            };
+
+            // Linha da média (gastos diários)
+            if ('average' in chart) {
+                this.addAverage(figure, chart);
+            }
+            return figure;
+        }
+    },
+
+    addAverage(figure, chart) {
+        const values = chart.series.flatMap(series => series.values);
+        const max = Math.max(0, ...values);
+        figure.layout.yaxis.range = [0, max > 0 ? max * 1.1 : 100];
+
+        if (chart.average === null) {
+            figure.layout.annotations = [{
+                x: chart.labels[Math.floor(chart.labels.length / 2)],
+                y: 50,
+                text: 'Nenhum gasto registrado neste mês',
+                showarrow: false,
+                font: { size: 14, color: 'gray' },
+                bgcolor: 'rgba(255,255,255,0.8)',
+                bordercolor: 'gray',
+                borderwidth: 1
+            }];
+            return;
+        }
+
+        figure.layout.shapes = [{
+            type: 'line',
+            xref: 'paper',
+            x0: 0,
+            x1: 1,
+            y0: chart.average,
+            y1: chart.average,
+            line: { color: 'red', dash: 'dash' }
+        }];
+        figure.layout.annotations = [{
+            xref: 'paper',
+            x: 1,
+            y: chart.average,
+            xanchor: 'right',
+            yanchor: 'bottom',
+            text: `Média: R$ ${chart.average.toLocaleString('pt-BR', { minimumFractionDigits: 2 })}`,
+            showarrow: false
+        }];
+    },
+
+    // Renderiza o gráfico compacto no elemento (via Charts, de main.js)
+    render(elementId, chart, layout = {}) {
+        const figure = this.build(chart);
+        Charts.render(elementId, figure.data, { ...figure.layout, ...layout });
+    },
+
+    // Busca o gráfico na API (/dashboard/api/charts/<tipo>) e renderiza
+    async load(elementId, chartType, accountType = 'individual', layout = {}) {
+        const chart = await API.get(`/dashboard/api/charts/${chartType}?account=${accountType}`);
+        if (chart && chart.series) {
+            this.render(elementId, chart, layout);
+        }
+        return chart;
+    }
+};
+
+window.ChartFigures = ChartFigures;
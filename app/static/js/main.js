@@ -344,101 +344,6 @@ const Dashboard = {
                 }
             }
         }
-    },
-
-    // Carregar gráficos
-    async loadCharts(accountType = 'individual') {
-        const chartTypes = ['expenses_by_category', 'monthly_evolution', 'income_vs_expenses'];
-        
-        for (const chartType of chartTypes) {
-            try {
-                const data = await API.get(`${CONFIG.apiEndpoints.dashboard}/charts/${chartType}?account=${accountType}`);
-                this.renderChart(chartType, data);
-            } catch (error) {
-                console.error(`Erro ao carregar gráfico ${chartType}:`, error);
-            }
-        }
-    },
-
-    // Renderizar gráfico específico
-    renderChart(chartType, data) {
-        const elementId = `chart-${chartType.replace(/_/g, '-')}`;
-        
-        switch (chartType) {
-            case 'expenses_by_category':
-                this.renderPieChart(elementId, data);
-                break;
-            case 'monthly_evolution':
-                this.renderLineChart(elementId, data);
-                break;
-            case 'income_vs_expenses':
-                this.renderBarChart(elementId, data);
-                break;
-        }
-    },
-
-    // Gráfico de pizza
-    renderPieChart(elementId, data) {
-        const chartData = [{
-            type: 'pie',
-            labels: data.labels,
-            values: data.values,
-            hovertemplate: '<b>%{label}</b><br>Valor: R$ %{value:,.2f}<br>Percentual: %{percent}<extra></extra>',
-            textinfo: 'label+percent',
-            textposition: 'outside'
-        }];
-
-        Charts.render(elementId, chartData, {
-            title: 'Gastos por Categoria'
-        });
-    },
-
-    // Gráfico de linha
-    renderLineChart(elementId, data) {
-        const chartData = [
-            {
-                x: data.labels,
-                y: data.income,
-                type: 'scatter',
-                mode: 'lines+markers',
-                name: 'Receitas',
-                line: { color: '#28a745', width: 3 },
-                marker: { size: 8 }
-            },
-            {
-                x: data.labels,
-                y: data.expenses,
-                type: 'scatter',
-                mode: 'lines+markers',
-                name: 'Despesas',
-                line: { color: '#dc3545', width: 3 },
-                marker: { size: 8 }
-            }
-        ];
-
-        Charts.render(elementId, chartData, {
-            title: 'Evolução Mensal',
-            xaxis: { title: 'Mês' },
-            yaxis: { title: 'Valor (R$)' }
-        });
-    },
-
-    // Gráfico de barras
-    renderBarChart(elementId, data) {
-        const chartData = [{
-            x: data.labels,
-            y: data.values,
-            type: 'bar',
-            marker: {
-                color: data.labels.map(label => 
-                    label.toLowerCase().includes('receita') ? '#28a745' : '#dc3545'
-                )
-            }
-        }];
-
-        Charts.render(elementId, chartData, {
-            title: 'Receitas vs Despesas'
-        });
     }
 };
 
@@ -612,8 +517,8 @@ document.addEventListener('DOMContentLoaded', function() {
     
     switch (currentPage) {
         case 'dashboard':
+            // Os gráficos já vêm renderizados pelo servidor (ChartFigures.render no template)
             Dashboard.loadData();
-            Dashboard.loadCharts();
             Transactions.loadRecent();
             break;
         case 'transactions':
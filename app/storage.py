@@ -0,0 +1,242 @@
+from datetime import datetime, timedelta
+from bson.objectid import ObjectId
+from flask import current_app, has_app_context
+from app import get_db
+from app.models import MonthlyRollup
+from app.queries import Query
+
+def month_bounds(year, month):
+    """Primeiro e último instante do mês (intervalo inclusivo, como nas consultas $lte)"""
+    start = datetime(year, month, 1)
+    end = datetime(year + 1, 1, 1) if month == 12 else datetime(year, month + 1, 1)
+    return start, end - timedelta(milliseconds=1)
+
+def flatten_groups(result):
+    """Converte os grupos {_id: {year, month, type[, category]}, total, count} em linhas planas"""
+    return [{**item['_id'], 'total': item['total'], 'count': item['count']} for item in result]
+
+def project_document(document, projection):
+    """Aplica uma projeção de inclusão ({campo: 1}, com '_id': 0 opcional) a um documento já lido"""
+    if not projection:
+        return document
+    fields = {field for field, include in projection.items() if include}
+    if projection.get('_id', 1):
+        fields.add('_id')
+    return {field: value for field, value in document.items() if field in fields}
+
+class FlatTransactionStore:
+    """Leituras sobre a coleção transactions (um documento por transação)"""
+
+    def owner_filter(self, owner_id, owner_type):
+        return {'owner_id': ObjectId(owner_id), 'owner_type': owner_type}
+
+    def date_filter(self, start_date, end_date=None):
+        date_query = {'$gte': start_date}
+        if end_date is not None:
+            date_query['$lte'] = end_date
+        return date_query
+
+    def monthly_totals_query(self, owner_id, owner_type, start, end, trans_type=None,
+                             categories=None, by_category=False):
+        """Totais por (ano, mês, tipo[, categoria]) dos meses de `start` a `end`, inclusive"""
+        match = {
+            **self.owner_filter(owner_id, owner_type),
+            'date': self.date_filter(month_bounds(*start)[0], month_bounds(*end)[1])
+        }
+        if trans_type:
+            match['type'] = trans_type
+        if categories is not None:
+            match['category'] = {'$in': list(categories)}
+
+        group_id = {'year': {'$year': '$date'}, 'month': {'$month': '$date'}, 'type': '$type'}
+        if by_category:
+            group_id['category'] = '$category'
+
+        pipeline = [
+            {'$match': match},
+            {'$group': {'_id': group_id, 'total': {'$sum': '$amount'}, 'count': {'$sum': 1}}}
+        ]
+        return Query('transactions', pipeline, flatten_groups)
+
+    def period_totals(self, owner_id, owner_type, start_date, end_date=None, trans_type=None):
+        """Totais por (tipo, categoria) de um intervalo de datas qualquer"""
+        match = {
+            **self.owner_filter(owner_id, owner_type),
+            'date': self.date_filter(start_date, end_date)
+        }
+        if trans_type:
+            match['type'] = trans_type
+
+        pipeline = [
+            {'$match': match},
+            {
+                '$group': {
+                    '_id': {'type': '$type', 'category': '$category'},
+                    'total': {'$sum': '$amount'},
+                    'count': {'$sum': 1}
+                }
+            }
+        ]
+        return flatten_groups(get_db().transactions.aggregate(pipeline))
+
+    def find_transactions(self, owner_id, owner_type, start_date, end_date, categories=None,
+                          projection=None):
+        """Transações do intervalo, da mais recente para a mais antiga (cursor em lotes)
+
+        `projection` é uma projeção de inclusão do MongoDB (ex.: as colunas da exportação).
+        """
+        query = {
+            **self.owner_filter(owner_id, owner_type),
+            'date': self.date_filter(start_date, end_date)
+        }
+        if categories:
+            query['category'] = {'$in': categories}
+
+        return get_db().transactions.find(query, projection).sort([('date', -1), ('_id', -1)]).batch_size(
+            current_app.config.get('EXPORT_BATCH_SIZE', 1000)
+        )
+
+    def author_ids(self, owner_id, owner_type, start_date, end_date):
+        return get_db().transactions.distinct('added_by', {
+            **self.owner_filter(owner_id, owner_type),
+            'date': self.date_filter(start_date, end_date)
+        })
+
+class BucketedTransactionStore(FlatTransactionStore):
+    """Leituras sobre transaction_buckets (um documento por dono e mês)
+
+    Meses inteiros saem dos totais já somados do bucket; só os meses das pontas
+    de um intervalo de datas percorrem as entradas.
+    """
+
+    def bucket_filter(self, owner_id, owner_type, start_date, end_date=None):
+        period = {'$gte': MonthlyRollup.period_key(start_date.year, start_date.month)}
+        if end_date is not None:
+            period['$lte'] = MonthlyRollup.period_key(end_date.year, end_date.month)
+        return {**self.owner_filter(owner_id, owner_type), 'period': period}
+
+    def monthly_totals_query(self, owner_id, owner_type, start, end, trans_type=None,
+                             categories=None, by_category=False):
+        pipeline = [
+            {
+                '$match': {
+                    **self.owner_filter(owner_id, owner_type),
+                    'period': {
+                        '$gte': MonthlyRollup.period_key(*start),
+                        '$lte': MonthlyRollup.period_key(*end)
+                    }
+                }
+            },
+            {'$project': {'year': 1, 'month': 1, 'totals': 1}},
+            {'$unwind': '$totals'}
+        ]
+
+        totals_match = {}
+        if trans_type:
+            totals_match['totals.type'] = trans_type
+        if categories is not None:
+            totals_match['totals.category'] = {'$in': list(categories)}
+        if totals_match:
+            pipeline.append({'$match': totals_match})
+
+        group_id = {'year': '$year', 'month': '$month', 'type': '$totals.type'}
+        if by_category:
+            group_id['category'] = '$totals.category'
+
+        pipeline.append({
+            '$group': {
+                '_id': group_id,
+                'total': {'$sum': '$totals.total'},
+                'count': {'$sum': '$totals.count'}
+            }
+        })
+        return Query('transaction_buckets', pipeline, flatten_groups)
+
+    def period_totals(self, owner_id, owner_type, start_date, end_date=None, trans_type=None):
+        """Meses inteiros do intervalo leem só `totals`; só os meses das pontas
+        (quando parciais) trazem as entradas, e apenas os campos somados"""
+        totals = {}
+
+        def add(key, total, count):
+            current_total, current_count = totals.get(key, (0.0, 0))
+            totals[key] = (current_total + total, current_count + count)
+
+        partial = []
+        if start_date != month_bounds(start_date.year, start_date.month)[0]:
+            partial.append(MonthlyRollup.period_key(start_date.year, start_date.month))
+        if end_date is not None and end_date != month_bounds(end_date.year, end_date.month)[1]:
+            partial.append(MonthlyRollup.period_key(end_date.year, end_date.month))
+
+        db = get_db()
+        query = self.bucket_filter(owner_id, owner_type, start_date, end_date)
+        if partial:
+            query['period']['$nin'] = partial
+
+        for bucket in db.transaction_buckets.find(query, {'totals': 1}):
+            for item in bucket['totals']:
+                if not trans_type or item['type'] == trans_type:
+                    add((item['type'], item['category']), item['total'], item['count'])
+
+        if partial:
+            buckets = db.transaction_buckets.find(
+                {**self.owner_filter(owner_id, owner_type), 'period': {'$in': partial}},
+                {'entries.date': 1, 'entries.type': 1, 'entries.category': 1, 'entries.amount': 1}
+            )
+            for bucket in buckets:
+                for entry in bucket['entries']:
+                    if entry['date'] < start_date or (end_date is not None and entry['date'] > end_date):
+                        continue
+                    if not trans_type or entry['type'] == trans_type:
+                        add((entry['type'], entry['category']), float(entry['amount']), 1)
+
+        return [
+            {'type': key[0], 'category': key[1], 'total': total, 'count': count}
+            for key, (total, count) in totals.items()
+        ]
+
+    def find_transactions(self, owner_id, owner_type, start_date, end_date, categories=None,
+                          projection=None):
+        # Com projeção, o bucket traz só os campos pedidos das entradas (e os do filtro)
+        bucket_projection = None
+        if projection:
+            bucket_projection = {'owner_id': 1, 'owner_type': 1, 'entries.date': 1, 'entries.category': 1}
+            bucket_projection.update(
+                (f'entries.{field}', 1) for field, include in projection.items()
+                if include and field not in ('owner_id', 'owner_type')
+            )
+
+        buckets = get_db().transaction_buckets.find(
+            self.bucket_filter(owner_id, owner_type, start_date, end_date), bucket_projection
+        ).sort('period', -1).batch_size(1)
+
+        for bucket in buckets:
+            for entry in reversed(bucket['entries']):
+                if entry['date'] < start_date or entry['date'] > end_date:
+                    continue
+                if categories and entry['category'] not in categories:
+                    continue
+                yield project_document(
+                    {**entry, 'owner_id': bucket['owner_id'], 'owner_type': bucket['owner_type']},
+                    projection
+                )
+
+    def author_ids(self, owner_id, owner_type, start_date, end_date):
+        # Inclui autores das pontas fora do intervalo: só pré-carrega nomes a mais
+        return get_db().transaction_buckets.distinct(
+            'entries.added_by', self.bucket_filter(owner_id, owner_type, start_date, end_date)
+        )
+
+TRANSACTION_STORES = {
+    'flat': FlatTransactionStore(),
+    'bucketed': BucketedTransactionStore()
+}
+
+def get_transaction_store():
+    """Layout de leitura configurado em TRANSACTION_STORAGE
+
+    Fora de um app Flask (API ASGI) lê o layout plano, que é sempre completo.
+    """
+    if not has_app_context():
+        return TRANSACTION_STORES['flat']
+    return TRANSACTION_STORES.get(current_app.config.get('TRANSACTION_STORAGE', 'flat'),
+                                  TRANSACTION_STORES['flat'])
@@ -0,0 +1,228 @@
+from datetime import datetime
+from bson.objectid import ObjectId
+from bson.errors import InvalidId
+from app import get_db
+from app.models import Transaction
+from app.permissions import has_family_permission
+from app.dashboard.cache import bump_owner_version
+from app.notifications.engine import schedule_owner_evaluation
+
+def parse_transaction_changes(data):
+    """Valida os campos editáveis de uma transação e retorna o $set correspondente
+
+    Campos com tipo errado (ex.: categoria numérica, tags em objeto) geram
+    ValueError, como os valores inválidos.
+    """
+    if not isinstance(data, dict):
+        raise ValueError('Alterações inválidas')
+
+    update_data = {}
+
+    if 'amount' in data:
+        if isinstance(data['amount'], bool) or not isinstance(data['amount'], (int, float, str)):
+            raise ValueError('Valor inválido')
+        amount = float(data['amount'])
+        if amount <= 0:
+            raise ValueError('Valor deve ser maior que zero')
+        update_data['amount'] = amount
+
+    if 'type' in data:
+        if data['type'] not in ['income', 'expense']:
+            raise ValueError('Tipo de transação inválido')
+        update_data['type'] = data['type']
+
+    if 'category' in data:
+        category = require_string(data, 'category', 'Categoria').strip()
+        if not category:
+            raise ValueError('Categoria é obrigatória')
+        update_data['category'] = category
+
+    if 'description' in data:
+        update_data['description'] = require_string(data, 'description', 'Descrição').strip()
+
+    if 'payment_method' in data:
+        update_data['payment_method'] = require_string(data, 'payment_method', 'Forma de pagamento')
+
+    if 'tags' in data:
+        tags = data['tags'] or []
+        if isinstance(tags, str):
+            tags = tags.split(',')
+        elif not isinstance(tags, list) or not all(isinstance(tag, str) for tag in tags):
+            raise ValueError('Tags devem ser texto separado por vírgulas ou lista de textos')
+        update_data['tags'] = tags
+
+    if 'date' in data and data['date']:
+        update_data['date'] = datetime.strptime(require_string(data, 'date', 'Data'), '%Y-%m-%d')
+
+    return update_data
+
+def require_string(data, field, label):
+    if not isinstance(data[field], str):
+        raise ValueError(f'{label} deve ser texto')
+    return data[field]
+
+class BulkTransactionOperation:
+    """Edição/exclusão em massa de transações selecionadas por ids ou por filtro
+
+    A seleção é lida com uma única consulta, a permissão é verificada uma vez
+    por dono e a escrita é um único update_many/delete_many. Os totais
+    derivados são atualizados em uma passada e a versão dos gráficos de cada
+    dono afetado é incrementada uma vez. Ids repetidos contam uma vez e
+    `processed` é o número de documentos que a escrita de fato alterou.
+    `results` traz o status de cada id.
+    """
+
+    def __init__(self, user_context, permission, max_transactions=5000):
+        self.user_context = user_context
+        self.permission = permission
+        self.max_transactions = max_transactions
+        self.results = {}
+        self.transactions = []
+
+    def select(self, data):
+        """Carrega as transações pedidas em `ids` ou que casam com `filter`"""
+        db = get_db()
+
+        if data.get('ids'):
+            if not isinstance(data['ids'], list):
+                raise ValueError('ids deve ser uma lista')
+
+            # Ids repetidos contam uma vez (senão os totais seriam descontados em dobro)
+            ids = []
+            seen = set()
+            for transaction_id in data['ids']:
+                try:
+                    object_id = ObjectId(transaction_id)
+                except (InvalidId, TypeError):
+                    self.results[str(transaction_id)] = 'invalid_id'
+                    continue
+                if object_id not in seen:
+                    seen.add(object_id)
+                    ids.append(object_id)
+
+            if len(ids) > self.max_transactions:
+                raise ValueError(f'Máximo de {self.max_transactions} transações por operação')
+
+            found = {transaction['_id']: transaction
+                     for transaction in db.transactions.find({'_id': {'$in': ids}})}
+            for transaction_id in ids:
+                if transaction_id in found:
+                    self.transactions.append(found[transaction_id])
+                else:
+                    self.results[str(transaction_id)] = 'not_found'
+
+        elif data.get('filter'):
+            if not isinstance(data['filter'], dict):
+                raise ValueError('filter deve ser um objeto')
+            query = self.build_filter_query(data['filter'])
+            self.transactions = list(db.transactions.find(query).limit(self.max_transactions + 1))
+            if len(self.transactions) > self.max_transactions:
+                raise ValueError(f'Filtro seleciona mais de {self.max_transactions} transações')
+
+        else:
+            raise ValueError('Informe ids ou filter')
+
+        self.authorize()
+        return self
+
+    def build_filter_query(self, filters):
+        """Filtro no mesmo formato da listagem (account, category, type, date_from, date_to)"""
+        owner_id, owner_type = self.user_context.resolve_owner(filters.get('account', 'individual'))
+        query = {'owner_id': ObjectId(owner_id), 'owner_type': owner_type}
+
+        # Só valores simples: um objeto ({"$ne": null}) viraria operador e selecionaria tudo
+        if filters.get('category'):
+            query['category'] = require_string(filters, 'category', 'Categoria')
+        if filters.get('type'):
+            if filters['type'] not in ['income', 'expense']:
+                raise ValueError('Tipo de transação inválido')
+            query['type'] = filters['type']
+
+        if filters.get('date_from') or filters.get('date_to'):
+            date_query = {}
+            if filters.get('date_from'):
+                date_from = require_string(filters, 'date_from', 'Data inicial')
+                date_query['$gte'] = datetime.strptime(date_from, '%Y-%m-%d')
+            if filters.get('date_to'):
+                date_to = require_string(filters, 'date_to', 'Data final')
+                date_query['$lte'] = datetime.strptime(date_to, '%Y-%m-%d')
+            query['date'] = date_query
+
+        return query
+
+    def authorize(self):
+        """Mantém só as transações do usuário ou de famílias em que ele tem a permissão"""
+        user_id = self.user_context.user_id
+        allowed_owners = {}
+        allowed = []
+
+        for transaction in self.transactions:
+            if str(transaction['added_by']) == user_id:
+                allowed.append(transaction)
+                continue
+
+            owner = (str(transaction['owner_id']), transaction['owner_type'])
+            if owner not in allowed_owners:
+                allowed_owners[owner] = (
+                    owner[1] == 'family' and has_family_permission(owner[0], self.permission)
+                )
+
+            if allowed_owners[owner]:
+                allowed.append(transaction)
+            else:
+                self.results[str(transaction['_id'])] = 'forbidden'
+
+        self.transactions = allowed
+
+    def update(self, update_data):
+        """Aplica o mesmo $set às transações selecionadas que ainda não têm esses valores"""
+        if not update_data:
+            raise ValueError('Nenhuma alteração informada')
+
+        changed = []
+        for transaction in self.transactions:
+            if any(transaction.get(field) != value for field, value in update_data.items()):
+                changed.append(transaction)
+            else:
+                self.results[str(transaction['_id'])] = 'unchanged'
+        self.transactions = changed
+
+        processed = 0
+        if self.transactions:
+            result = get_db().transactions.update_many(
+                {'_id': {'$in': self.ids()}},
+                {'$set': update_data}
+            )
+            processed = result.modified_count
+            Transaction.update_aggregates(
+                added=[{**transaction, **update_data} for transaction in self.transactions],
+                removed=self.transactions
+            )
+        return self.finish('updated', processed)
+
+    def delete(self):
+        processed = 0
+        if self.transactions:
+            result = get_db().transactions.delete_many({'_id': {'$in': self.ids()}})
+            processed = result.deleted_count
+            Transaction.update_aggregates(removed=self.transactions)
+        return self.finish('deleted', processed)
+
+    def ids(self):
+        return [transaction['_id'] for transaction in self.transactions]
+
+    def finish(self, status, processed):
+        owners = set()
+        for transaction in self.transactions:
+            self.results[str(transaction['_id'])] = status
+            owners.add((transaction['owner_id'], transaction['owner_type']))
+
+        for owner_id, owner_type in owners:
+            bump_owner_version(owner_id, owner_type)
+            schedule_owner_evaluation(owner_id, owner_type, self.user_context.user_id)
+
+        return {
+            'success': True,
+            'processed': processed,
+            'results': self.results
+        }
@@ -0,0 +1,123 @@
+import codecs
+import csv
+from datetime import datetime
+from pymongo.errors import BulkWriteError
+from app import get_db
+from app.models import Transaction
+
+# Formatos de data aceitos, na ordem de tentativa
+DATE_FORMATS = ['%d/%m/%Y', '%Y-%m-%d', '%d-%m-%Y']
+
+class TransactionImporter:
+    """Importa transações de um CSV em streaming, inserindo em lotes"""
+
+    def __init__(self, owner_type, owner_id, added_by, batch_size=1000):
+        self.owner_type = owner_type
+        self.owner_id = owner_id
+        self.added_by = added_by
+        self.batch_size = max(1, int(batch_size))
+        self.date_format = None  # Formato detectado, reaproveitado nas linhas seguintes
+        self.imported_count = 0
+        self.errors = []
+
+    def import_stream(self, binary_stream, encoding='utf-8-sig'):
+        """Lê o arquivo linha a linha e insere em lotes. Retorna (importadas, erros)"""
+        reader = csv.DictReader(codecs.iterdecode(binary_stream, encoding))
+
+        batch = []
+        for row_num, row in enumerate(reader, start=2):
+            try:
+                batch.append((row_num, self.parse_row(row)))
+            except Exception as e:
+                self.errors.append(f"Linha {row_num}: {str(e)}")
+                continue
+
+            if len(batch) >= self.batch_size:
+                self.flush(batch)
+                batch = []
+
+        if batch:
+            self.flush(batch)
+
+        return self.imported_count, self.errors
+
+    def parse_row(self, row):
+        """Converte uma linha do CSV em documento de transação"""
+        # DictReader preenche com None as colunas que faltam em linhas curtas
+        if any(value is None for value in row.values()):
+            raise ValueError('Linha com colunas faltando')
+
+        # Mapear campos do CSV
+        amount = float(row.get('valor', row.get('amount', 0)))
+        if amount <= 0:
+            raise ValueError('Valor inválido')
+
+        transaction_type = (row.get('tipo', row.get('type', '')) or '').lower()
+        if transaction_type not in ['receita', 'despesa', 'income', 'expense']:
+            raise ValueError("Tipo inválido (use 'receita' ou 'despesa')")
+
+        # Normalizar tipo
+        if transaction_type in ['receita', 'income']:
+            transaction_type = 'income'
+        else:
+            transaction_type = 'expense'
+
+        category = (row.get('categoria', row.get('category', '')) or '').strip()
+        if not category:
+            category = 'Importado'
+
+        description = (row.get('descricao', row.get('description', '')) or '').strip()
+
+        transaction = Transaction(
+            owner_type=self.owner_type,
+            owner_id=self.owner_id,
+            added_by=self.added_by,
+            trans_type=transaction_type,
+            amount=amount,
+            category=category,
+            description=description
+        )
+        transaction.date = self.parse_date(row.get('data', row.get('date', '')))
+
+        return transaction.to_document()
+
+    def parse_date(self, date_str):
+        """Converte a data usando o formato já detectado no arquivo, se houver"""
+        if not date_str:
+            return datetime.now()
+
+        date_str = date_str.strip()
+        if self.date_format:
+            try:
+                return datetime.strptime(date_str, self.date_format)
+            except ValueError:
+                pass
+
+        for date_format in DATE_FORMATS:
+            try:
+                parsed = datetime.strptime(date_str, date_format)
+                self.date_format = date_format
+                return parsed
+            except ValueError:
+                continue
+
+        return datetime.now()
+
+    def flush(self, batch):
+        """Insere um lote (insert_many não ordenado) e atualiza os totais mensais"""
+        db = get_db()
+        documents = [document for _, document in batch]
+        failed = set()
+
+        try:
+            db.transactions.insert_many(documents, ordered=False)
+        except BulkWriteError as e:
+            for error in e.details.get('writeErrors', []):
+                failed.add(error['index'])
+                row_num = batch[error['index']][0]
+                self.errors.append(f"Linha {row_num}: {error.get('errmsg', 'Erro ao inserir')}")
+
+        inserted = [document for index, document in enumerate(documents) if index not in failed]
+        if inserted:
+            Transaction.update_aggregates(added=inserted)
+        self.imported_count += len(inserted)
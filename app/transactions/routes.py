@@ -1,10 +1,15 @@
-from flask import Blueprint, request, jsonify, session, render_template, redirect, url_for, flash
+from flask import Blueprint, request, jsonify, session, render_template, redirect, url_for, flash, current_app, Response, stream_with_context
 from app.auth.routes import login_required
-from app.models import User, Transaction
+from app.models import User, Transaction, OwnerCategory
+from app.context import load_user_context
+from app.permissions import has_family_permission
+from app.transactions.importer import TransactionImporter
+from app.transactions.bulk import BulkTransactionOperation, parse_transaction_changes
+from app.utils import iter_csv
+from app.dashboard.cache import bump_owner_version
+from app.notifications.engine import schedule_owner_evaluation
 from bson.objectid import ObjectId
 from datetime import datetime
-import csv
-import io
 
 transactions = Blueprint('transactions', __name__)
 
@@ -64,6 +69,8 @@ def add_transaction():
                 transaction.date = datetime.strptime(data.get('date'), '%Y-%m-%d')
             
             transaction_id = transaction.save()
+            bump_owner_version(owner_id, owner_type)
+            schedule_owner_evaluation(owner_id, owner_type, user_id)
             
             if request.is_json:
                 return jsonify({
@@ -86,9 +93,9 @@ def add_transaction():
                 return jsonify({'success': False, 'error': error_msg}), 500
             flash(error_msg, 'error')
     
-    # GET request - mostrar formulário
+    # GET request - mostrar formulário (categorias mais usadas primeiro)
     user = User.find_by_id(session['user_id'])
-    categories = get_common_categories()
+    categories = suggest_categories(session['user_id'], 'individual', limit=50)
     
     return render_template('transactions/add.html', user=user, categories=categories)
 
@@ -110,7 +117,7 @@ def edit_transaction(transaction_id):
         if str(transaction['added_by']) != user_id:
             # Verificar se é admin da família
             if transaction['owner_type'] == 'family':
-                if not check_family_permission(user_id, transaction['owner_id'], 'edit_transactions'):
+                if not has_family_permission(transaction['owner_id'], 'edit_transactions'):
                     flash('Sem permissão para editar esta transação', 'error')
                     return redirect(url_for('dashboard.transactions'))
             else:
@@ -121,36 +128,7 @@ def edit_transaction(transaction_id):
             data = request.get_json() if request.is_json else request.form
             
             # Validar e atualizar dados
-            update_data = {}
-            
-            if 'amount' in data:
-                amount = float(data['amount'])
-                if amount <= 0:
-                    raise ValueError('Valor deve ser maior que zero')
-                update_data['amount'] = amount
-            
-            if 'type' in data:
-                if data['type'] not in ['income', 'expense']:
-                    raise ValueError('Tipo de transação inválido')
-                update_data['type'] = data['type']
-            
-            if 'category' in data:
-                category = data['category'].strip()
-                if not category:
-                    raise ValueError('Categoria é obrigatória')
-                update_data['category'] = category
-            
-            if 'description' in data:
-                update_data['description'] = data['description'].strip()
-            
-            if 'payment_method' in data:
-                update_data['payment_method'] = data['payment_method']
-            
-            if 'tags' in data:
-                update_data['tags'] = data['tags'].split(',') if data['tags'] else []
-            
-            if 'date' in data and data['date']:
-                update_data['date'] = datetime.strptime(data['date'], '%Y-%m-%d')
+            update_data = parse_transaction_changes(data)
             
             # Atualizar no banco
             db.transactions.update_one(
@@ -158,6 +136,14 @@ def edit_transaction(transaction_id):
                 {'$set': update_data}
             )
             
+            # Atualizar totais mensais (remove valores antigos e aplica os novos)
+            Transaction.update_aggregates(
+                added=[{**transaction, **update_data}],
+                removed=[transaction]
+            )
+            bump_owner_version(transaction['owner_id'], transaction['owner_type'])
+            schedule_owner_evaluation(transaction['owner_id'], transaction['owner_type'], user_id)
+            
             if request.is_json:
                 return jsonify({'success': True, 'message': 'Transação atualizada com sucesso!'})
             
@@ -200,19 +186,82 @@ def delete_transaction(transaction_id):
         user_id = session['user_id']
         if str(transaction['added_by']) != user_id:
             if transaction['owner_type'] == 'family':
-                if not check_family_permission(user_id, transaction['owner_id'], 'delete_transactions'):
+                if not has_family_permission(transaction['owner_id'], 'delete_transactions'):
                     return jsonify({'success': False, 'error': 'Sem permissão'}), 403
             else:
                 return jsonify({'success': False, 'error': 'Sem permissão'}), 403
         
         # Deletar
-        db.transactions.delete_one({'_id': ObjectId(transaction_id)})
+        result = db.transactions.delete_one({'_id': ObjectId(transaction_id)})
+        if result.deleted_count:
+            Transaction.update_aggregates(removed=[transaction])
+            bump_owner_version(transaction['owner_id'], transaction['owner_type'])
+            schedule_owner_evaluation(transaction['owner_id'], transaction['owner_type'], user_id)
         
         return jsonify({'success': True, 'message': 'Transação excluída com sucesso!'})
         
     except Exception as e:
         return jsonify({'success': False, 'error': 'Erro ao excluir transação'}), 500
 
+@transactions.route('/api/bulk/update', methods=['POST'])
+@login_required
+def bulk_update_transactions():
+    """Edita em massa: {ids: [...]} ou {filter: {...}} + {changes: {...}}"""
+    try:
+        data = request.get_json() or {}
+        update_data = parse_transaction_changes(data.get('changes') or {})
+        
+        operation = BulkTransactionOperation(
+            load_user_context(), 'edit_transactions',
+            current_app.config.get('BULK_MAX_TRANSACTIONS', 5000)
+        )
+        return jsonify(operation.select(data).update(update_data))
+        
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    except Exception as e:
+        print(f"Erro na edição em massa: {e}")
+        return jsonify({'success': False, 'error': 'Erro ao atualizar transações'}), 500
+
+@transactions.route('/api/bulk/recategorize', methods=['POST'])
+@login_required
+def bulk_recategorize_transactions():
+    """Move as transações selecionadas para {category}"""
+    try:
+        data = request.get_json() or {}
+        update_data = parse_transaction_changes({'category': data.get('category') or ''})
+        
+        operation = BulkTransactionOperation(
+            load_user_context(), 'edit_transactions',
+            current_app.config.get('BULK_MAX_TRANSACTIONS', 5000)
+        )
+        return jsonify(operation.select(data).update(update_data))
+        
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    except Exception as e:
+        print(f"Erro na recategorização: {e}")
+        return jsonify({'success': False, 'error': 'Erro ao recategorizar transações'}), 500
+
+@transactions.route('/api/bulk/delete', methods=['POST'])
+@login_required
+def bulk_delete_transactions():
+    """Exclui em massa: {ids: [...]} ou {filter: {...}}"""
+    try:
+        data = request.get_json() or {}
+        
+        operation = BulkTransactionOperation(
+            load_user_context(), 'delete_transactions',
+            current_app.config.get('BULK_MAX_TRANSACTIONS', 5000)
+        )
+        return jsonify(operation.select(data).delete())
+        
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    except Exception as e:
+        print(f"Erro na exclusão em massa: {e}")
+        return jsonify({'success': False, 'error': 'Erro ao excluir transações'}), 500
+
 @transactions.route('/import', methods=['GET', 'POST'])
 @login_required
 def import_transactions():
@@ -244,70 +293,20 @@ def import_transactions():
                 owner_type = 'individual'
                 owner_id = user_id
             
-            # Processar CSV
-            stream = io.StringIO(file.stream.read().decode("UTF8"), newline=None)
-            csv_input = csv.DictReader(stream)
-            
-            imported_count = 0
-            errors = []
-            
-            for row_num, row in enumerate(csv_input, start=2):
-                try:
-                    # Mapear campos do CSV
-                    amount = float(row.get('valor', row.get('amount', 0)))
-                    if amount <= 0:
-                        errors.append(f"Linha {row_num}: Valor inválido")
-                        continue
-                    
-                    transaction_type = row.get('tipo', row.get('type', '')).lower()
-                    if transaction_type not in ['receita', 'despesa', 'income', 'expense']:
-                        errors.append(f"Linha {row_num}: Tipo inválido (use 'receita' ou 'despesa')")
-                        continue
-                    
-                    # Normalizar tipo
-                    if transaction_type in ['receita', 'income']:
-                        transaction_type = 'income'
-                    else:
-                        transaction_type = 'expense'
-                    
-                    category = row.get('categoria', row.get('category', '')).strip()
-                    if not category:
-                        category = 'Importado'
-                    
-                    description = row.get('descricao', row.get('description', '')).strip()
-                    
-                    # Data
-                    date_str = row.get('data', row.get('date', ''))
-                    transaction_date = datetime.now()
-                    if date_str:
-                        try:
-                            # Tentar vários formatos de data
-                            for date_format in ['%d/%m/%Y', '%Y-%m-%d', '%d-%m-%Y']:
-                                try:
-                                    transaction_date = datetime.strptime(date_str, date_format)
-                                    break
-                                except ValueError:
-                                    continue
-                        except:
-                            pass
-                    
-                    # Criar transação
-                    transaction = Transaction(
-                        owner_type=owner_type,
-                        owner_id=owner_id,
-                        added_by=user_id,
-                        trans_type=transaction_type,
-                        amount=amount,
-                        category=category,
-                        description=description
-                    )
-                    transaction.date = transaction_date
-                    transaction.save()
-                    
-                    imported_count += 1
-                    
-                except Exception as e:
-                    errors.append(f"Linha {row_num}: {str(e)}")
+            # Processar CSV em streaming, com inserções em lote
+            importer = TransactionImporter(
+                owner_type=owner_type,
+                owner_id=owner_id,
+                added_by=user_id,
+                batch_size=current_app.config.get('IMPORT_BATCH_SIZE', 1000)
+            )
+            try:
+                imported_count, errors = importer.import_stream(file.stream)
+            finally:
+                # Lotes já gravados invalidam o cache mesmo se a importação parar no meio
+                if importer.imported_count:
+                    bump_owner_version(owner_id, owner_type)
+                    schedule_owner_evaluation(owner_id, owner_type, user_id)
             
             # Resultado da importação
             if imported_count > 0:
@@ -331,13 +330,8 @@ def import_transactions():
 @transactions.route('/export')
 @login_required
 def export_transactions():
-    from flask import make_response
-    import csv
-    import io
-    
     try:
-        user_id = session['user_id']
-        user = User.find_by_id(user_id)
+        user_context = load_user_context()
         
         # Parâmetros de filtro
         account_type = request.args.get('account', 'individual')
@@ -345,12 +339,7 @@ def export_transactions():
         date_to = request.args.get('date_to')
         
         # Determinar conta
-        if account_type == 'family' and user.default_family:
-            owner_type = 'family'
-            owner_id = user.default_family
-        else:
-            owner_type = 'individual'
-            owner_id = user_id
+        owner_id, owner_type = user_context.resolve_owner(account_type)
         
         # Buscar transações
         from app import get_db
@@ -366,29 +355,27 @@ def export_transactions():
                 '$lte': datetime.strptime(date_to, '%Y-%m-%d')
             }
         
-        transactions = db.transactions.find(query).sort('date', -1)
-        
-        # Criar CSV
-        output = io.StringIO()
-        writer = csv.writer(output)
+        # Cursor com projeção restrita às colunas exportadas e lotes ajustados
+        transactions = db.transactions.find(
+            query,
+            {'_id': 0, 'date': 1, 'type': 1, 'category': 1, 'description': 1,
+             'amount': 1, 'payment_method': 1}
+        ).sort('date', -1).batch_size(current_app.config.get('EXPORT_BATCH_SIZE', 1000))
         
-        # Cabeçalho
-        writer.writerow(['Data', 'Tipo', 'Categoria', 'Descrição', 'Valor', 'Método de Pagamento'])
+        def rows():
+            for transaction in transactions:
+                yield [
+                    transaction['date'].strftime('%d/%m/%Y'),
+                    'Receita' if transaction['type'] == 'income' else 'Despesa',
+                    transaction['category'],
+                    transaction.get('description', ''),
+                    f"{transaction['amount']:.2f}".replace('.', ','),
+                    transaction.get('payment_method', '')
+                ]
         
-        # Dados
-        for transaction in transactions:
-            writer.writerow([
-                transaction['date'].strftime('%d/%m/%Y'),
-                'Receita' if transaction['type'] == 'income' else 'Despesa',
-                transaction['category'],
-                transaction.get('description', ''),
-                f"{transaction['amount']:.2f}".replace('.', ','),
-                transaction.get('payment_method', '')
-            ])
-        
-        # Criar resposta
-        response = make_response(output.getvalue())
-        response.headers['Content-Type'] = 'text/csv'
+        # Resposta em streaming (memória constante)
+        header = ['Data', 'Tipo', 'Categoria', 'Descrição', 'Valor', 'Método de Pagamento']
+        response = Response(stream_with_context(iter_csv(header, rows())), mimetype='text/csv')
         response.headers['Content-Disposition'] = f'attachment; filename=transacoes_{datetime.now().strftime("%Y%m%d")}.csv'
         
         return response
@@ -401,35 +388,38 @@ def export_transactions():
 @transactions.route('/api/categories')
 @login_required
 def api_categories():
-    user_id = session['user_id']
-    user = User.find_by_id(user_id)
+    user_context = load_user_context()
     
     account_type = request.args.get('account', 'individual')
-    if account_type == 'family' and user.default_family:
-        owner_type = 'family'
-        owner_id = user.default_family
-    else:
-        owner_type = 'individual'
-        owner_id = user_id
+    owner_id, owner_type = user_context.resolve_owner(account_type)
     
     categories = get_user_categories(owner_id, owner_type)
     return jsonify(categories)
 
+@transactions.route('/api/categories/suggest')
+@login_required
+def api_suggest_categories():
+    """Autocomplete de categorias: as mais usadas pelo dono primeiro, depois as comuns"""
+    user_context = load_user_context()
+    
+    prefix = request.args.get('q', '').strip()
+    limit = min(request.args.get('limit', 10, type=int), 50)
+    account_type = request.args.get('account', 'individual')
+    owner_id, owner_type = user_context.resolve_owner(account_type)
+    
+    suggestions = suggest_categories(owner_id, owner_type, prefix, limit)
+    return jsonify(suggestions)
+
 @transactions.route('/api/recent')
 @login_required
 def api_recent_transactions():
     user_id = session['user_id']
-    user = User.find_by_id(user_id)
+    user_context = load_user_context()
     
     limit = int(request.args.get('limit', 10))
     account_type = request.args.get('account', 'individual')
     
-    if account_type == 'family' and user.default_family:
-        owner_type = 'family'
-        owner_id = user.default_family
-    else:
-        owner_type = 'individual'
-        owner_id = user_id
+    owner_id, owner_type = user_context.resolve_owner(account_type)
     
     transactions = Transaction.get_user_transactions(user_id, owner_type, owner_id, limit)
     
@@ -452,18 +442,8 @@ def get_common_categories():
     ]
 
 def get_user_categories(owner_id, owner_type):
-    """Busca categorias já utilizadas pelo usuário"""
-    from app import get_db
-    
-    db = get_db()
-    pipeline = [
-        {'$match': {'owner_id': ObjectId(owner_id), 'owner_type': owner_type}},
-        {'$group': {'_id': '$category'}},
-        {'$sort': {'_id': 1}}
-    ]
-    
-    result = db.transactions.aggregate(pipeline)
-    categories = [item['_id'] for item in result if item['_id']]
+    """Busca categorias já utilizadas pelo usuário (índice owner_categories)"""
+    categories = [item['name'] for item in OwnerCategory.get_categories(owner_id, owner_type)]
     
     # Adicionar categorias comuns que ainda não foram usadas
     common = get_common_categories()
@@ -473,17 +453,15 @@ def get_user_categories(owner_id, owner_type):
     
     return sorted(categories)
 
-def check_family_permission(user_id, family_id, permission):
-    """Verifica se usuário tem permissão específica na família"""
-    from app import get_db
-    
-    db = get_db()
-    family = db.families.find_one({'_id': ObjectId(family_id)})
-    if not family:
-        return False
+def suggest_categories(owner_id, owner_type, prefix='', limit=10):
+    """Categorias ordenadas por frequência de uso, completadas com as comuns"""
+    used = OwnerCategory.get_categories(owner_id, owner_type, prefix=prefix, limit=limit)
+    suggestions = [item['name'] for item in used]
     
-    for member in family.get('members', []):
-        if str(member['user_id']) == user_id:
-            return permission in member.get('permissions', [])
+    for cat in get_common_categories():
+        if len(suggestions) >= limit:
+            break
+        if cat not in suggestions and cat.lower().startswith(prefix.lower()):
+            suggestions.append(cat)
     
-    return False
\ No newline at end of file
+    return suggestions
\ No newline at end of file
@@ -0,0 +1,41 @@
+import base64
+import csv
+import io
+import json
+from datetime import datetime
+from bson.errors import InvalidId
+from bson.objectid import ObjectId
+
+def iter_csv(header, rows, chunk_rows=500):
+    """Gera um CSV em pedaços (cabeçalho primeiro), sem montar o arquivo em memória"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    writer.writerow(header)
+    yield buffer.getvalue()
+    buffer.seek(0)
+    buffer.truncate(0)
+
+    for count, row in enumerate(rows, start=1):
+        writer.writerow(row)
+        if count % chunk_rows == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate(0)
+
+    if buffer.tell():
+        yield buffer.getvalue()
+
+def encode_cursor(date, object_id):
+    """Token opaco de continuação para paginação por (date, _id)"""
+    payload = json.dumps({'d': date.isoformat(), 'i': str(object_id)})
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+def decode_cursor(token):
+    """Lê um token de encode_cursor. Retorna (date, ObjectId) ou None se inválido"""
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return datetime.fromisoformat(payload['d']), ObjectId(payload['i'])
+    except (ValueError, KeyError, TypeError, InvalidId):
+        return None
@@ -0,0 +1,5 @@
+from app.asgi import create_asgi_app
+
+# Servir com um servidor ASGI, ex.: hypercorn asgi:app ou uvicorn asgi:app
+# Requer as dependências opcionais da variante ASGI: pip install quart hypercorn
+app = create_asgi_app()
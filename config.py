@@ -13,6 +13,15 @@ class Config:
     
     # MongoDB - CORRIGIDO: Flask-PyMongo procura por MONGO_URI, não MONGODB_URI
     MONGO_URI = os.environ.get('MONGODB_URI') or os.environ.get('MONGO_URI')
+    MONGO_AUTO_INDEX = os.environ.get('MONGO_AUTO_INDEX', 'true').lower() in ['true', 'on', '1']  # Só no boot com MONGO_CONNECT_ON_STARTUP
+    MONGO_CONNECT_ON_STARTUP = os.environ.get('MONGO_CONNECT_ON_STARTUP', 'false').lower() in ['true', 'on', '1']
+    
+    # Pool de conexões (por processo/worker)
+    MONGO_MAX_POOL_SIZE = int(os.environ.get('MONGO_MAX_POOL_SIZE') or 100)
+    MONGO_MIN_POOL_SIZE = int(os.environ.get('MONGO_MIN_POOL_SIZE') or 0)
+    MONGO_MAX_IDLE_TIME_MS = int(os.environ.get('MONGO_MAX_IDLE_TIME_MS') or 60000)
+    MONGO_WAIT_QUEUE_TIMEOUT_MS = int(os.environ.get('MONGO_WAIT_QUEUE_TIMEOUT_MS') or 5000)
+    MONGO_COMPRESSORS = os.environ.get('MONGO_COMPRESSORS', 'zstd,snappy,zlib')  # Só os instalados são usados
     
     # Email
     MAIL_SERVER = os.environ.get('MAIL_SERVER')
@@ -23,4 +32,26 @@ class Config:
     
     # App
     ITEMS_PER_PAGE = 20
-    MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16MB max file upload
\ No newline at end of file
+    TRANSACTIONS_MAX_PER_PAGE = int(os.environ.get('TRANSACTIONS_MAX_PER_PAGE') or 100)
+    TRANSACTIONS_COUNT_THRESHOLD = int(os.environ.get('TRANSACTIONS_COUNT_THRESHOLD') or 10000)  # Transações mais recentes consideradas nas contagens
+    MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16MB max file upload
+    IMPORT_BATCH_SIZE = int(os.environ.get('IMPORT_BATCH_SIZE') or 1000)  # Linhas por insert_many
+    EXPORT_BATCH_SIZE = int(os.environ.get('EXPORT_BATCH_SIZE') or 1000)  # Documentos por lote do cursor
+    BULK_MAX_TRANSACTIONS = int(os.environ.get('BULK_MAX_TRANSACTIONS') or 5000)  # Transações por operação em massa
+    TRANSACTION_STORAGE = os.environ.get('TRANSACTION_STORAGE', 'flat')  # 'flat' ou 'bucketed' (um documento por dono e mês)
+    
+    # Cache de gráficos
+    CHART_CACHE_ENABLED = os.environ.get('CHART_CACHE_ENABLED', 'true').lower() in ['true', 'on', '1']
+    CHART_CACHE_TTL = int(os.environ.get('CHART_CACHE_TTL') or 300)  # Segundos
+    CHART_CACHE_MAX_ENTRIES = int(os.environ.get('CHART_CACHE_MAX_ENTRIES') or 512)
+    CHART_CACHE_SHARED_BACKEND = os.environ.get('CHART_CACHE_SHARED_BACKEND')  # 'modulo:factory(app)'
+    
+    # Permissões
+    PERMISSION_SNAPSHOT_TTL = int(os.environ.get('PERMISSION_SNAPSHOT_TTL') or 60)  # Segundos sem reler a versão (escritas sempre conferem)
+    
+    # Notificações
+    NOTIFICATION_STATE_TTL = int(os.environ.get('NOTIFICATION_STATE_TTL') or 300)  # Segundos até recalcular o badge
+    NOTIFICATION_EVALUATE_INTERVAL = int(os.environ.get('NOTIFICATION_EVALUATE_INTERVAL') or 3600)  # Reavaliação na leitura
+    NOTIFICATION_ASYNC = os.environ.get('NOTIFICATION_ASYNC', 'true').lower() in ['true', 'on', '1']
+    NOTIFICATION_WORKERS = int(os.environ.get('NOTIFICATION_WORKERS') or 2)
+    NOTIFICATIONS_MAX_PER_PAGE = 100
\ No newline at end of file
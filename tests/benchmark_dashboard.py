@@ -0,0 +1,205 @@
+import sys
+import os
+import time
+import random
+import argparse
+from datetime import datetime, timedelta
+
+# Corrigir o path para encontrar o módulo app
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(current_dir)
+
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+os.chdir(project_root)
+
+from pymongo import monitoring
+
+class RoundTripCounter(monitoring.CommandListener):
+    """Conta os comandos enviados ao MongoDB (round trips)"""
+
+    def __init__(self):
+        self.count = 0
+
+    def started(self, event):
+        self.count += 1
+
+    def succeeded(self, event):
+        pass
+
+    def failed(self, event):
+        pass
+
+# Precisa ser registrado antes de o MongoClient ser criado
+counter = RoundTripCounter()
+monitoring.register(counter)
+
+CATEGORIES_INCOME = ['Salário', 'Freelance', 'Investimentos', 'Vendas']
+CATEGORIES_EXPENSE = ['Alimentação', 'Transporte', 'Moradia', 'Saúde',
+                      'Educação', 'Lazer', 'Vestuário', 'Tecnologia']
+
+def seed_owner(db, total_transactions):
+    """Cria um dono sintético com `total_transactions` transações nos últimos 3 anos"""
+    from bson.objectid import ObjectId
+    from app.models import MonthlyRollup
+
+    owner_id = ObjectId()
+    now = datetime.now()
+    batch = []
+
+    for i in range(total_transactions):
+        is_income = random.random() < 0.2
+        batch.append({
+            'owner_type': 'individual',
+            'owner_id': owner_id,
+            'added_by': owner_id,
+            'type': 'income' if is_income else 'expense',
+            'amount': random.uniform(500, 5000) if is_income else random.uniform(10, 800),
+            'category': random.choice(CATEGORIES_INCOME if is_income else CATEGORIES_EXPENSE),
+            'description': f'Benchmark {i}',
+            'date': now - timedelta(minutes=random.randint(0, 3 * 365 * 24 * 60)),
+            'tags': [],
+            'payment_method': None,
+            'recurring': False,
+            'attachments': []
+        })
+        if len(batch) == 5000:
+            db.transactions.insert_many(batch, ordered=False)
+            batch = []
+
+    if batch:
+        db.transactions.insert_many(batch, ordered=False)
+
+    MonthlyRollup.rebuild(owner_id, 'individual')
+    return owner_id
+
+# Consultas da visão geral como estavam antes do $facet (cópia congelada do
+# caminho original: uma consulta por resumo, lista e gráfico, 6 resumos mensais
+# em receitas vs despesas e 5 x 6 consultas nas tendências por categoria)
+
+def baseline_month_total(db, owner_id, start, end, category=None):
+    match = {'owner_id': owner_id, 'owner_type': 'individual', 'date': {'$gte': start, '$lt': end}}
+    if category is not None:
+        match.update({'category': category, 'type': 'expense'})
+        group_id = None
+    else:
+        group_id = '$type'
+    return list(db.transactions.aggregate([
+        {'$match': match},
+        {'$group': {'_id': group_id, 'total': {'$sum': '$amount'}, 'count': {'$sum': 1}}}
+    ]))
+
+def baseline_month_bounds(date):
+    start = date.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    return start, (start.replace(day=28) + timedelta(days=4)).replace(day=1)
+
+def overview_before(owner_id):
+    """Caminho antigo da visão geral: uma consulta por resumo, gráfico e lista"""
+    from app import get_db
+
+    db = get_db()
+    now = datetime.now()
+    owner = {'owner_id': owner_id, 'owner_type': 'individual'}
+
+    # Resumo do mês e transações recentes
+    baseline_month_total(db, owner_id, *baseline_month_bounds(now))
+    list(db.transactions.find({'added_by': owner_id, 'owner_type': 'individual'}).sort('date', -1).limit(10))
+
+    # Pizza (30 dias)
+    list(db.transactions.aggregate([
+        {'$match': {**owner, 'type': 'expense', 'date': {'$gte': now - timedelta(days=30)}}},
+        {'$group': {'_id': '$category', 'total': {'$sum': '$amount'}}},
+        {'$sort': {'total': -1}},
+        {'$limit': 10}
+    ]))
+
+    # Evolução mensal (365 dias)
+    list(db.transactions.aggregate([
+        {'$match': {**owner, 'date': {'$gte': now - timedelta(days=365)}}},
+        {'$group': {'_id': {'year': {'$year': '$date'}, 'month': {'$month': '$date'}, 'type': '$type'},
+                    'total': {'$sum': '$amount'}}},
+        {'$sort': {'_id.year': 1, '_id.month': 1}}
+    ]))
+
+    # Receitas vs despesas: um resumo por mês
+    for i in range(6):
+        baseline_month_total(db, owner_id, *baseline_month_bounds(now.replace(day=1) - timedelta(days=30 * i)))
+
+    # Tendências: top 5 categorias + uma consulta por categoria e mês
+    top_categories = list(db.transactions.aggregate([
+        {'$match': {**owner, 'type': 'expense', 'date': {'$gte': now - timedelta(days=90)}}},
+        {'$group': {'_id': '$category', 'total': {'$sum': '$amount'}}},
+        {'$sort': {'total': -1}},
+        {'$limit': 5}
+    ]))
+    for category in top_categories:
+        for i in range(6):
+            start, end = baseline_month_bounds(now.replace(day=1) - timedelta(days=30 * i))
+            baseline_month_total(db, owner_id, start, end, category['_id'])
+
+    # Gastos diários do mês
+    list(db.transactions.aggregate([
+        {'$match': {**owner, 'type': 'expense', 'date': {'$gte': now.replace(day=1)}}},
+        {'$group': {'_id': {'$dayOfMonth': '$date'}, 'total': {'$sum': '$amount'}}},
+        {'$sort': {'_id': 1}}
+    ]))
+
+    # Orçamentos
+    list(db.budgets.find(owner))
+
+def overview_after(owner_id):
+    """Caminho novo da visão geral: $facet único + orçamentos"""
+    from app.dashboard.charts import generate_charts_data
+    from app.dashboard.engine import load_overview_data
+
+    data = load_overview_data(owner_id, 'individual')
+    generate_charts_data(owner_id, 'individual', data)
+
+def measure(label, func, owner_id, runs):
+    latencies = []
+    round_trips = []
+
+    for _ in range(runs):
+        counter.count = 0
+        started = time.perf_counter()
+        func(owner_id)
+        latencies.append((time.perf_counter() - started) * 1000)
+        round_trips.append(counter.count)
+
+    latencies.sort()
+    p50 = latencies[len(latencies) // 2]
+    p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+    print(f"   {label:<8} round trips: {max(round_trips):>3}   p50: {p50:8.1f} ms   p95: {p95:8.1f} ms")
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark da visão geral do dashboard')
+    parser.add_argument('--transactions', type=int, default=100000)
+    parser.add_argument('--runs', type=int, default=20)
+    args = parser.parse_args()
+
+    from app import create_app, get_db
+
+    app = create_app()
+
+    with app.app_context():
+        db = get_db()
+
+        print(f"🌱 Criando dono sintético com {args.transactions} transações...")
+        owner_id = seed_owner(db, args.transactions)
+
+        try:
+            # Aquecimento (cache do servidor e imports)
+            overview_before(owner_id)
+            overview_after(owner_id)
+
+            print(f"⏱️  Visão geral ({args.runs} execuções):")
+            measure('antes', overview_before, owner_id, args.runs)
+            measure('depois', overview_after, owner_id, args.runs)
+        finally:
+            db.transactions.delete_many({'owner_id': owner_id})
+            db.monthly_rollups.delete_many({'owner_id': owner_id})
+            print("🗑️  Dados do benchmark removidos.")
+
+if __name__ == '__main__':
+    main()
@@ -48,6 +48,8 @@ def create_test_user():
                 db.users.delete_one({'email': 'demo@financedash.com'})
                 if hasattr(existing_user, '_id'):
                     db.transactions.delete_many({'added_by': existing_user._id})
+                    db.monthly_rollups.delete_many({'owner_id': existing_user._id})
+                    db.owner_categories.delete_many({'owner_id': existing_user._id})
                     db.budgets.delete_many({'owner_id': existing_user._id})
                 print("🗑️  Dados anteriores removidos.")
             
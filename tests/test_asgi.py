@@ -0,0 +1,23 @@
+import sys
+import os
+
+import pytest
+
+# Corrigir o path para encontrar o módulo app
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(current_dir)
+
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+# A variante ASGI depende do pacote opcional quart
+pytest.importorskip('quart')
+
+def test_asgi_app_importa_e_registra_rotas():
+    """O módulo asgi.py monta o app Quart sem conectar ao MongoDB"""
+    from asgi import app
+
+    rules = {rule.rule for rule in app.url_map.iter_rules()}
+    assert '/dashboard/api/summary' in rules
+    assert '/dashboard/api/charts/<chart_type>' in rules
+    assert '/family/api/stats/<family_id>' in rules
@@ -0,0 +1,44 @@
+import sys
+import os
+import re
+import subprocess
+
+# Corrigir o path para encontrar o módulo app
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(current_dir)
+
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from app.profiling import profile_imports
+
+# Orçamento do boot (imports + create_app), ajustável por máquina
+BOOT_BUDGET_MS = float(os.environ.get('BOOT_BUDGET_MS') or 1000)
+
+# Dependências pesadas que só devem ser importadas no primeiro uso
+LAZY_MODULES = ['flask_bcrypt', 'flask_mail', 'plotly', 'numpy', 'quart']
+
+def test_boot_dentro_do_orcamento():
+    """O boot medido por profile_imports cabe no orçamento"""
+    report = profile_imports()
+
+    assert report['modules'], 'saída de -X importtime vazia'
+    assert 0 < report['total_ms'] <= BOOT_BUDGET_MS, (
+        f"Boot levou {report['total_ms']:.1f} ms (orçamento {BOOT_BUDGET_MS:.0f} ms)"
+    )
+
+def test_create_app_nao_importa_dependencias_pesadas():
+    """Depois do create_app (em um interpretador novo) os módulos pesados continuam fora"""
+    script = (
+        "import sys\n"
+        "from app import create_app\n"
+        "create_app()\n"
+        f"print('LOADED=' + ','.join(name for name in {LAZY_MODULES!r} if name in sys.modules))\n"
+    )
+    env = dict(os.environ, MONGO_CONNECT_ON_STARTUP='false')
+    result = subprocess.run([sys.executable, '-c', script], cwd=project_root, env=env,
+                            capture_output=True, text=True)
+
+    assert result.returncode == 0, result.stderr
+    loaded = re.search(r'^LOADED=(.*)$', result.stdout, re.MULTILINE).group(1)
+    assert loaded == '', f'Importados no boot: {loaded}'